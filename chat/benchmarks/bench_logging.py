@@ -0,0 +1,144 @@
+"""
+Request overhead of the old logging (basicConfig with f-strings, written to
+stdout on the event loop) against shared.structured_logging (queue handler,
+background writer, lazy %-formatting, JSON output).
+
+Each mode runs in its own process. A small FastAPI app is driven with
+concurrent requests through httpx's ASGI transport. Every request logs a few
+INFO lines and a few DEBUG lines that are disabled. Stdout is replaced by a
+sink that takes --sink-delay-us per write, standing in for a pipe to a log
+agent that is not always instantly drained.
+
+Usage (from the chat folder):
+
+    PYTHONPATH=.:.. python benchmarks/bench_logging.py --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+
+PAYLOAD = {"session_id": "5f1c", "tools": ["add", "describe", "histogram"], "tokens": 1234}
+
+
+class SlowSink:
+    """
+    A stdout stand-in whose writes block for a while, like a write to a pipe
+    that is not being drained. Like a real blocking write, it releases the GIL.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        time.sleep(self.delay)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def make_app(mode: str, info_lines: int, debug_lines: int):
+    from fastapi import FastAPI
+
+    logger = logging.getLogger("bench.request")
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        for i in range(info_lines):
+            if mode == "old":
+                logger.info(f"Handled step {i} with payload {PAYLOAD}")
+            else:
+                logger.info("Handled step %s with payload %s", i, PAYLOAD)
+        for i in range(debug_lines):
+            if mode == "old":
+                logger.debug(f"Step {i} details {PAYLOAD}")
+            else:
+                logger.debug("Step %s details %s", i, PAYLOAD)
+        await asyncio.sleep(0)
+        return {"ok": True}
+
+    return app
+
+
+async def drive(app, requests: int, concurrency: int) -> list[float]:
+    import httpx
+
+    latencies = []
+    remaining = iter(range(requests))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                await client.get("/work")
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def run_mode(args: argparse.Namespace) -> None:
+    sink = SlowSink(args.sink_delay_us / 1e6)
+    sys.stdout = sink
+    if args.mode == "old":
+        logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    else:
+        from shared.structured_logging import setup_logging, stop_logging
+        setup_logging("bench", level="INFO", sampling={})
+
+    app = make_app(args.mode, args.info_lines, args.debug_lines)
+    start = time.perf_counter()
+    latencies = asyncio.run(drive(app, args.requests, args.concurrency))
+    elapsed = time.perf_counter() - start
+    if args.mode == "new":
+        # Time for the writer thread to drain the queue, outside the request path
+        drain_start = time.perf_counter()
+        stop_logging()
+        drain = time.perf_counter() - drain_start
+    else:
+        drain = 0.0
+    latencies.sort()
+    result = {
+        "requests_per_second": args.requests / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "drain_s": drain,
+        "lines": sink.writes,
+    }
+    sys.__stdout__.write(json.dumps(result) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--info-lines", type=int, default=3, help="INFO lines per request")
+    parser.add_argument("--debug-lines", type=int, default=5, help="disabled DEBUG lines per request")
+    parser.add_argument("--sink-delay-us", type=float, default=100.0, help="time per write to stdout")
+    parser.add_argument("--mode", choices=["old", "new"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    print(f"{'logging':<10}{'req/s':>10}{'mean ms':>10}{'p99 ms':>10}{'drain s':>10}{'lines':>8}")
+    for mode in ("old", "new"):
+        output = subprocess.run([sys.executable, __file__, "--mode", mode, *sys.argv[1:]], capture_output=True, text=True, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(
+            f"{mode:<10}{result['requests_per_second']:>10.0f}{result['mean_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            f"{result['drain_s']:>10.2f}{result['lines']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Incremental Markdown rendering versus re-rendering the whole answer per chunk.
+
+Generates a long Markdown answer (paragraphs, lists, code fences and tables),
+splits it into token-sized chunks and renders it:
+
+- incremental: MarkdownStream.feed for every chunk, each block rendered once
+- full re-render: render_markdown of everything received so far after every
+  chunk, as a renderer without streaming support has to, sending the whole
+  HTML again each time
+
+and reports the total CPU time, the worst time spent on a single chunk and
+the HTML bytes sent.
+
+Usage (from the chat folder):
+
+    PYTHONPATH=.:.. python benchmarks/bench_markdown_stream.py --blocks 200
+"""
+
+import argparse
+import random
+import time
+
+from src.services.markdown_stream import MarkdownStream, render_markdown
+
+WORDS = (
+    "the model streams its answer token by token while the tool results are merged into "
+    "a table of values with totals averages and a short explanation of each step"
+).split()
+
+
+def sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(8, 20))
+    words[rng.randrange(len(words))] = f"**{words[0]}**"
+    return " ".join(words).capitalize() + "."
+
+
+def make_answer(blocks: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for index in range(blocks):
+        kind = index % 5
+        if kind == 0:
+            parts.append(f"## Step {index // 5 + 1}")
+        elif kind == 1:
+            parts.append(" ".join(sentence(rng) for _ in range(4)))
+        elif kind == 2:
+            parts.append("\n".join(f"- {sentence(rng)}" for _ in range(5)))
+        elif kind == 3:
+            parts.append("```python\n" + "\n".join(f"value_{i} = {rng.random():.4f}" for i in range(8)) + "\n```")
+        else:
+            rows = "\n".join(f"| {rng.choice(WORDS)} | {rng.randint(0, 999)} |" for _ in range(6))
+            parts.append(f"| name | value |\n|---|---|\n{rows}")
+    return "\n\n".join(parts)
+
+
+def make_chunks(text: str, seed: int = 0) -> list[str]:
+    # Roughly the 2-6 word pieces Gemini streams
+    rng = random.Random(seed)
+    chunks = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(8, 32)
+        chunks.append(text[position:position + size])
+        position += size
+    return chunks
+
+
+def incremental(chunks: list[str]) -> tuple[float, float, int]:
+    markdown = MarkdownStream()
+    sent, worst = 0, 0.0
+    start = time.perf_counter()
+    for chunk in chunks:
+        chunk_start = time.perf_counter()
+        sent += len(markdown.feed(chunk))
+        worst = max(worst, time.perf_counter() - chunk_start)
+    sent += len(markdown.finish())
+    return time.perf_counter() - start, worst, sent
+
+
+def full_rerender(chunks: list[str]) -> tuple[float, float, int]:
+    received = ""
+    sent, worst = 0, 0.0
+    start = time.perf_counter()
+    for chunk in chunks:
+        chunk_start = time.perf_counter()
+        received += chunk
+        sent += len(render_markdown(received))
+        worst = max(worst, time.perf_counter() - chunk_start)
+    return time.perf_counter() - start, worst, sent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=200, help="Markdown blocks in the answer")
+    args = parser.parse_args()
+
+    text = make_answer(args.blocks)
+    chunks = make_chunks(text)
+    print(f"answer: {len(text)} characters in {len(chunks)} chunks")
+    print(f"{'renderer':<16}{'total ms':>12}{'worst chunk ms':>16}{'HTML sent':>14}")
+    for name, run in (("incremental", incremental), ("full re-render", full_rerender)):
+        total, worst, sent = run(chunks)
+        print(f"{name:<16}{total * 1000:>12.1f}{worst * 1000:>16.3f}{sent:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Bytes on the wire versus added latency for streamed chat answers.
+
+Simulates the /ui/chat response (template head, many small answer chunks, a
+closing fragment) and compares:
+
+- identity: no compression
+- buffered: one-shot gzip of the whole body, as GZipMiddleware would do; the
+  first byte can only be sent once the whole answer has been generated
+- streaming <encoding>: the shared StreamingCompressionMiddleware encoders,
+  flushed after every chunk
+
+Usage (from the chat folder):
+
+    PYTHONPATH=.:.. python benchmarks/bench_streaming_compression.py --chunks 400
+"""
+
+import argparse
+import gzip
+import random
+import statistics
+import time
+from pathlib import Path
+
+from shared.compression import available_encoders
+
+TEMPLATE = Path(__file__).resolve().parent.parent / "src" / "ui" / "chat_response_template.html"
+MARKER = "<!-- The streamed response will be inserted here -->"
+
+WORDS = (
+    "the model streams its answer token by token while the tool results are merged into "
+    "a table of values with totals averages and a short explanation of each step"
+).split()
+
+
+def make_chunks(count: int, seed: int = 0) -> list[bytes]:
+    rng = random.Random(seed)
+    head, tail = TEMPLATE.read_text().split(MARKER)
+    chunks = [head.replace("{{ prompt }}", "Summarize the quarterly numbers").encode()]
+    for _ in range(count):
+        chunks.append((" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))) + " ").encode())
+    chunks.append(tail.encode())
+    return chunks
+
+
+def bench_streaming(name: str, factory, chunks: list[bytes]) -> dict:
+    encoder = factory()
+    sizes, latencies = [], []
+    for i, chunk in enumerate(chunks):
+        start = time.perf_counter()
+        data = encoder.finish(chunk) if i == len(chunks) - 1 else encoder.chunk(chunk)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(len(data))
+    return {
+        "name": f"streaming {name}",
+        "bytes": sum(sizes),
+        "p50_us": statistics.median(latencies) * 1e6,
+        "max_us": max(latencies) * 1e6,
+        "first_byte": "first chunk",
+    }
+
+
+def bench_buffered(chunks: list[bytes]) -> dict:
+    start = time.perf_counter()
+    data = gzip.compress(b"".join(chunks), compresslevel=6)
+    elapsed = time.perf_counter() - start
+    return {
+        "name": "buffered gzip",
+        "bytes": len(data),
+        "p50_us": elapsed * 1e6,
+        "max_us": elapsed * 1e6,
+        "first_byte": "end of answer",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=400, help="number of answer chunks")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    identity = sum(len(chunk) for chunk in chunks)
+    results = [{"name": "identity", "bytes": identity, "p50_us": 0.0, "max_us": 0.0, "first_byte": "first chunk"}]
+    results.append(bench_buffered(chunks))
+    for name, factory in available_encoders().items():
+        results.append(bench_streaming(name, factory, chunks))
+
+    print(f"{len(chunks)} chunks, {identity} bytes uncompressed")
+    print(f"{'variant':<18}{'bytes':>9}{'ratio':>8}{'p50 us/chunk':>15}{'max us':>10}  first byte sent at")
+    for result in results:
+        print(
+            f"{result['name']:<18}{result['bytes']:>9}{result['bytes'] / identity:>8.2f}"
+            f"{result['p50_us']:>15.1f}{result['max_us']:>10.1f}  {result['first_byte']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
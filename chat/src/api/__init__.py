@@ -3,6 +3,7 @@
 from fastapi import APIRouter
 from .chat import router as chat_router
 from .tools import router as tools_router
+from .metrics import router as metrics_router
 
 # Create a single API router for all API endpoints
 api_router = APIRouter()
@@ -10,5 +11,6 @@ api_router = APIRouter()
 # Include individual routers
 api_router.include_router(chat_router)
 api_router.include_router(tools_router)
+api_router.include_router(metrics_router)
 
 # Note: No prefix is used here, as the prefix will be applied in main.py
\ No newline at end of file
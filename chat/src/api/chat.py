@@ -1,17 +1,33 @@
+import uuid
+from typing import Optional
 from fastapi import APIRouter, Form, Depends
 from fastapi.responses import StreamingResponse
 from fastmcp import Client
 from google import genai
-from ..dependencies import get_mcp_client, get_gemini_client
+from ..dependencies import get_mcp_client, get_gemini_client, get_session_store, get_context_cache
 from ..services.llm_service import generate_gemini_response
+from ..services.session_store import SessionStore, session_exchange
+from ..services.context_cache import ContextCache
 
 router = APIRouter()
 
 @router.post("/chat")
 async def chat_response_stream(
     prompt: str = Form(...),
+    session_id: Optional[str] = Form(None),
     gemini_client: genai.Client = Depends(get_gemini_client),
-    mcp_client: Client = Depends(get_mcp_client)
+    mcp_client: Client = Depends(get_mcp_client),
+    session_store: SessionStore = Depends(get_session_store),
+    context_cache: ContextCache = Depends(get_context_cache)
 ):
-    response_stream = generate_gemini_response(prompt, gemini_client, mcp_client)
-    return StreamingResponse(response_stream, media_type="text/plain")
\ No newline at end of file
+    # Start a new conversation when the caller did not send a session id
+    session_id = session_id or uuid.uuid4().hex
+
+    def respond(conversation):
+        return generate_gemini_response(prompt, gemini_client, mcp_client, conversation, context_cache)
+
+    return StreamingResponse(
+        session_exchange(session_store, session_id, respond),
+        media_type="text/plain",
+        headers={"X-Session-Id": session_id}
+    )
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+from shared.inflight import InflightRegistry
+from shared.warmup import KeepWarm
+from ..dependencies import get_context_cache, get_inflight, get_keep_warm
+from ..services.context_cache import ContextCache
+from ..services.llm_service import ttft
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics(
+    context_cache: ContextCache = Depends(get_context_cache),
+    keep_warm: KeepWarm = Depends(get_keep_warm),
+    inflight: InflightRegistry = Depends(get_inflight),
+) -> Dict[str, Any]:
+    """
+    Returns runtime metrics of the chat service, such as the input tokens saved
+    by the Gemini context cache, the warm versus cold requests to the MCP
+    server and Gemini, the requests in flight and cumulative histograms of the
+    request latency and the time to the first token of each answer.
+    """
+    return {
+        "context_cache": context_cache.stats(),
+        "warmup": keep_warm.stats(),
+        "load": inflight.load(),
+        "latency": inflight.histograms(),
+        "ttft_seconds": ttft.snapshot(),
+    }
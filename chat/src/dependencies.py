@@ -2,9 +2,29 @@
 from fastapi import Request
 from google import genai
 from fastmcp import Client
+from shared.assets import AssetStore
+from shared.inflight import InflightRegistry
+from shared.warmup import KeepWarm
+from .services.session_store import SessionStore
+from .services.context_cache import ContextCache
 
 def get_gemini_client(request: Request) -> genai.Client:
     return request.app.state.gemini_client
 
 def get_mcp_client(request: Request) -> Client:
-    return request.app.state.mcp_client
\ No newline at end of file
+    return request.app.state.mcp_client
+
+def get_session_store(request: Request) -> SessionStore:
+    return request.app.state.session_store
+
+def get_context_cache(request: Request) -> ContextCache:
+    return request.app.state.context_cache
+
+def get_keep_warm(request: Request) -> KeepWarm:
+    return request.app.state.keep_warm
+
+def get_assets(request: Request) -> AssetStore:
+    return request.app.state.assets
+
+def get_inflight(request: Request) -> InflightRegistry:
+    return request.app.state.inflight
@@ -1,23 +1,56 @@
 from contextlib import asynccontextmanager
 import os
 import logging
+import httpx
 from fastapi import FastAPI
 from fastmcp import Client
+from fastmcp.client.transports import StreamableHttpTransport
 from google import genai
+from google.genai import types
 from google.oauth2 import id_token
 from google.auth.transport.requests import Request
+from .services.session_store import create_session_store
+from .services.context_cache import ContextCache, CatalogChangeHandler
+from .services.llm_service import MODEL, SYSTEM_INSTRUCTION
+from .services.mcp_service import is_mcp_ping
+from shared.inflight import DRAIN_TIMEOUT_SECONDS
+from shared.warmup import KeepWarm
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Initializing clients...")
+    await app.state.assets.start()
     
     # Store clients that will be kept alive
     app.state.mcp_client = None
     app.state.gemini_client = None
+    app.state.session_store = create_session_store()
+    # The Gemini client is attached once it has been initialized below
+    app.state.context_cache = ContextCache(
+        None,
+        MODEL,
+        SYSTEM_INSTRUCTION,
+        enabled=os.getenv("GEMINI_CONTEXT_CACHE", "1") == "1",
+        ttl_seconds=int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600")),
+    )
+    catalog_handler = CatalogChangeHandler(app.state.context_cache)
+
+    # Pooled connections to the MCP server and Gemini, opened up front and kept warm
+    app.state.keep_warm = keep_warm = KeepWarm()
+    # The MCP client closes every streamed response right before its end; finish reading those
+    mcp_transport = keep_warm.transport("mcp", is_ping=is_mcp_ping, drain_timeout=0.5)
+
+    def mcp_http_client(headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+        # The same defaults as the MCP SDK's own factory, over the pooled transport
+        return httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout or httpx.Timeout(30.0),
+            auth=auth,
+            follow_redirects=True,
+            transport=mcp_transport,
+        )
     
     # Use different connection strategies for different environments
     if "K_SERVICE" in os.environ:
@@ -30,9 +63,11 @@ async def lifespan(app: FastAPI):
             auth_request = Request()
             token = id_token.fetch_id_token(auth_request, mcp_server_url)
             logger.info("Successfully obtained Cloud Run identity token")
-            print(token)
             # Create and store the client (keep connection alive)
-            app.state.mcp_client = Client(f"{mcp_server_url}/mcp", auth=token)
+            app.state.mcp_client = Client(
+                StreamableHttpTransport(f"{mcp_server_url}/mcp", auth=token, httpx_client_factory=mcp_http_client),
+                message_handler=catalog_handler,
+            )
             await app.state.mcp_client.__aenter__()  # Start the connection
             logger.info("MCP client connected successfully (Cloud Run)")
                 
@@ -50,7 +85,10 @@ async def lifespan(app: FastAPI):
         
         try:
             # Create and store the client (keep connection alive)
-            app.state.mcp_client = Client(mcp_server_url)
+            app.state.mcp_client = Client(
+                StreamableHttpTransport(mcp_server_url, httpx_client_factory=mcp_http_client),
+                message_handler=catalog_handler,
+            )
             await app.state.mcp_client.__aenter__()  # Start the connection
             logger.info(f"MCP client connected successfully to: {mcp_server_url}")
             
@@ -75,7 +113,11 @@ async def lifespan(app: FastAPI):
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable not set")
         
-        app.state.gemini_client = genai.Client(api_key=api_key)
+        app.state.gemini_client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(async_client_args={"transport": keep_warm.transport("gemini")}),
+        )
+        app.state.context_cache.gemini_client = app.state.gemini_client
         logger.info("Gemini client initialized successfully")
         
     except Exception as e:
@@ -86,10 +128,36 @@ async def lifespan(app: FastAPI):
     mcp_status = "✅ Connected" if app.state.mcp_client else "❌ Failed"
     gemini_status = "✅ Connected" if app.state.gemini_client else "❌ Failed"
     logger.info(f"Initialization complete - MCP: {mcp_status}, Gemini: {gemini_status}")
+
+    # MCP ping and a model metadata lookup: no tokens, but the connections stay open
+    if app.state.mcp_client:
+        keep_warm.add_ping("mcp", app.state.mcp_client.ping)
+    if app.state.gemini_client:
+        gemini_client = app.state.gemini_client
+        keep_warm.add_ping("gemini", lambda: gemini_client.aio.models.get(model=MODEL))
+    keep_warm.start()
+
+    # Create the context cache for the system instruction and tool declarations up front
+    if app.state.mcp_client and app.state.gemini_client:
+        try:
+            await app.state.context_cache.refresh(app.state.mcp_client)
+        except Exception as e:
+            logger.warning(f"Could not prepare Gemini context cache: {e}")
     
+    # On SIGTERM, stop admitting requests before uvicorn begins its shutdown
+    app.state.inflight.install_signal_handler()
+    # Watches for event loop stalls, if profiling is enabled
+    app.state.profiler.start()
+
     yield
-    
+
+    # Let the answers still streaming finish before their clients are closed
+    await app.state.inflight.drain(DRAIN_TIMEOUT_SECONDS)
+    await app.state.profiler.stop()
+
     logger.info("Shutting down clients...")
+
+    await app.state.context_cache.close()
     
     # Properly close the MCP client connection
     if app.state.mcp_client:
@@ -99,7 +167,11 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"Error closing MCP client: {e}")
     
-    # Gemini client doesn't need explicit cleanup
+    # Gemini client doesn't need explicit cleanup; its pooled connections are closed here
+    await keep_warm.stop()
+
+    app.state.session_store.close()
+    await app.state.assets.stop()
 
 # Optional: Health check function
 def get_client_status(app: FastAPI) -> dict:
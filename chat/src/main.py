@@ -1,8 +1,15 @@
 import os
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from pathlib import Path
+from shared.assets import AssetStore
+from shared.compression import StreamingCompressionMiddleware
+from shared.inflight import DEFAULT_EXEMPT_PATHS, InflightMiddleware, InflightRegistry
+from shared.profiling import Profiler
+from shared.structured_logging import setup_logging
+
+# Before anything logs: JSON lines written to stdout from a background thread
+setup_logging("chat")
 
 from .lifespan import lifespan
 
@@ -11,23 +18,52 @@ from .ui import ui_router
 
 app = FastAPI(lifespan=lifespan)
 
+# Every request and stream in flight, for /load and the graceful drain on SIGTERM.
+# Added first, so it sees the app's own responses rather than compressed ones.
+app.state.inflight = InflightRegistry()
+# The dashboard's performance panel samples /api/metrics; its polls are not counted
+app.add_middleware(InflightMiddleware, registry=app.state.inflight, exempt_paths=(*DEFAULT_EXEMPT_PATHS, "/api/metrics"))
+
+# Compresses the streamed chat answers chunk by chunk, so they still arrive as they are generated
+app.add_middleware(StreamingCompressionMiddleware)
+
+# CPU profiles, allocation snapshots, per-route stats and loop stalls; only with PROFILING_TOKEN set
+app.state.profiler = Profiler()
+app.state.profiler.install(app)
+
 app.include_router(api_router, prefix="/api")
 app.include_router(ui_router, prefix="/ui")
 
 # --- Dynamic Path Resolution for Static Files ---
 # We try the production path first, as that is the intended final environment.
-# The local development path becomes the fallback.
-try:
-    # This path is correct for the Docker container.
-    app.mount("/static", StaticFiles(directory="static"), name="static")
-except RuntimeError:
-    # If the above path fails, we assume we are in local development
-    # where the static directory is one level up.
-    app.mount("/static", StaticFiles(directory="../static"), name="static")
-
-# fe_path = Path(__file__).parent.parent / "ui" / "index.html"
-fe_path = Path(__file__).parent / "ui" / "index.html"
-
-@app.get("/")
-async def serve_frontend_root():
-    return FileResponse(fe_path)
+# The local development path becomes the fallback, where the static directory is one level up.
+static_dir = Path("static") if Path("static").is_dir() else Path("../static")
+
+# Templates and static files are loaded into memory once; ASSETS_DEV_MODE=1 reloads them on change
+ui_dir = Path(__file__).parent / "ui"
+assets = AssetStore(static_dir, dev_mode=os.getenv("ASSETS_DEV_MODE") == "1")
+assets.add_template("index.html", ui_dir / "index.html")
+assets.add_template("chat.html", ui_dir / "chat.html")
+assets.add_template(
+    "chat_response_template.html",
+    ui_dir / "chat_response_template.html",
+    split_on="<!-- The streamed response will be inserted here -->"
+)
+app.state.assets = assets
+
+app.mount("/static", assets, name="static")
+
+# HEAD is what the dashboard's keep-warm pings send
+@app.api_route("/", methods=["GET", "HEAD"])
+async def serve_frontend_root(request: Request):
+    return assets.response("index.html", request)
+
+
+@app.get("/load")
+async def get_load():
+    """
+    Live concurrency and stream ages for autoscaling and load balancing;
+    answers 503 once the service is draining for shutdown.
+    """
+    load = app.state.inflight.load()
+    return JSONResponse(load, status_code=200 if load["accepting"] else 503)
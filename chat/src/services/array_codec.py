@@ -0,0 +1,92 @@
+"""
+Client side of the MCP server's compact array encoding (see mcp-server/encoding.py).
+
+Large numeric lists are sent as a base64 little-endian float64/int64 buffer with
+dtype and shape metadata, which the server decodes straight into a NumPy array.
+Only the standard library is used, so the chat service does not need NumPy.
+"""
+
+import array
+import base64
+import sys
+import zlib
+from typing import Any, Dict, List, Optional
+
+# Lists shorter than this are cheaper to send as plain JSON
+ENCODE_THRESHOLD = 1024
+
+TYPECODES = {"float64": "d", "int64": "q"}
+
+
+def is_encoded(value: Any) -> bool:
+    return isinstance(value, dict) and value.get("encoding") == "base64"
+
+
+def encode_array(values: List[float], compress: bool = False) -> Dict[str, Any]:
+    """Encodes a list of numbers; all-int lists keep their integer dtype."""
+    dtype = "int64" if all(type(value) is int for value in values) else "float64"
+    buffer = array.array(TYPECODES[dtype], values)
+    if sys.byteorder == "big":
+        buffer.byteswap()
+    data = buffer.tobytes()
+    if compress:
+        data = zlib.compress(data, 1)
+    return {
+        "encoding": "base64",
+        "dtype": dtype,
+        "shape": [len(values)],
+        "compression": "zlib" if compress else None,
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+
+def decode_array(value: Dict[str, Any]) -> List[float]:
+    """Decodes an encoded array back into a flat list of numbers."""
+    data = base64.b64decode(value["data"])
+    if value.get("compression") == "zlib":
+        data = zlib.decompress(data)
+    buffer = array.array(TYPECODES[value["dtype"]])
+    buffer.frombytes(data)
+    if sys.byteorder == "big":
+        buffer.byteswap()
+    return buffer.tolist()
+
+
+def accepts_encoded(property_schema: Optional[Dict[str, Any]], defs: Dict[str, Any]) -> bool:
+    """Whether a tool parameter's JSON schema accepts an encoded array."""
+    if not property_schema:
+        return False
+    for option in property_schema.get("anyOf", [property_schema]):
+        ref = option.get("$ref", "")
+        if ref.startswith("#/$defs/"):
+            option = defs.get(ref.removeprefix("#/$defs/"), {})
+        if "encoding" in option.get("properties", {}):
+            return True
+    return False
+
+
+def encode_arguments(arguments: Dict[str, Any], input_schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Encodes the large numeric list arguments that the tool accepts in encoded form."""
+    if not input_schema:
+        return arguments
+    properties = input_schema.get("properties", {})
+    defs = input_schema.get("$defs", {})
+    encoded = dict(arguments)
+    for name, value in arguments.items():
+        if (
+            isinstance(value, list)
+            and len(value) >= ENCODE_THRESHOLD
+            and accepts_encoded(properties.get(name), defs)
+            and all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in value)
+        ):
+            encoded[name] = encode_array(value)
+    return encoded
+
+
+def decode_result(value: Any) -> Any:
+    """Replaces encoded arrays in a (structured) tool result with plain lists."""
+    if is_encoded(value):
+        return decode_array(value)
+    if isinstance(value, dict):
+        return {key: decode_result(item) for key, item in value.items()}
+    return value
@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+import mcp.types
+from fastmcp import Client
+from fastmcp.client.messages import MessageHandler
+from google import genai
+from google.genai import types
+from .mcp_service import BATCH_TOOL
+
+logger = logging.getLogger(__name__)
+
+
+def mcp_tools_to_gemini(tools: List[Any]) -> List[types.Tool]:
+    """
+    Converts the MCP tool catalog into Gemini function declarations. The batch
+    meta-tool is left out, because the chat service batches calls itself.
+    """
+    return [
+        types.Tool(function_declarations=[
+            types.FunctionDeclaration(
+                name=tool.name,
+                description=tool.description or "",
+                parameters_json_schema=tool.inputSchema,
+            )
+        ])
+        for tool in tools
+        if tool.name != BATCH_TOOL
+    ]
+
+
+def catalog_fingerprint(tools: List[Any]) -> str:
+    """Returns a stable hash of the tool catalog so that changes can be detected."""
+    catalog = [[tool.name, tool.description, tool.inputSchema] for tool in tools]
+    return hashlib.sha256(json.dumps(catalog, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ContextCache:
+    """
+    Keeps the static request prefix (system instruction and tool declarations)
+    in a Gemini cached-content entry, so each request only sends the conversation.
+
+    The cache is created at startup (lifespan calls `refresh`), or by the first
+    request if that did not get the tool catalog. After that, requests never wait
+    for Gemini or the MCP server: when the catalog is due for a check, the TTL is
+    within `refresh_margin_seconds` or a failed creation is due for a retry, they
+    start a refresh in the background and carry on with what is there. Requests
+    made while there is no live cache entry (caching disabled, model or prefix
+    not eligible, the entry expired) send the same prefix inline instead.
+
+    A failed creation is retried with exponential backoff, up to the TTL, and
+    logged once. A prefix below the model's minimum token count is not retried
+    until the tool catalog changes. When the catalog changes, the old entry is
+    left to expire with its TTL, since requests started before may still use it.
+    """
+
+    def __init__(
+        self,
+        gemini_client: Optional[genai.Client],
+        model: str,
+        system_instruction: str,
+        enabled: bool = True,
+        ttl_seconds: int = 3600,
+        refresh_margin_seconds: int = 300,
+        catalog_check_seconds: int = 60,
+    ):
+        self.gemini_client = gemini_client
+        self.model = model
+        self.system_instruction = system_instruction
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.catalog_check_seconds = catalog_check_seconds
+
+        self.cache_name: Optional[str] = None
+        self.tools: List[types.Tool] = []
+        # JSON input schema per tool name, used when calling the tools
+        self.input_schemas: Dict[str, Dict[str, Any]] = {}
+        self._fingerprint: Optional[str] = None
+        self._expires_at = 0.0
+        self._catalog_checked_at: Optional[float] = None
+        self._retry_at = 0.0
+        self._failures = 0
+        self._lock = asyncio.Lock()
+        self._background: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.requests = 0
+        self.cached_requests = 0
+        self.input_tokens_saved = 0
+
+    def invalidate(self) -> None:
+        """Forces the tool catalog to be re-read on the next request."""
+        self._catalog_checked_at = None
+
+    async def refresh(self, mcp_client: Client) -> None:
+        """Re-reads the tool catalog if due and creates or extends the cache entry."""
+        async with self._lock:
+            await self._refresh(mcp_client)
+
+    async def get_config(self, mcp_client: Client) -> types.GenerateContentConfig:
+        """Returns the request config, referencing the cache entry when there is a live one."""
+        if self._fingerprint is None:
+            # Without the tool catalog there is nothing to answer with
+            await self.refresh(mcp_client)
+        elif self._refresh_due(time.monotonic()):
+            self._refresh_in_background(mcp_client)
+        self.requests += 1
+
+        # Tool calls are executed by the chat service, not by the SDK
+        afc = types.AutomaticFunctionCallingConfig(disable=True)
+        if self.cache_name and time.monotonic() < self._expires_at:
+            self.cached_requests += 1
+            return types.GenerateContentConfig(
+                temperature=0,
+                cached_content=self.cache_name,
+                automatic_function_calling=afc,
+            )
+        return types.GenerateContentConfig(
+            temperature=0,
+            system_instruction=self.system_instruction,
+            tools=self.tools or None,
+            automatic_function_calling=afc,
+        )
+
+    def record_usage(self, usage_metadata: Optional[types.GenerateContentResponseUsageMetadata]) -> None:
+        """Records how many input tokens were served from the cache for one response."""
+        if usage_metadata and usage_metadata.cached_content_token_count:
+            self.input_tokens_saved += usage_metadata.cached_content_token_count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "cache_name": self.cache_name,
+            "requests": self.requests,
+            "cached_requests": self.cached_requests,
+            "input_tokens_saved": self.input_tokens_saved,
+        }
+
+    async def close(self) -> None:
+        if self._background is not None:
+            self._background.cancel()
+            await asyncio.gather(self._background, return_exceptions=True)
+        await self._delete()
+
+    def _refresh_due(self, now: float) -> bool:
+        if self._catalog_checked_at is None or now - self._catalog_checked_at >= self.catalog_check_seconds:
+            return True
+        if not self.enabled or self.gemini_client is None:
+            return False
+        if self.cache_name is None:
+            return now >= self._retry_at
+        return self._expires_at - now < self.refresh_margin_seconds
+
+    def _refresh_in_background(self, mcp_client: Client) -> None:
+        if self._background is None or self._background.done():
+            self._background = asyncio.create_task(self._refresh_quietly(mcp_client))
+
+    async def _refresh_quietly(self, mcp_client: Client) -> None:
+        try:
+            await self.refresh(mcp_client)
+        except Exception as e:
+            logger.warning(f"Background refresh of the context cache failed: {e}")
+
+    async def _refresh(self, mcp_client: Client) -> None:
+        now = time.monotonic()
+        if self._catalog_checked_at is None or now - self._catalog_checked_at >= self.catalog_check_seconds:
+            tools = await mcp_client.list_tools()
+            self._catalog_checked_at = now
+            fingerprint = catalog_fingerprint(tools)
+            if fingerprint != self._fingerprint:
+                logger.info(f"MCP tool catalog changed, rebuilding context cache ({len(tools)} tools)")
+                self._fingerprint = fingerprint
+                self.tools = mcp_tools_to_gemini(tools)
+                self.input_schemas = {tool.name: tool.inputSchema for tool in tools}
+                if self.cache_name is not None:
+                    # Requests that are still streaming may reference it; it expires with its TTL
+                    logger.info(f"Leaving Gemini context cache {self.cache_name} to expire")
+                    self.cache_name = None
+                self._retry_at = 0.0
+                self._failures = 0
+
+        if not self.enabled or self.gemini_client is None:
+            return
+        if self.cache_name is not None and now >= self._expires_at:
+            # Gemini has dropped the entry already; there is nothing left to extend
+            self.cache_name = None
+        if self.cache_name is None:
+            if now >= self._retry_at:
+                await self._create(now)
+        elif self._expires_at - now < self.refresh_margin_seconds:
+            await self._extend(now)
+
+    async def _create(self, now: float) -> None:
+        try:
+            cache = await self.gemini_client.aio.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    display_name="sbotify-chat-prefix",
+                    system_instruction=self.system_instruction,
+                    tools=self.tools or None,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+            self.cache_name = cache.name
+            self._expires_at = now + self.ttl_seconds
+            self._failures = 0
+            logger.info(f"Created Gemini context cache {cache.name}")
+        except Exception as e:
+            # Fall back to inline config until a retry succeeds
+            self.cache_name = None
+            self._failures += 1
+            if self._failures == 1:
+                logger.warning(f"Gemini context caching unavailable, sending prefix inline: {e}")
+            if "too small" in str(e).lower():
+                # Below the model's minimum token count: only a new catalog can change that
+                self._retry_at = math.inf
+            else:
+                self._retry_at = now + min(self.catalog_check_seconds * 2 ** (self._failures - 1), self.ttl_seconds)
+
+    async def _extend(self, now: float) -> None:
+        try:
+            await self.gemini_client.aio.caches.update(
+                name=self.cache_name,
+                config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"),
+            )
+            self._expires_at = now + self.ttl_seconds
+        except Exception as e:
+            logger.warning(f"Could not extend Gemini context cache {self.cache_name}: {e}")
+            self.cache_name = None
+            await self._create(now)
+
+    async def _delete(self) -> None:
+        if self.cache_name is None:
+            return
+        name, self.cache_name = self.cache_name, None
+        try:
+            await self.gemini_client.aio.caches.delete(name=name)
+        except Exception as e:
+            logger.warning(f"Could not delete Gemini context cache {name}: {e}")
+
+
+class CatalogChangeHandler(MessageHandler):
+    """Invalidates the context cache when the MCP server announces a new tool list."""
+
+    def __init__(self, context_cache: ContextCache):
+        self.context_cache = context_cache
+
+    async def on_tool_list_changed(self, message: mcp.types.ToolListChangedNotification) -> None:
+        self.context_cache.invalidate()
@@ -1,46 +1,141 @@
+import asyncio
+import logging
 import os
+import time
+from contextlib import aclosing
 from google import genai
+from google.genai import types
 from fastmcp import Client
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Awaitable, List, Optional
+from shared.histogram import Histogram
+from .context_cache import ContextCache
+from .mcp_service import call_tools_batched
+from .session_store import Conversation
+
+logger = logging.getLogger(__name__)
+
+MODEL = "gemini-2.0-flash"
+
+SYSTEM_INSTRUCTION = "You are a helpful AI assistant. Answer general knowledge questions using your own knowledge. Only use the provided tools when the question explicitly requires their functionality, such as performing a calculation or accessing specific external data."
+
+# Upper bound on model/tool round trips for a single prompt
+MAX_TOOL_ROUNDS = 10
+
+# Seconds from the prompt to the first text of the answer (time to first token)
+ttft = Histogram()
+
+async def _relay_progress(
+    tools: Awaitable[List[types.Part]],
+    progress: asyncio.Queue
+) -> AsyncGenerator[str, None]:
+    """
+    Yields the status lines put on the progress queue while the tool calls run.
+    Closing the generator (the chat client went away) cancels the tool calls,
+    which also cancels them on the MCP server when the session is stateful.
+    """
+    task = asyncio.ensure_future(tools)
+    try:
+        while not task.done():
+            status = asyncio.ensure_future(progress.get())
+            await asyncio.wait({task, status}, return_when=asyncio.FIRST_COMPLETED)
+            if status.done():
+                yield status.result()
+            else:
+                status.cancel()
+        # Status lines put on the queue just before the calls finished
+        while not progress.empty():
+            yield progress.get_nowait()
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+def _chunk_parts(chunk: types.GenerateContentResponse) -> List[types.Part]:
+    if not chunk.candidates or not chunk.candidates[0].content:
+        return []
+    return chunk.candidates[0].content.parts or []
 
 async def generate_gemini_response(
-    prompt: str, 
-    gemini_client: genai.Client, 
-    mcp_client: Client
+    prompt: str,
+    gemini_client: genai.Client,
+    mcp_client: Client,
+    conversation: Optional[Conversation] = None,
+    context_cache: Optional[ContextCache] = None
 ) -> AsyncGenerator[str, None]:
     """
-    Generates a streaming response from the Gemini model using the low-level API,
-    which correctly handles tool calling with the FastMCP client.
+    Generates a streaming response from the Gemini model using the low-level API.
+    Function calls from the model are executed on the FastMCP client and their
+    results are sent back until the model produces its answer. Progress that
+    long-running tools report is streamed as interim status lines meanwhile.
+
+    When a conversation is given, its (compacted) history is sent along with the
+    prompt and the completed exchange is recorded on it. The context cache supplies
+    the system instruction and tool declarations, from Gemini's cache when possible.
     """
+    started = time.monotonic()
     try:
-        system_instruction = "You are a helpful AI assistant. Answer general knowledge questions using your own knowledge. Only use the provided tools when the question explicitly requires their functionality, such as performing a calculation or accessing specific external data."
-        
-        # Use the streaming method and pass the mcp_client object directly
-        response_stream = await gemini_client.aio.models.generate_content_stream(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            config=genai.types.GenerateContentConfig(
-                temperature=0,
-                tools=[mcp_client.session],
-                system_instruction=system_instruction,
-            ),
-        )
+        if context_cache is None:
+            context_cache = ContextCache(gemini_client, MODEL, SYSTEM_INSTRUCTION, enabled=False)
+        config = await context_cache.get_config(mcp_client)
+
+        if conversation:
+            contents = conversation.build_contents(prompt)
+        else:
+            contents = [types.Content(role="user", parts=[types.Part(text=prompt)])]
 
         is_tool_based = False
+        answer_parts = []
+
+        for _ in range(MAX_TOOL_ROUNDS):
+            response_stream = await gemini_client.aio.models.generate_content_stream(
+                model=context_cache.model,
+                contents=contents,
+                config=config,
+            )
+
+            model_parts = []
+            usage_metadata = None
+
+            # Asynchronously iterate over the streaming chunks
+            async for chunk in response_stream:
+                usage_metadata = chunk.usage_metadata or usage_metadata
+                for part in _chunk_parts(chunk):
+                    model_parts.append(part)
+                    if part.text and not part.thought:
+                        if not answer_parts:
+                            ttft.observe(time.monotonic() - started)
+                        answer_parts.append(part.text)
+                        yield part.text
+
+            context_cache.record_usage(usage_metadata)
 
-        # Asynchronously iterate over the streaming chunks
-        async for chunk in response_stream:
-            # Check if the response includes a tool call
-            if chunk.automatic_function_calling_history:
-                is_tool_based = True
-            
-            if chunk.text:
-                yield chunk.text
+            function_calls = [part.function_call for part in model_parts if part.function_call]
+            if not function_calls:
+                break
+
+            # Run the requested tools (in one round trip when possible) and send their results back to the model
+            is_tool_based = True
+            progress: asyncio.Queue = asyncio.Queue()
+
+            async def on_progress(name: str, done: float, total: Optional[float], status: str) -> None:
+                # A paragraph of its own, so the UI renders it as soon as it arrives
+                progress.put_nowait(f"\n\n({name}: {status})\n\n")
+
+            tools = asyncio.ensure_future(call_tools_batched(mcp_client, function_calls, context_cache.input_schemas, on_progress))
+            async with aclosing(_relay_progress(tools, progress)) as statuses:
+                async for status in statuses:
+                    yield status
+            function_responses = tools.result()
+            contents.append(types.Content(role="model", parts=model_parts))
+            contents.append(types.Content(role="user", parts=function_responses))
+
+        if conversation:
+            conversation.record_exchange(prompt, "".join(answer_parts))
 
         # Yield a final message to indicate tool usage
         if is_tool_based:
             yield "\n\n(Tool-based.)"
-            
+
     except Exception as e:
-        print(f"Error calling the Gemini API with FastMCP: {e}")
-        yield "Sorry, I am unable to generate a response at this time."
\ No newline at end of file
+        logger.error("Error calling the Gemini API with FastMCP: %s", e)
+        yield "Sorry, I am unable to generate a response at this time."
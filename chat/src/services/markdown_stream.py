@@ -0,0 +1,246 @@
+"""
+Incremental Markdown-to-HTML rendering of streamed answers.
+
+`MarkdownStream.feed(chunk)` takes the model's text as it arrives and returns
+the HTML of the blocks that were finalized by it; `finish()` returns the rest.
+Each block is rendered exactly once, so the total work stays linear in the
+length of the answer, and nothing already sent is ever re-rendered.
+
+Blocks are only emitted once they can no longer change:
+
+- headings and horizontal rules when their line is complete
+- paragraphs at a blank line or when another block starts
+- code fences when the closing fence arrives
+- lists, tables and block quotes when a line that does not belong to them
+  arrives (a blank line inside a list keeps it open until the next line)
+
+All text is HTML-escaped; links are only kept for http(s), mailto and
+relative URLs. Supported inline markup: `code`, **bold**, *italic*, _italic_,
+~~strike~~ and [links](https://example.com).
+"""
+
+import html
+import re
+from typing import List, Optional, Tuple
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s{0,3}(`{3,}|~{3,})\s*([\w+-]*)")
+_RULE = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+_LIST_ITEM = re.compile(r"^(\s*)([-*+]|\d{1,9}[.)])\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{1,}:?\s*(\|\s*:?-{1,}:?\s*)*\|?\s*$")
+_QUOTE = re.compile(r"^\s{0,3}>\s?(.*)$")
+
+_CODE_SPAN = re.compile(r"(`+)(.+?)\1")
+_LINK = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+_BOLD = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_ITALIC = re.compile(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?!\*)|(?<![\w_])_(?!\s)(.+?)(?<!\s)_(?![\w_])")
+_STRIKE = re.compile(r"~~(.+?)~~")
+# A path on this site, but not //host (or /\host), which browsers read as another site
+_SAFE_URL = re.compile(r"^(https?://|mailto:|/(?![/\\])|#)", re.IGNORECASE)
+# Stands in for a rendered link while the emphasis passes run, so they never touch its URL
+_PLACEHOLDER = re.compile(r"\x00(\d+)\x00")
+
+
+def _emphasis(text: str) -> str:
+    text = _BOLD.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", text)
+    text = _ITALIC.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", text)
+    return _STRIKE.sub(r"<del>\1</del>", text)
+
+
+def _link(match: "re.Match[str]") -> str:
+    text, url = _emphasis(match.group(1)), match.group(2)
+    # The URL is already escaped; unescape to check the scheme
+    if not _SAFE_URL.match(html.unescape(url)):
+        return text
+    return f'<a href="{url}" target="_blank" rel="noopener noreferrer">{text}</a>'
+
+
+def _format(text: str) -> str:
+    links: List[str] = []
+
+    def hold(match: "re.Match[str]") -> str:
+        links.append(_link(match))
+        return f"\x00{len(links) - 1}\x00"
+
+    text = html.escape(text.replace("\x00", ""), quote=True)
+    text = _emphasis(_LINK.sub(hold, text))
+    return _PLACEHOLDER.sub(lambda m: links[int(m.group(1))], text)
+
+
+def render_inline(text: str) -> str:
+    """Renders inline markup of one block's text; code spans are left unformatted."""
+    parts = []
+    position = 0
+    for match in _CODE_SPAN.finditer(text):
+        parts.append(_format(text[position:match.start()]))
+        parts.append(f"<code>{html.escape(match.group(2).strip())}</code>")
+        position = match.end()
+    parts.append(_format(text[position:]))
+    return "".join(parts)
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def _split_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip() for cell in re.split(r"(?<!\\)\|", line)]
+
+
+def _render_list(items: List[Tuple[int, str, str]]) -> str:
+    """Renders (indent, marker, text) items, nesting the more indented ones."""
+    ordered = items[0][1][0].isdigit()
+    tag = "ol" if ordered else "ul"
+    start = int(items[0][1][:-1]) if ordered and items[0][1][:-1] != "1" else None
+    out = [f'<{tag} start="{start}">' if start is not None else f"<{tag}>"]
+    base = items[0][0]
+    index = 0
+    while index < len(items):
+        _, _, text = items[index]
+        children = []
+        index += 1
+        while index < len(items) and items[index][0] > base:
+            children.append(items[index])
+            index += 1
+        out.append(f"<li>{render_inline(text)}{_render_list(children) if children else ''}</li>")
+    out.append(f"</{tag}>")
+    return "".join(out)
+
+
+class MarkdownStream:
+    """Turns a stream of Markdown text chunks into a stream of finalized HTML blocks."""
+
+    def __init__(self):
+        self._partial = ""
+        # The open block: None, "paragraph", "fence", "list", "table" or "quote"
+        self._kind: Optional[str] = None
+        self._lines: List[str] = []
+        self._fence = ""
+        self._language = ""
+        # A blank line was seen inside a list; the next line decides whether it continues
+        self._list_gap = False
+
+    def feed(self, chunk: str) -> str:
+        """Adds a chunk of text and returns the HTML of the blocks it completed."""
+        self._partial += chunk
+        if "\n" not in chunk:
+            return ""
+        *lines, self._partial = self._partial.split("\n")
+        return "".join(self._line(line) for line in lines)
+
+    def finish(self) -> str:
+        """Renders whatever is still open at the end of the stream."""
+        out = self._line(self._partial) if self._partial else ""
+        self._partial = ""
+        return out + self._close()
+
+    def _close(self) -> str:
+        kind, lines = self._kind, self._lines
+        self._kind, self._lines, self._list_gap = None, [], False
+        if kind == "paragraph":
+            return "<p>" + "<br>".join(render_inline(line.strip()) for line in lines) + "</p>"
+        if kind == "fence":
+            language = f' class="language-{html.escape(self._language)}"' if self._language else ""
+            return f"<pre><code{language}>" + html.escape("\n".join(lines)) + "</code></pre>"
+        if kind == "list":
+            items = []
+            for line in lines:
+                match = _LIST_ITEM.match(line)
+                if match:
+                    items.append((_indent(match.group(1)), match.group(2), match.group(3)))
+                elif items:
+                    # A continuation line of the previous item
+                    indent, marker, text = items[-1]
+                    items[-1] = (indent, marker, f"{text} {line.strip()}")
+            return _render_list(items)
+        if kind == "table":
+            header, _, *rows = (_split_row(line) for line in lines)
+            out = ["<table><thead><tr>"]
+            out += [f"<th>{render_inline(cell)}</th>" for cell in header]
+            out.append("</tr></thead><tbody>")
+            for row in rows:
+                cells = (row + [""] * len(header))[:len(header)]
+                out.append("<tr>" + "".join(f"<td>{render_inline(cell)}</td>" for cell in cells) + "</tr>")
+            out.append("</tbody></table>")
+            return "".join(out)
+        if kind == "quote":
+            inner = MarkdownStream()
+            return "<blockquote>" + inner.feed("\n".join(lines) + "\n") + inner.finish() + "</blockquote>"
+        return ""
+
+    def _line(self, line: str) -> str:
+        line = line.rstrip("\r")
+
+        if self._kind == "fence":
+            match = _FENCE.match(line)
+            if match and match.group(1)[0] == self._fence[0] and len(match.group(1)) >= len(self._fence) and not match.group(2):
+                return self._close()
+            self._lines.append(line)
+            return ""
+
+        if self._kind == "list":
+            if not line.strip():
+                self._list_gap = True
+                return ""
+            if _LIST_ITEM.match(line) or (_indent(line) >= 2 and not self._list_gap):
+                self._list_gap = False
+                self._lines.append(line)
+                return ""
+            return self._close() + self._line(line)
+
+        if self._kind == "table":
+            if line.strip().startswith("|") or ("|" in line and line.strip()):
+                self._lines.append(line)
+                return ""
+            return self._close() + self._line(line)
+
+        if self._kind == "quote":
+            match = _QUOTE.match(line)
+            if match:
+                self._lines.append(match.group(1))
+                return ""
+            return self._close() + self._line(line)
+
+        if self._kind == "paragraph" and self._lines and _TABLE_SEPARATOR.match(line) and "|" in self._lines[-1]:
+            # The previous paragraph line turns out to be a table header
+            header = self._lines.pop()
+            out = self._close() if self._lines else ""
+            self._kind, self._lines = "table", [header, line]
+            return out
+
+        if not line.strip():
+            return self._close()
+
+        fence = _FENCE.match(line)
+        heading = _HEADING.match(line)
+        if fence or heading or _RULE.match(line) or _LIST_ITEM.match(line) or _QUOTE.match(line):
+            out = self._close()
+            if fence:
+                self._kind, self._fence, self._language = "fence", fence.group(1), fence.group(2)
+                return out
+            if heading:
+                level = len(heading.group(1))
+                return out + f"<h{level}>{render_inline(heading.group(2))}</h{level}>"
+            if _RULE.match(line):
+                return out + "<hr>"
+            if _LIST_ITEM.match(line):
+                self._kind, self._lines = "list", [line]
+                return out
+            self._kind, self._lines = "quote", [_QUOTE.match(line).group(1)]
+            return out
+
+        if self._kind != "paragraph":
+            self._kind, self._lines = "paragraph", []
+        self._lines.append(line)
+        return ""
+
+
+def render_markdown(text: str) -> str:
+    """Renders a complete Markdown text in one go."""
+    stream = MarkdownStream()
+    return stream.feed(text) + stream.finish()
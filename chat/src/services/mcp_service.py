@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+import httpx
+from fastmcp import Client
+from google.genai import types
+from .array_codec import encode_arguments, decode_result
+
+logger = logging.getLogger(__name__)
+
+# The MCP server's meta-tool that runs several tool calls and resource reads in one request
+BATCH_TOOL = "batch"
+
+# Receives (tool name, progress, total, status) for every progress notification of a call
+ProgressCallback = Callable[[str, float, Optional[float], str], Awaitable[None]]
+
+
+def is_mcp_ping(request: httpx.Request) -> bool:
+    """Tells the keep-warm pings (JSON-RPC "ping" requests) apart from real MCP traffic."""
+    try:
+        return request.method == "POST" and b'"method":"ping"' in request.content
+    except httpx.RequestNotRead:
+        return False
+
+
+def progress_status(progress: float, total: Optional[float], message: Optional[str]) -> str:
+    """
+    Returns the human-readable status of a progress notification. The MCP server
+    sends a JSON message with a "status" (and a "partial" result); any other
+    message is used as is.
+    """
+    if message:
+        try:
+            return str(json.loads(message)["status"])
+        except (ValueError, TypeError, KeyError):
+            return message
+    return f"{progress:g}/{total:g}" if total else f"{progress:g}"
+
+
+def progress_request_id(message: Optional[str]) -> Optional[Union[int, str]]:
+    """Returns the JSON-RPC request id the MCP server puts in its progress messages, if any."""
+    try:
+        return json.loads(message)["request_id"]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+async def call_tool_mcp(
+    mcp_client: Client,
+    name: str,
+    arguments: Dict[str, Any],
+    on_progress: Optional[ProgressCallback] = None
+) -> Any:
+    """
+    Calls a tool and relays its progress notifications. When the caller is
+    cancelled (e.g. the chat client went away), the server is told to cancel the
+    request too, so it stops working on it.
+
+    The request id to cancel comes from the server's progress messages, so only
+    calls that reported progress (the long-running ones) are cancelled. The
+    cancellation only reaches the call over a stateful session; over stateless
+    HTTP it arrives on a new session that does not know the request, and the
+    server finishes the call.
+    """
+    request_id: Optional[Union[int, str]] = None
+
+    async def progress_handler(progress: float, total: Optional[float], message: Optional[str]) -> None:
+        nonlocal request_id
+        if request_id is None:
+            request_id = progress_request_id(message)
+        if on_progress:
+            await on_progress(name, progress, total, progress_status(progress, total, message))
+
+    request = asyncio.ensure_future(mcp_client.call_tool_mcp(name, arguments, progress_handler=progress_handler))
+    try:
+        # Shielded, so the request is still registered with the session when we cancel it
+        return await asyncio.shield(request)
+    except asyncio.CancelledError:
+        request.cancel()
+        if request_id is not None:
+            try:
+                await mcp_client.cancel(request_id, "Cancelled by the chat service")
+            except Exception as e:
+                logger.warning("Could not cancel tool call %s: %s", name, e)
+        raise
+
+
+def tool_result_to_response(result: Any) -> Dict[str, Any]:
+    """Converts an MCP CallToolResult into a Gemini function response payload."""
+    if result.structuredContent is not None:
+        output: Any = decode_result(result.structuredContent)
+    else:
+        output = "\n".join(block.text for block in result.content if getattr(block, "text", None) is not None)
+    return {"error": output} if result.isError else {"result": output}
+
+
+async def call_tool(
+    mcp_client: Client,
+    function_call: types.FunctionCall,
+    input_schema: Optional[Dict[str, Any]] = None,
+    on_progress: Optional[ProgressCallback] = None
+) -> types.Part:
+    """
+    Runs a single Gemini function call on the MCP server. Large numeric lists are
+    sent as compact encoded arrays when the tool's input schema accepts them.
+    """
+    try:
+        arguments = encode_arguments(dict(function_call.args or {}), input_schema)
+        result = await call_tool_mcp(mcp_client, function_call.name, arguments, on_progress)
+        response = tool_result_to_response(result)
+    except Exception as e:
+        response = {"error": str(e)}
+    return types.Part.from_function_response(name=function_call.name, response=response)
+
+
+async def call_tools(
+    mcp_client: Client,
+    function_calls: List[types.FunctionCall],
+    input_schemas: Optional[Dict[str, Dict[str, Any]]] = None,
+    on_progress: Optional[ProgressCallback] = None
+) -> List[types.Part]:
+    """Runs the function calls of one model turn concurrently, keeping their order."""
+    input_schemas = input_schemas or {}
+    return list(await asyncio.gather(
+        *(call_tool(mcp_client, call, input_schemas.get(call.name), on_progress) for call in function_calls)
+    ))
+
+
+def batch_item_to_response(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts one item of a batch result into a Gemini function response payload."""
+    if "error" in item:
+        return {"error": item["error"]}
+    return {"result": decode_result(item.get("result"))}
+
+
+async def call_batch(
+    mcp_client: Client,
+    items: List[Dict[str, Any]],
+    on_progress: Optional[ProgressCallback] = None
+) -> List[Dict[str, Any]]:
+    """
+    Sends tool calls ({"tool", "arguments"}) and resource reads ({"resource"}) to
+    the server's batch tool in one round trip. Returns the per-item results in order.
+    """
+    result = await call_tool_mcp(mcp_client, BATCH_TOOL, {"items": items}, on_progress)
+    if result.isError or not result.structuredContent:
+        message = "\n".join(block.text for block in result.content if getattr(block, "text", None) is not None)
+        raise RuntimeError(f"Batch call failed: {message}")
+    return result.structuredContent["result"]
+
+
+async def read_resources(mcp_client: Client, uris: List[str]) -> List[Dict[str, Any]]:
+    """Reads several resources in one round trip; each result has a "result" or an "error"."""
+    return [batch_item_to_response(item) for item in await call_batch(mcp_client, [{"resource": uri} for uri in uris])]
+
+
+async def call_tools_batched(
+    mcp_client: Client,
+    function_calls: List[types.FunctionCall],
+    input_schemas: Optional[Dict[str, Dict[str, Any]]] = None,
+    on_progress: Optional[ProgressCallback] = None
+) -> List[types.Part]:
+    """
+    Runs the function calls of one model turn in a single batch request when the
+    server offers the batch tool, and as separate concurrent calls otherwise.
+    """
+    input_schemas = input_schemas or {}
+    if len(function_calls) < 2 or BATCH_TOOL not in input_schemas:
+        return await call_tools(mcp_client, function_calls, input_schemas, on_progress)
+
+    items = [
+        {"tool": call.name, "arguments": encode_arguments(dict(call.args or {}), input_schemas.get(call.name))}
+        for call in function_calls
+    ]
+    try:
+        results = await call_batch(mcp_client, items, on_progress)
+    except Exception as e:
+        # The tools are still reachable one by one, e.g. when the batch is too large
+        logger.warning("Falling back to separate tool calls: %s", e)
+        return await call_tools(mcp_client, function_calls, input_schemas, on_progress)
+    return [
+        types.Part.from_function_response(name=call.name, response=batch_item_to_response(item))
+        for call, item in zip(function_calls, results)
+    ]
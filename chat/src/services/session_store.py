@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Callable, Deque, List, Optional
+
+from google.genai import types
+
+# Rough heuristic used by Gemini docs: one token is about four characters.
+CHARS_PER_TOKEN = 4
+
+# How much of an evicted turn is kept in the running summary.
+SUMMARY_SNIPPET_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate that avoids a round trip to the count_tokens API."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+@dataclass
+class Turn:
+    role: str
+    text: str
+    tokens: int
+
+
+@dataclass
+class Conversation:
+    """
+    The history of a single chat session.
+
+    Token counts are kept as running totals so that compaction only touches
+    the turns it evicts instead of re-processing the whole transcript.
+    """
+    session_id: str
+    turns: Deque[Turn] = field(default_factory=deque)
+    summary: Deque[str] = field(default_factory=deque)
+    history_tokens: int = 0
+    summary_tokens: int = 0
+
+    def add_turn(self, role: str, text: str) -> None:
+        turn = Turn(role=role, text=text, tokens=estimate_tokens(text))
+        self.turns.append(turn)
+        self.history_tokens += turn.tokens
+
+    def record_exchange(self, prompt: str, answer: str) -> None:
+        self.add_turn("user", prompt)
+        self.add_turn("model", answer)
+
+    def compact(self, token_budget: int) -> None:
+        """
+        Folds the oldest turns into the summary until the history fits the budget.
+        The latest exchange is always kept verbatim.
+        """
+        summary_budget = token_budget // 4
+        while self.history_tokens + self.summary_tokens > token_budget and len(self.turns) > 2:
+            turn = self.turns.popleft()
+            self.history_tokens -= turn.tokens
+            self._add_to_summary(turn)
+            # The summary itself is bounded by dropping its oldest lines.
+            while self.summary_tokens > summary_budget and len(self.summary) > 1:
+                self.summary_tokens -= estimate_tokens(self.summary.popleft())
+
+    def _add_to_summary(self, turn: Turn) -> None:
+        speaker = "User" if turn.role == "user" else "Assistant"
+        text = " ".join(turn.text.split())
+        if len(text) > SUMMARY_SNIPPET_CHARS:
+            text = text[:SUMMARY_SNIPPET_CHARS] + "..."
+        line = f"{speaker}: {text}"
+        self.summary.append(line)
+        self.summary_tokens += estimate_tokens(line)
+
+    def build_contents(self, prompt: str) -> List[types.Content]:
+        """Returns the Gemini `contents` for a new prompt in this conversation."""
+        contents = []
+        if self.summary:
+            summary_text = "Summary of the earlier conversation:\n" + "\n".join(self.summary)
+            contents.append(types.Content(role="user", parts=[types.Part(text=summary_text)]))
+        for turn in self.turns:
+            contents.append(types.Content(role=turn.role, parts=[types.Part(text=turn.text)]))
+        contents.append(types.Content(role="user", parts=[types.Part(text=prompt)]))
+        return contents
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "summary": list(self.summary),
+            "turns": [[turn.role, turn.text] for turn in self.turns],
+        })
+
+    @classmethod
+    def from_json(cls, session_id: str, data: str) -> "Conversation":
+        payload = json.loads(data)
+        conversation = cls(session_id=session_id)
+        for line in payload["summary"]:
+            conversation.summary.append(line)
+            conversation.summary_tokens += estimate_tokens(line)
+        for role, text in payload["turns"]:
+            conversation.add_turn(role, text)
+        return conversation
+
+
+class SessionStore:
+    """
+    In-memory conversation store that evicts the least recently used session.
+
+    Exchanges of one session are serialized with `lock(session_id)`, so two
+    prompts sent at once do not interleave their turns; `session_exchange`
+    holds it from loading the conversation until it is saved.
+    """
+
+    def __init__(self, max_sessions: int = 1000, token_budget: int = 4000):
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        # Only sessions with an exchange in progress (or waiting) keep their lock
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        return lock
+
+    async def get(self, session_id: str) -> Conversation:
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            loaded = await self._load(session_id)
+            # Another request may have loaded it meanwhile
+            conversation = self._sessions.get(session_id) or loaded or Conversation(session_id=session_id)
+            self._sessions[session_id] = conversation
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return conversation
+
+    async def save(self, conversation: Conversation) -> None:
+        """Compacts a conversation to the token budget and persists it."""
+        conversation.compact(self.token_budget)
+        await self._persist(conversation)
+
+    def close(self) -> None:
+        pass
+
+    async def _load(self, session_id: str) -> Optional[Conversation]:
+        return None
+
+    async def _persist(self, conversation: Conversation) -> None:
+        # The in-memory store already holds the conversation by reference.
+        pass
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store backed by SQLite, with the in-memory LRU acting as a cache
+    so that only cache misses and writes touch the database. The queries run
+    on worker threads, never on the event loop.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 1000, token_budget: int = 4000):
+        super().__init__(max_sessions=max_sessions, token_budget=token_budget)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations (session_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    async def _load(self, session_id: str) -> Optional[Conversation]:
+        return await asyncio.to_thread(self._read, session_id)
+
+    async def _persist(self, conversation: Conversation) -> None:
+        # Serialized here, so the thread does not read a conversation that is still changing
+        await asyncio.to_thread(self._write, conversation.session_id, conversation.to_json())
+
+    def _read(self, session_id: str) -> Optional[Conversation]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM conversations WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return Conversation.from_json(session_id, row[0]) if row else None
+
+    def _write(self, session_id: str, data: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations (session_id, data) VALUES (?, ?)",
+                (session_id, data),
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def create_session_store() -> SessionStore:
+    """Creates the session store configured by the environment."""
+    max_sessions = int(os.getenv("CHAT_SESSION_MAX", "1000"))
+    token_budget = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "4000"))
+    db_path = os.getenv("CHAT_SESSION_DB")
+    if db_path:
+        return SQLiteSessionStore(db_path, max_sessions=max_sessions, token_budget=token_budget)
+    return SessionStore(max_sessions=max_sessions, token_budget=token_budget)
+
+
+async def session_exchange(
+    session_store: SessionStore,
+    session_id: str,
+    respond: Callable[[Conversation], AsyncGenerator[str, None]],
+) -> AsyncGenerator[str, None]:
+    """
+    Streams the response to one prompt of a session and persists the
+    conversation once it is complete. A second prompt of the same session
+    waits until the first one is saved.
+    """
+    async with session_store.lock(session_id):
+        conversation = await session_store.get(session_id)
+        async for chunk in respond(conversation):
+            yield chunk
+        await session_store.save(conversation)
@@ -1,56 +1,68 @@
+import html
 import os
+import uuid
 import asyncio
-from fastapi import APIRouter, Form, Depends
+from typing import Optional
+from fastapi import APIRouter, Form, Depends, Request
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastmcp import Client
 from pathlib import Path
 from google import genai
-from ..dependencies import get_mcp_client, get_gemini_client
+from shared.assets import AssetStore
+from ..dependencies import get_mcp_client, get_gemini_client, get_session_store, get_context_cache, get_assets
 from ..services.llm_service import generate_gemini_response
+from ..services.markdown_stream import MarkdownStream
+from ..services.session_store import SessionStore, session_exchange
+from ..services.context_cache import ContextCache
 
 router = APIRouter()
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-
 @router.get("/chat", response_class=HTMLResponse)
-async def get_chat_fragment():
+async def get_chat_fragment(request: Request, assets: AssetStore = Depends(get_assets)):
     """
-    Returns the core chat application HTML fragment for HTMX loading by
-    reading the contents of the chat.html file.
+    Returns the core chat application HTML fragment for HTMX loading from
+    the in-memory copy of chat.html, with ETag revalidation.
     """
-    # Construct the path to the chat.html file
-    file_path = BASE_DIR / "ui" / "chat.html"
-    
-    # Read the file and return its content as an HTMLResponse
-    return HTMLResponse(content=file_path.read_text(), status_code=200)
+    return assets.response("chat.html", request)
 
 @router.post("/chat")
 async def chat_response(
     prompt: str = Form(...),
+    session_id: Optional[str] = Form(None),
     gemini_client: genai.Client = Depends(get_gemini_client),
-    mcp_client: Client = Depends(get_mcp_client)
+    mcp_client: Client = Depends(get_mcp_client),
+    session_store: SessionStore = Depends(get_session_store),
+    context_cache: ContextCache = Depends(get_context_cache),
+    assets: AssetStore = Depends(get_assets)
 ):
-    # Read the chat response template file
-    template_path = BASE_DIR / "ui" / "chat_response_template.html"
-    template_content = template_path.read_text()
-    
-    # Split the template into two parts based on the comment placeholder
-    parts = template_content.split("<!-- The streamed response will be inserted here -->")
-    
-    # This is an async generator, so we can't just 'await' it.
-    response_stream = generate_gemini_response(prompt, gemini_client, mcp_client)
+    # The template is split once at startup on the response placeholder
+    parts = assets.split("chat_response_template.html")
+
+    # The chat fragment sends its session id so follow-up questions keep their context
+    session_id = session_id or uuid.uuid4().hex
 
     # Use a local async generator to format the HTML response chunks
-    async def chat_streamer():
+    async def chat_streamer(conversation):
+        # This is an async generator, so we can't just 'await' it.
+        response_stream = generate_gemini_response(prompt, gemini_client, mcp_client, conversation, context_cache)
+
         # Yield the first part of the template with the user's prompt formatted
-        yield parts[0].replace("{{ prompt }}", prompt)
-        
-        # Yield each text chunk from the Gemini stream
+        yield parts[0].replace("{{ prompt }}", html.escape(prompt))
+
+        # Render the Gemini stream to HTML as its Markdown blocks complete
+        markdown = MarkdownStream()
         async for chunk in response_stream:
-            yield chunk
+            rendered = markdown.feed(chunk)
+            if rendered:
+                yield rendered
+        yield markdown.finish()
 
         # Yield the final part of the template
         yield parts[1]
 
     # Return a StreamingResponse with the HTML content type
-    return StreamingResponse(chat_streamer(), media_type="text/html")
+    return StreamingResponse(
+        session_exchange(session_store, session_id, chat_streamer),
+        media_type="text/html",
+        headers={"X-Session-Id": session_id}
+    )
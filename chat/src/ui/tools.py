@@ -1,4 +1,5 @@
 import asyncio
+import logging
 from fastapi import APIRouter, Depends, Request
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
@@ -13,6 +14,7 @@ BASE_DIR = Path(__file__).resolve().parent
 templates = Jinja2Templates(directory=BASE_DIR)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.get("/tools", response_class=HTMLResponse)
 async def get_available_resources(request: Request, mcp_client: Client = Depends(get_mcp_client)):
@@ -41,5 +43,5 @@ async def get_available_resources(request: Request, mcp_client: Client = Depends
         )
         
     except Exception as e:
-        print(f"Error fetching available resources: {e}")
+        logger.error("Error fetching available resources: %s", e)
         return HTMLResponse("<p class='tools-error text-sm text-gray-500'>Failed to load resources.</p>")
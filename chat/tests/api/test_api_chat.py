@@ -0,0 +1,10 @@
+# tests/api/test_api_chat.py
+
+def test_chat_returns_session_id(test_client):
+    """Tests that /api/chat starts a session when none is given and keeps the one that is."""
+    response = test_client.post("/api/chat", data={"prompt": "Hello"})
+    assert response.status_code == 200
+    assert response.headers["X-Session-Id"]
+
+    response = test_client.post("/api/chat", data={"prompt": "Hello", "session_id": "abc"})
+    assert response.headers["X-Session-Id"] == "abc"
@@ -0,0 +1,13 @@
+# tests/api/test_api_metrics.py
+
+def test_metrics_include_load_and_cumulative_histograms(test_client):
+    """Tests the /api/metrics endpoint that the dashboard's performance panel samples."""
+    test_client.get("/api/tools")
+    response = test_client.get("/api/metrics")
+
+    assert response.status_code == 200
+    metrics = response.json()
+    assert metrics["load"]["accepting"] is True
+    assert metrics["latency"]["latency_seconds"]["count"] >= 1
+    assert set(metrics["ttft_seconds"]) == {"buckets", "count", "sum"}
+    assert "warmup" in metrics and "context_cache" in metrics
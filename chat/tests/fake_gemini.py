@@ -0,0 +1,70 @@
+# tests/fake_gemini.py
+
+"""
+An offline stand-in for the parts of `genai.Client` used by the chat service.
+Responses are scripted per model call; every request is recorded for assertions.
+"""
+
+import copy
+from types import SimpleNamespace
+from google.genai import types
+
+
+def text_chunk(text: str, cached_tokens: int = 0) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(cached_content_token_count=cached_tokens or None),
+    )
+
+
+def function_call_chunk(name: str, args: dict) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(
+            role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))]
+        ))],
+    )
+
+
+class FakeModels:
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.requests.append({"model": model, "contents": copy.deepcopy(contents), "config": config})
+        chunks = self.script.pop(0) if self.script else [text_chunk("ok")]
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        return stream()
+
+
+class FakeCaches:
+    def __init__(self, available: bool):
+        self.available = available
+        self.created = []
+        self.updated = []
+        self.deleted = []
+
+    async def create(self, model, config):
+        if not self.available:
+            raise RuntimeError("Cached content is too small")
+        name = f"cachedContents/{len(self.created) + 1}"
+        self.created.append((name, config))
+        return types.CachedContent(name=name, model=model)
+
+    async def update(self, name, config):
+        self.updated.append((name, config))
+        return types.CachedContent(name=name)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+class FakeGeminiClient:
+    def __init__(self, script=(), caching_available: bool = True):
+        self.models = FakeModels(script)
+        self.caches = FakeCaches(caching_available)
+        self.aio = SimpleNamespace(models=self.models, caches=self.caches)
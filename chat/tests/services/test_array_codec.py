@@ -0,0 +1,42 @@
+# tests/services/test_array_codec.py
+
+from src.services.array_codec import (
+    ENCODE_THRESHOLD,
+    decode_array,
+    decode_result,
+    encode_array,
+    encode_arguments,
+)
+
+# The input schema FastMCP generates for a parameter typed `list[float] | EncodedArray`
+SCHEMA = {
+    "$defs": {"EncodedArray": {"type": "object", "properties": {"encoding": {"const": "base64"}, "data": {"type": "string"}}}},
+    "properties": {
+        "data": {"anyOf": [{"type": "array", "items": {"type": "number"}}, {"$ref": "#/$defs/EncodedArray"}]},
+        "q": {"type": "array", "items": {"type": "number"}},
+    },
+}
+
+
+def test_round_trip_keeps_dtype():
+    floats = encode_array([1.5, -2.0, 3.25], compress=True)
+    assert floats["dtype"] == "float64"
+    assert decode_array(floats) == [1.5, -2.0, 3.25]
+
+    ints = encode_array([1, 2, 3])
+    assert ints["dtype"] == "int64"
+    assert decode_array(ints) == [1, 2, 3]
+
+
+def test_only_large_lists_accepted_by_the_tool_are_encoded():
+    large = [float(i) for i in range(ENCODE_THRESHOLD)]
+    arguments = encode_arguments({"data": large, "q": large}, SCHEMA)
+
+    assert arguments["data"]["encoding"] == "base64"
+    # q is a plain list[float] parameter on the server, so it stays JSON
+    assert arguments["q"] is large
+    assert encode_arguments({"data": [1.0, 2.0]}, SCHEMA) == {"data": [1.0, 2.0]}
+
+
+def test_encoded_results_are_decoded_for_the_model():
+    assert decode_result({"result": encode_array([0.5, 1.5])}) == {"result": [0.5, 1.5]}
@@ -0,0 +1,156 @@
+# tests/services/test_context_cache.py
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from mcp.types import Tool, CallToolResult, TextContent
+
+from src.services.context_cache import ContextCache
+from src.services.llm_service import generate_gemini_response, MODEL, SYSTEM_INSTRUCTION
+from tests.fake_gemini import FakeGeminiClient, text_chunk, function_call_chunk
+
+
+def make_mcp_client(tools=None):
+    mcp_client = AsyncMock()
+    mcp_client.list_tools.return_value = tools or [
+        Tool(name="add", description="Adds two numbers", inputSchema={
+            "type": "object",
+            "properties": {"a": {"type": "integer"}, "b": {"type": "integer"}},
+        })
+    ]
+    mcp_client.call_tool_mcp.return_value = CallToolResult(
+        content=[TextContent(type="text", text="5")], structuredContent={"result": 5}
+    )
+    return mcp_client
+
+
+async def collect(stream):
+    return "".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_requests_reference_cache_entry():
+    gemini = FakeGeminiClient(script=[[text_chunk("Hi", cached_tokens=120)], [text_chunk("Again", cached_tokens=120)]])
+    mcp_client = make_mcp_client()
+    cache = ContextCache(gemini, MODEL, SYSTEM_INSTRUCTION)
+
+    assert await collect(generate_gemini_response("Hello", gemini, mcp_client, context_cache=cache)) == "Hi"
+    await collect(generate_gemini_response("Hello", gemini, mcp_client, context_cache=cache))
+
+    # The prefix is cached once and every request references it instead of resending it
+    assert len(gemini.caches.created) == 1
+    cache_config = gemini.caches.created[0][1]
+    assert cache_config.system_instruction == SYSTEM_INSTRUCTION
+    assert cache_config.tools[0].function_declarations[0].name == "add"
+    for request in gemini.models.requests:
+        assert request["config"].cached_content == "cachedContents/1"
+        assert request["config"].system_instruction is None
+        assert request["config"].tools is None
+    assert cache.stats()["input_tokens_saved"] == 240
+    assert mcp_client.list_tools.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_inline_config():
+    gemini = FakeGeminiClient(caching_available=False)
+    cache = ContextCache(gemini, MODEL, SYSTEM_INSTRUCTION)
+
+    await collect(generate_gemini_response("Hello", gemini, make_mcp_client(), context_cache=cache))
+
+    config = gemini.models.requests[0]["config"]
+    assert config.cached_content is None
+    assert config.system_instruction == SYSTEM_INSTRUCTION
+    assert config.tools[0].function_declarations[0].name == "add"
+
+
+@pytest.mark.asyncio
+async def test_cache_is_extended_before_ttl_and_rebuilt_on_catalog_change():
+    gemini = FakeGeminiClient()
+    mcp_client = make_mcp_client()
+    cache = ContextCache(gemini, MODEL, SYSTEM_INSTRUCTION, ttl_seconds=60, refresh_margin_seconds=120)
+
+    await cache.get_config(mcp_client)
+    config = await cache.get_config(mcp_client)
+    # The TTL is within the refresh margin, so the entry is extended in the background rather than recreated
+    assert config.cached_content == "cachedContents/1"
+    await cache._background
+    assert gemini.caches.updated[0][0] == "cachedContents/1"
+    assert len(gemini.caches.created) == 1
+
+    mcp_client.list_tools.return_value = [Tool(name="multiply", inputSchema={"type": "object"})]
+    cache.invalidate()
+    await cache.get_config(mcp_client)
+    await cache._background
+    config = await cache.get_config(mcp_client)
+
+    # The old entry is left to expire, as requests started before may still reference it
+    assert gemini.caches.deleted == []
+    assert config.cached_content == "cachedContents/2"
+
+
+@pytest.mark.asyncio
+async def test_requests_do_not_wait_for_an_expired_cache_to_be_recreated(monkeypatch):
+    gemini = FakeGeminiClient()
+    mcp_client = make_mcp_client()
+    cache = ContextCache(gemini, MODEL, SYSTEM_INSTRUCTION)
+    await cache.refresh(mcp_client)
+    # The entry ran out while no request came in
+    cache._expires_at = 0.0
+    created = asyncio.Event()
+    original_create = gemini.caches.create
+
+    async def slow_create(model, config):
+        await created.wait()
+        return await original_create(model, config)
+
+    monkeypatch.setattr(gemini.caches, "create", slow_create)
+
+    config = await asyncio.wait_for(cache.get_config(mcp_client), timeout=1)
+    assert config.cached_content is None
+    assert config.system_instruction == SYSTEM_INSTRUCTION
+    created.set()
+    await cache._background
+    assert (await cache.get_config(mcp_client)).cached_content == "cachedContents/2"
+    await cache.close()
+    assert gemini.caches.deleted == ["cachedContents/2"]
+
+
+@pytest.mark.asyncio
+async def test_failed_creation_backs_off_and_is_logged_once(monkeypatch, caplog):
+    gemini = FakeGeminiClient()
+    cache = ContextCache(gemini, MODEL, SYSTEM_INSTRUCTION, catalog_check_seconds=60, ttl_seconds=3600)
+    attempts = []
+    error = RuntimeError("503 UNAVAILABLE")
+
+    async def failing_create(model, config):
+        attempts.append(model)
+        raise error
+
+    monkeypatch.setattr(gemini.caches, "create", failing_create)
+    for now in (0.0, 1.0):
+        await cache._create(now)
+        assert cache._retry_at == now + 60 * 2 ** (len(attempts) - 1)
+    assert len(caplog.records) == 1
+
+    # A prefix that is too small stays too small until the catalog changes
+    error = RuntimeError("Cached content is too small. total_token_count=300, min_total_token_count=1024")
+    await cache._create(2.0)
+    assert cache._retry_at == float("inf")
+
+
+@pytest.mark.asyncio
+async def test_function_calls_are_executed_on_mcp_server():
+    gemini = FakeGeminiClient(script=[
+        [function_call_chunk("add", {"a": 2, "b": 3})],
+        [text_chunk("The answer is 5.")],
+    ])
+    mcp_client = make_mcp_client()
+    cache = ContextCache(gemini, MODEL, SYSTEM_INSTRUCTION)
+
+    answer = await collect(generate_gemini_response("What is 2 + 3?", gemini, mcp_client, context_cache=cache))
+
+    assert answer == "The answer is 5.\n\n(Tool-based.)"
+    mcp_client.call_tool_mcp.assert_awaited_once()
+    assert mcp_client.call_tool_mcp.await_args.args == ("add", {"a": 2, "b": 3})
+    function_response = gemini.models.requests[1]["contents"][-1].parts[0].function_response
+    assert function_response.response == {"result": {"result": 5}}
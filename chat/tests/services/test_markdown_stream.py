@@ -0,0 +1,92 @@
+# tests/services/test_markdown_stream.py
+
+from src.services.markdown_stream import MarkdownStream, render_markdown
+
+
+def stream(chunks):
+    """Feeds the chunks one by one and returns what each feed returned, plus finish()."""
+    markdown = MarkdownStream()
+    return [markdown.feed(chunk) for chunk in chunks] + [markdown.finish()]
+
+
+def test_text_is_escaped_and_unsafe_links_are_dropped():
+    html = render_markdown("<script>alert(1)</script> [a](javascript:alert(1)) [b](https://x.org/?a=1&b=2)")
+
+    assert "<script>" not in html
+    assert "&lt;script&gt;" in html
+    assert 'href="javascript' not in html
+    assert '<a href="https://x.org/?a=1&amp;b=2" target="_blank" rel="noopener noreferrer">b</a>' in html
+
+
+def test_protocol_relative_links_are_dropped():
+    html = render_markdown("[a](//evil.example/x) [b](/\\evil.example) [c](/local)")
+
+    assert html == '<p>a b <a href="/local" target="_blank" rel="noopener noreferrer">c</a></p>'
+
+
+def test_inline_markup():
+    html = render_markdown("Some **bold**, *italic* and `<code> **not bold**`.")
+
+    assert html == "<p>Some <strong>bold</strong>, <em>italic</em> and <code>&lt;code&gt; **not bold**</code>.</p>"
+
+
+def test_emphasis_stays_out_of_link_urls():
+    html = render_markdown("See [**x**](https://a.com/**b**_c_) and **[y](/y_z_)**.")
+
+    assert html == (
+        '<p>See <a href="https://a.com/**b**_c_" target="_blank" rel="noopener noreferrer"><strong>x</strong></a>'
+        ' and <strong><a href="/y_z_" target="_blank" rel="noopener noreferrer">y</a></strong>.</p>'
+    )
+
+
+def test_paragraph_is_emitted_at_the_blank_line_only():
+    outputs = stream(["Hello ", "world.\nSecond line", ".\n", "\n", "Next"])
+
+    assert outputs[:3] == ["", "", ""]
+    assert outputs[3] == "<p>Hello world.<br>Second line.</p>"
+    assert outputs[4] == ""
+    assert outputs[5] == "<p>Next</p>"
+
+
+def test_code_fence_is_held_until_it_closes():
+    outputs = stream(["Code:\n\n```python\n", "x = 1 < 2\n", "\n", "y = 3\n", "``", "`\n", "After"])
+
+    assert outputs[0] == "<p>Code:</p>"
+    assert outputs[1:5] == ["", "", "", ""]
+    assert outputs[5] == '<pre><code class="language-python">x = 1 &lt; 2\n\ny = 3</code></pre>'
+    assert outputs[6:] == ["", "<p>After</p>"]
+
+
+def test_list_is_held_until_a_line_outside_it():
+    outputs = stream(["- one\n", "- two\n", "  - nested\n", "\n", "- three\n", "\n", "Done.\n"])
+
+    assert all(output == "" for output in outputs[:6])
+    assert outputs[6] == "<ul><li>one</li><li>two<ul><li>nested</li></ul></li><li>three</li></ul>"
+    assert outputs[7] == "<p>Done.</p>"
+
+
+def test_table_is_held_until_it_ends():
+    outputs = stream(["| a | b |\n", "|---|---|\n", "| 1 | <2> |\n", "| 3 |\n", "\n"])
+
+    assert outputs[:4] == ["", "", "", ""]
+    assert outputs[4] == (
+        "<table><thead><tr><th>a</th><th>b</th></tr></thead><tbody>"
+        "<tr><td>1</td><td>&lt;2&gt;</td></tr><tr><td>3</td><td></td></tr></tbody></table>"
+    )
+
+
+def test_chunking_does_not_change_the_output():
+    text = (
+        "# Title\n\nIntro with **bold** text.\n\n1. first\n2. second\n\n"
+        "> quoted *line*\n\n---\n\n```\ncode\n```\n| x | y |\n| - | - |\n| 1 | 2 |\n\nEnd."
+    )
+    whole = render_markdown(text)
+
+    for size in (1, 3, 7):
+        assert "".join(stream([text[i:i + size] for i in range(0, len(text), size)])) == whole
+    assert whole.startswith("<h1>Title</h1><p>Intro with <strong>bold</strong> text.</p><ol><li>first</li>")
+    assert "<blockquote><p>quoted <em>line</em></p></blockquote><hr>" in whole
+
+
+def test_unclosed_fence_is_rendered_at_the_end():
+    assert "".join(stream(["```\n", "never closed"])) == "<pre><code>never closed</code></pre>"
@@ -0,0 +1,144 @@
+# tests/services/test_mcp_service.py
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock
+from google.genai import types
+from mcp.types import CallToolResult, TextContent
+
+from src.services.context_cache import ContextCache
+from src.services.llm_service import _relay_progress, generate_gemini_response, MODEL, SYSTEM_INSTRUCTION
+from src.services.mcp_service import BATCH_TOOL, call_tools_batched, read_resources
+from tests.fake_gemini import FakeGeminiClient, text_chunk, function_call_chunk
+
+SCHEMAS = {"add": {"type": "object"}, BATCH_TOOL: {"type": "object"}}
+
+
+def add_calls(count):
+    return [types.FunctionCall(name="add", args={"a": i, "b": 1}) for i in range(count)]
+
+
+def batch_result(items):
+    return CallToolResult(content=[TextContent(type="text", text="[]")], structuredContent={"result": items})
+
+
+@pytest.mark.asyncio
+async def test_function_calls_of_one_turn_are_sent_in_one_batch():
+    mcp_client = AsyncMock()
+    mcp_client.call_tool_mcp.return_value = batch_result([
+        {"index": 0, "tool": "add", "result": {"result": 1}},
+        {"index": 1, "tool": "add", "error": "bad arguments"},
+    ])
+
+    parts = await call_tools_batched(mcp_client, add_calls(2), SCHEMAS)
+
+    mcp_client.call_tool_mcp.assert_awaited_once()
+    assert mcp_client.call_tool_mcp.await_args.args == (BATCH_TOOL, {"items": [
+        {"tool": "add", "arguments": {"a": 0, "b": 1}},
+        {"tool": "add", "arguments": {"a": 1, "b": 1}},
+    ]})
+    assert parts[0].function_response.response == {"result": {"result": 1}}
+    assert parts[1].function_response.response == {"error": "bad arguments"}
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_separate_calls_without_batch_tool_or_on_failure():
+    mcp_client = AsyncMock()
+    mcp_client.call_tool_mcp.return_value = CallToolResult(content=[TextContent(type="text", text="1")], structuredContent={"result": 1})
+    await call_tools_batched(mcp_client, add_calls(3), {"add": {"type": "object"}})
+    assert [call.args[0] for call in mcp_client.call_tool_mcp.await_args_list] == ["add"] * 3
+
+    mcp_client = AsyncMock()
+    mcp_client.call_tool_mcp.side_effect = [
+        CallToolResult(content=[TextContent(type="text", text="too many items")], isError=True),
+        CallToolResult(content=[TextContent(type="text", text="1")], structuredContent={"result": 1}),
+        CallToolResult(content=[TextContent(type="text", text="2")], structuredContent={"result": 2}),
+    ]
+    parts = await call_tools_batched(mcp_client, add_calls(2), SCHEMAS)
+    assert [part.function_response.response for part in parts] == [{"result": {"result": 1}}, {"result": {"result": 2}}]
+
+
+@pytest.mark.asyncio
+async def test_read_resources_in_one_round_trip():
+    mcp_client = AsyncMock()
+    mcp_client.call_tool_mcp.return_value = batch_result([
+        {"index": 0, "resource": "greetings://Ada", "result": "Hello, Ada!"},
+        {"index": 1, "resource": "greetings://", "error": "Unknown resource"},
+    ])
+    responses = await read_resources(mcp_client, ["greetings://Ada", "greetings://"])
+    assert responses == [{"result": "Hello, Ada!"}, {"error": "Unknown resource"}]
+
+
+@pytest.mark.asyncio
+async def test_progress_is_relayed_into_the_response_stream():
+    async def slow_tool(name, arguments, progress_handler):
+        await progress_handler(1, 2, '{"status": "1/2 chunks", "partial": {"count": 5}}')
+        await progress_handler(2, 2, "almost there")
+        return CallToolResult(content=[TextContent(type="text", text="10")], structuredContent={"result": 10})
+
+    gemini = FakeGeminiClient(script=[[function_call_chunk("running_statistics", {"data": [1, 2]})], [text_chunk("Done.")]])
+    mcp_client = AsyncMock()
+    mcp_client.call_tool_mcp.side_effect = slow_tool
+    cache = ContextCache(gemini, MODEL, SYSTEM_INSTRUCTION, enabled=False)
+
+    chunks = [chunk async for chunk in generate_gemini_response("Stats?", gemini, mcp_client, context_cache=cache)]
+
+    assert chunks == [
+        "\n\n(running_statistics: 1/2 chunks)\n\n",
+        "\n\n(running_statistics: almost there)\n\n",
+        "Done.",
+        "\n\n(Tool-based.)",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_status_lines_queued_as_the_calls_finish_are_not_dropped():
+    progress: asyncio.Queue = asyncio.Queue()
+
+    async def tools():
+        for i in range(3):
+            progress.put_nowait(f"status {i}")
+        return []
+
+    statuses = [status async for status in _relay_progress(tools(), progress)]
+
+    assert statuses == ["status 0", "status 1", "status 2"]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_call_cancels_it_on_the_server():
+    started = asyncio.Event()
+    mcp_client = AsyncMock()
+
+    async def hanging_tool(name, arguments, progress_handler):
+        await progress_handler(1, 10, json.dumps({"status": "1/10 chunks", "request_id": 7}))
+        started.set()
+        await asyncio.sleep(60)
+
+    mcp_client.call_tool_mcp.side_effect = hanging_tool
+    task = asyncio.create_task(call_tools_batched(mcp_client, add_calls(1), SCHEMAS))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    mcp_client.cancel.assert_awaited_once_with(7, "Cancelled by the chat service")
+
+
+@pytest.mark.asyncio
+async def test_calls_without_progress_are_not_cancelled_on_the_server():
+    started = asyncio.Event()
+    mcp_client = AsyncMock()
+
+    async def hanging_tool(name, arguments, progress_handler):
+        started.set()
+        await asyncio.sleep(60)
+
+    mcp_client.call_tool_mcp.side_effect = hanging_tool
+    task = asyncio.create_task(call_tools_batched(mcp_client, add_calls(1), SCHEMAS))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # Without a request id from the server there is nothing to send
+    mcp_client.cancel.assert_not_awaited()
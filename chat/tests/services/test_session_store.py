@@ -0,0 +1,105 @@
+# tests/services/test_session_store.py
+
+import asyncio
+import threading
+
+import pytest
+
+from src.services.session_store import (
+    Conversation,
+    SessionStore,
+    SQLiteSessionStore,
+    estimate_tokens,
+    session_exchange,
+)
+
+
+@pytest.mark.asyncio
+async def test_store_evicts_least_recently_used_session():
+    store = SessionStore(max_sessions=2)
+    first = await store.get("a")
+    await store.get("b")
+    # Touch "a" so that "b" becomes the least recently used session
+    assert await store.get("a") is first
+    await store.get("c")
+
+    assert len(store) == 2
+    assert await store.get("a") is first
+    assert (await store.get("b")).turns == type(first.turns)()
+
+
+def test_build_contents_appends_prompt_to_history():
+    conversation = Conversation(session_id="s")
+    conversation.record_exchange("What is 2 + 2?", "4")
+
+    contents = conversation.build_contents("And times 3?")
+
+    assert [content.role for content in contents] == ["user", "model", "user"]
+    assert contents[-1].parts[0].text == "And times 3?"
+
+
+@pytest.mark.asyncio
+async def test_compaction_keeps_history_within_budget():
+    budget = 100
+    store = SessionStore(token_budget=budget)
+    conversation = await store.get("s")
+
+    for i in range(50):
+        conversation.record_exchange(f"question {i} " + "x" * 80, f"answer {i} " + "y" * 80)
+        await store.save(conversation)
+        # Only the latest exchange may exceed the budget on its own
+        assert conversation.history_tokens + conversation.summary_tokens <= budget or len(conversation.turns) == 2
+
+    # The latest exchange is kept verbatim, older turns are summarized
+    assert conversation.turns[-2].text.startswith("question 49")
+    assert conversation.summary
+    assert conversation.history_tokens == sum(turn.tokens for turn in conversation.turns)
+    assert conversation.summary_tokens == sum(estimate_tokens(line) for line in conversation.summary)
+
+    contents = conversation.build_contents("next")
+    assert contents[0].parts[0].text.startswith("Summary of the earlier conversation")
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_persists_conversations_off_the_event_loop(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(db_path)
+    threads = []
+    for name in ("_read", "_write"):
+        method = getattr(store, name)
+        monkeypatch.setattr(store, name, lambda *args, method=method: threads.append(threading.get_ident()) or method(*args))
+
+    conversation = await store.get("s")
+    conversation.record_exchange("hello", "hi there")
+    await store.save(conversation)
+    store.close()
+    assert len(threads) == 2 and threading.get_ident() not in threads
+
+    reopened = SQLiteSessionStore(db_path)
+    restored = await reopened.get("s")
+    assert [(turn.role, turn.text) for turn in restored.turns] == [("user", "hello"), ("model", "hi there")]
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_exchanges_of_one_session_do_not_interleave(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+    def respond(prompt):
+        async def stream(conversation):
+            conversation.add_turn("user", prompt)
+            yield "thinking"
+            await asyncio.sleep(0.01)
+            conversation.add_turn("model", f"answer to {prompt}")
+        return stream
+
+    async def exchange(session_id, prompt):
+        return [chunk async for chunk in session_exchange(store, session_id, respond(prompt))]
+
+    await asyncio.gather(*(exchange("s", f"q{i}") for i in range(5)), exchange("other", "q"))
+
+    turns = [turn.text for turn in (await store.get("s")).turns]
+    assert turns == [text for i in range(5) for text in (f"q{i}", f"answer to q{i}")]
+    # Locks are only kept while an exchange needs them
+    assert not store._locks
+    store.close()
@@ -0,0 +1,31 @@
+# tests/test_histogram.py
+
+import pytest
+
+from shared.histogram import Histogram, delta, quantile
+
+
+def test_quantiles_are_interpolated_within_their_bucket():
+    histogram = Histogram(bounds=(0.1, 0.2, 0.4))
+    for seconds in (0.05, 0.15, 0.15, 0.3):
+        histogram.observe(seconds)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == [1, 2, 1, 0]
+    assert quantile(snapshot, 0.5, bounds=(0.1, 0.2, 0.4)) == pytest.approx(0.15)
+    assert quantile(snapshot, 1.0, bounds=(0.1, 0.2, 0.4)) == 0.4
+    assert quantile(Histogram().snapshot(), 0.5) is None
+
+
+def test_delta_covers_only_the_interval_between_snapshots():
+    histogram = Histogram()
+    histogram.observe(0.002)
+    previous = histogram.snapshot()
+    histogram.observe(2.0)
+    histogram.observe(2.0)
+
+    recent = delta(histogram.snapshot(), previous)
+    assert recent["count"] == 2
+    assert 1.0 < quantile(recent, 0.5) <= 2.5
+    # After a restart the counts went down: the new snapshot is the interval
+    assert delta(Histogram().snapshot(), previous)["count"] == 0
@@ -0,0 +1,92 @@
+# tests/test_inflight.py
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from shared.inflight import InflightMiddleware, InflightRegistry
+
+
+def streaming_app(release: asyncio.Event):
+    """An ASGI app that streams one chunk, then waits for `release` before the last one."""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"first", "more_body": True})
+        await release.wait()
+        await send({"type": "http.response.body", "body": b"last"})
+    return app
+
+
+async def request(middleware, path="/ui/chat"):
+    """Sends a request through the middleware and returns the messages it sent back."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware({"type": "http", "method": "POST", "path": path, "headers": []}, receive, send)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_open_streams_are_registered_until_their_last_byte():
+    registry = InflightRegistry()
+    release = asyncio.Event()
+    middleware = InflightMiddleware(streaming_app(release), registry)
+
+    task = asyncio.create_task(request(middleware))
+    await asyncio.sleep(0.01)
+    load = registry.load()
+    assert (load["in_flight"], load["streams"], load["accepting"]) == (1, 1, True)
+    assert load["stream_age_seconds"]["max"] > 0
+
+    release.set()
+    await task
+    load = registry.load()
+    assert (load["in_flight"], load["streams"], load["completed"], load["streams_completed"]) == (0, 0, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_drain_refuses_new_requests_and_waits_for_open_streams():
+    registry = InflightRegistry()
+    release = asyncio.Event()
+    middleware = InflightMiddleware(streaming_app(release), registry)
+
+    stream = asyncio.create_task(request(middleware))
+    await asyncio.sleep(0.01)
+    drain = asyncio.create_task(registry.drain(timeout=5))
+    await asyncio.sleep(0.01)
+
+    refused = await request(middleware)
+    assert refused[0]["status"] == 503
+    assert (b"connection", b"close") in refused[0]["headers"]
+    assert not drain.done()
+
+    release.set()
+    sent = await stream
+    assert [message.get("body") for message in sent[1:]] == [b"first", b"last"]
+    assert await drain == 0
+    assert registry.load()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_drain_gives_up_at_the_deadline():
+    registry = InflightRegistry()
+    middleware = InflightMiddleware(streaming_app(asyncio.Event()), registry)
+
+    stream = asyncio.create_task(request(middleware))
+    await asyncio.sleep(0.01)
+
+    assert await registry.drain(timeout=0.05) == 1
+    stream.cancel()
+
+
+def test_load_endpoint(test_client: TestClient):
+    response = test_client.get("/load")
+
+    assert response.status_code == 200
+    assert response.json()["accepting"] is True
@@ -0,0 +1,97 @@
+# tests/test_profiling.py
+
+import asyncio
+import threading
+import time
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from shared.profiling import LoopMonitor, Profiler, flame_graph, sample_stacks
+
+ADMIN = {"Authorization": "Bearer secret"}
+
+
+def profiled_app(profiler: Profiler) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"item": item_id, "payload": "x" * 100_000}
+
+    profiler.install(app)
+    return app
+
+
+def spin(seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+def test_cpu_samples_show_the_busy_function_in_the_flame_graph():
+    busy = threading.Thread(target=spin, args=(0.3,))
+    busy.start()
+    stacks = sample_stacks(0.2, 0.005)
+    busy.join()
+
+    assert any(stack.endswith(f"spin (test_profiling.py:{spin.__code__.co_firstlineno})") for stack in stacks)
+    svg = flame_graph(stacks)
+    assert svg.startswith("<svg") and "spin (test_profiling.py" in svg
+
+
+@pytest.mark.asyncio
+async def test_loop_stalls_are_recorded_with_the_blocking_stack():
+    monitor = LoopMonitor(threshold=0.05)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    time.sleep(0.2)  # Blocks the event loop
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    assert monitor.count == 1
+    stall = monitor.stalls[0]
+    assert stall["blocked_ms"] >= 100
+    assert "time.sleep(0.2)" in stall["stack"][-1]
+
+
+def test_disabled_profiler_installs_nothing():
+    app = profiled_app(Profiler(token=""))
+
+    assert app.user_middleware == []
+    with TestClient(app) as client:
+        assert client.get("/admin/profiling/routes", headers=ADMIN).status_code == 404
+
+
+def test_profiling_routes_require_the_admin_token():
+    with TestClient(profiled_app(Profiler(token="secret"))) as client:
+        assert client.get("/admin/profiling/routes").status_code == 401
+        assert client.get("/admin/profiling/routes", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get("/admin/profiling/routes", headers=ADMIN).status_code == 200
+
+
+def test_routes_are_tracked_by_template_with_their_allocations():
+    with TestClient(profiled_app(Profiler(token="secret"))) as client:
+        client.get("/items/1")
+        assert client.post("/admin/profiling/memory/start", headers=ADMIN).json()["tracing"] is True
+        try:
+            base = client.post("/admin/profiling/memory/snapshot", headers=ADMIN).json()["id"]
+            client.get("/items/2")
+            diff = client.get("/admin/profiling/memory/diff", params={"base": base}, headers=ADMIN).json()
+            routes = client.get("/admin/profiling/routes", headers=ADMIN).json()
+        finally:
+            client.post("/admin/profiling/memory/stop", headers=ADMIN)
+
+    assert not tracemalloc.is_tracing()
+    assert diff["base"] == base and diff["target"] == base + 1
+    assert routes["GET /items/{item_id}"]["calls"] == 2
+    assert routes["GET /items/{item_id}"]["traced_calls"] == 1
+    assert routes["GET /items/{item_id}"]["allocated_bytes_max"] > 0
+
+
+def test_memory_snapshots_need_tracemalloc():
+    with TestClient(profiled_app(Profiler(token="secret"))) as client:
+        assert client.post("/admin/profiling/memory/snapshot", headers=ADMIN).status_code == 409
+        assert client.get("/admin/profiling/memory/diff", params={"base": 7}, headers=ADMIN).status_code == 404
@@ -0,0 +1,68 @@
+# tests/test_streaming_compression.py
+
+import asyncio
+import zlib
+import brotli
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.testclient import TestClient
+from shared.compression import BrotliEncoder, GzipEncoder, StreamingCompressionMiddleware, ZstdEncoder
+
+
+def test_each_chunk_is_decodable_on_arrival():
+    encoder = GzipEncoder()
+    decoder = zlib.decompressobj(31)
+
+    for text in [b"<div>Hello", b" world", b"</div>"]:
+        # Everything sent so far can be decoded without waiting for the end of the stream
+        assert decoder.decompress(encoder.chunk(text)) == text
+    decoder.decompress(encoder.finish())
+    assert decoder.eof
+
+
+def test_brotli_and_zstd_chunks_are_decodable_on_arrival():
+    for encoder, decode in [
+        (BrotliEncoder(), brotli.Decompressor().process),
+        (ZstdEncoder(), zstandard.ZstdDecompressor().decompressobj().decompress),
+    ]:
+        for text in [b"<div>Hello", b" world", b"</div>"]:
+            assert decode(encoder.chunk(text)) == text
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(StreamingCompressionMiddleware)
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(20):
+                yield f"<p>chunk {i} of a streamed answer</p>\n"
+                await asyncio.sleep(0)
+        return StreamingResponse(chunks(), media_type="text/html")
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok")
+
+    return app
+
+
+def test_streamed_response_is_compressed():
+    client = TestClient(make_app())
+    expected = "".join(f"<p>chunk {i} of a streamed answer</p>\n" for i in range(20))
+
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+
+    assert len(raw) < len(expected)
+    assert zlib.decompress(raw, 31).decode() == expected
+
+
+def test_small_and_unaccepted_responses_are_not_compressed():
+    client = TestClient(make_app())
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/stream", headers={"Accept-Encoding": "identity"}).headers
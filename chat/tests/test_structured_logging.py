@@ -0,0 +1,68 @@
+# tests/test_structured_logging.py
+
+import json
+import logging
+import queue
+import sys
+from shared.structured_logging import DeferredQueueHandler, JsonFormatter, SamplingFilter, parse_sampling
+
+
+class Expensive:
+    formatted = 0
+
+    def __str__(self):
+        Expensive.formatted += 1
+        return "expensive"
+
+
+def make_logger(name, handler, level=logging.INFO):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def test_records_are_formatted_in_the_writer_not_the_caller():
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    logger = make_logger("test.deferred", handler)
+
+    logger.debug("disabled %s", Expensive())
+    logger.info("queued %s", Expensive())
+    assert Expensive.formatted == 0
+
+    record = handler.queue.get_nowait()
+    assert handler.queue.empty()
+    line = json.loads(JsonFormatter("chat").format(record))
+    assert Expensive.formatted == 1
+    assert line["message"] == "queued expensive"
+    assert (line["severity"], line["service"], line["logger"]) == ("INFO", "chat", "test.deferred")
+
+
+def test_json_lines_include_extra_fields_and_exceptions():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.getLogger("test.json").makeRecord(
+            "test.json", logging.ERROR, __file__, 1, "failed for %s", ("ada",), sys.exc_info(), extra={"session_id": "abc"}
+        )
+    line = json.loads(JsonFormatter("chat").format(record))
+    assert line["message"] == "failed for ada"
+    assert line["session_id"] == "abc"
+    assert "ValueError: boom" in line["exception"]
+
+
+def test_sampling_keeps_a_fraction_below_warning():
+    sampler = SamplingFilter(parse_sampling("uvicorn.access=0, noisy=0.5"))
+    assert sampler.rate("uvicorn.access") == 0
+    assert sampler.rate("noisy.child") == 0.5
+    assert sampler.rate("quiet") == 1.0
+
+    def record(name, level):
+        return logging.makeLogRecord({"name": name, "levelno": level})
+
+    assert not sampler.filter(record("uvicorn.access", logging.INFO))
+    assert sampler.filter(record("uvicorn.access", logging.WARNING))
+    assert sampler.filter(record("quiet", logging.DEBUG))
+    kept = sum(sampler.filter(record("noisy", logging.INFO)) for _ in range(2000))
+    assert 800 < kept < 1200
@@ -0,0 +1,124 @@
+# tests/test_warmup.py
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from shared.warmup import KeepWarm
+
+
+class KeepAliveServer:
+    """A minimal HTTP/1.1 server that keeps connections open and counts them."""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = []
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                method, path = head.decode().split(" ")[:2]
+                self.requests.append(method)
+                if path == "/stream":
+                    # An event stream that ends a moment after its only event
+                    writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n9\r\ndata: 1\n\n\r\n")
+                    await writer.drain()
+                    await asyncio.sleep(0.05)
+                    writer.write(b"0\r\n\r\n")
+                else:
+                    body = b"" if method == "HEAD" else b"ok"
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n" + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    async def __aenter__(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def __aexit__(self, *args) -> None:
+        self.server.close()
+
+
+@pytest.mark.asyncio
+async def test_requests_that_reuse_a_pooled_connection_are_warm():
+    server = KeepAliveServer()
+    keep_warm = KeepWarm(enabled=False)
+    async with server as url:
+        for _ in range(3):
+            # Short-lived clients share the pooled connection
+            async with httpx.AsyncClient(transport=keep_warm.transport("svc")) as client:
+                assert (await client.get(url)).text == "ok"
+        await keep_warm.stop()
+
+    assert server.connections == 1
+    assert keep_warm.stats()["upstreams"]["svc"] | {"last_ping_ms": None} == {
+        "requests": 3, "warm": 2, "cold": 1, "warm_ratio": 2 / 3,
+        "pings": 0, "ping_failures": 0, "ping_cold": 0, "last_ping_ms": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_start_opens_connections_that_requests_then_reuse():
+    server = KeepAliveServer()
+    keep_warm = KeepWarm(interval=60, connections=2, enabled=True)
+    async with server as url:
+        keep_warm.add_http("svc", url)
+        keep_warm.start()
+        for _ in range(100):
+            if keep_warm.upstreams["svc"].pings == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        async with httpx.AsyncClient(transport=keep_warm.transport("svc")) as client:
+            await asyncio.gather(client.get(url), client.get(url))
+        await keep_warm.stop()
+
+    stats = keep_warm.stats()["upstreams"]["svc"]
+    assert server.requests == ["HEAD", "HEAD", "GET", "GET"]
+    assert server.connections == 2
+    assert (stats["warm"], stats["cold"], stats["pings"], stats["ping_cold"]) == (2, 0, 2, 2)
+
+
+@pytest.mark.asyncio
+async def test_busy_upstreams_are_not_pinged_and_failures_are_counted():
+    keep_warm = KeepWarm(interval=60, enabled=False)
+    pinged = []
+
+    async def ping():
+        pinged.append(True)
+
+    async def broken_ping():
+        raise ConnectionError("down")
+
+    keep_warm.add_ping("busy", ping)
+    keep_warm.add_ping("down", broken_ping)
+    keep_warm.upstreams["busy"].last_used = time.monotonic()
+
+    await keep_warm.warm()
+
+    assert pinged == []
+    assert keep_warm.upstreams["down"].ping_failures == 1
+
+
+@pytest.mark.asyncio
+async def test_streams_closed_early_are_drained_so_their_connection_is_reused():
+    server = KeepAliveServer()
+    keep_warm = KeepWarm(enabled=False)
+    async with server as url:
+        async with httpx.AsyncClient(transport=keep_warm.transport("svc", drain_timeout=1.0)) as client:
+            for _ in range(2):
+                async with client.stream("GET", f"{url}/stream") as response:
+                    # Stop after the first event, like the MCP client does
+                    async for chunk in response.aiter_bytes():
+                        assert chunk == b"data: 1\n\n"
+                        break
+        await keep_warm.stop()
+
+    assert server.connections == 1
+    assert keep_warm.stats()["upstreams"]["svc"]["warm"] == 1
@@ -0,0 +1,57 @@
+# tests/ui/test_ui_assets.py
+
+import os
+import re
+from fastapi.testclient import TestClient
+from shared.assets import AssetStore, IMMUTABLE_CACHE_CONTROL
+
+
+def test_chat_fragment_is_served_with_etag(test_client: TestClient):
+    response = test_client.get("/ui/chat")
+    assert response.status_code == 200
+    assert "chat-form" in response.text
+    etag = response.headers["etag"]
+
+    # A revalidation with the same ETag does not resend the body
+    response = test_client.get("/ui/chat", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_static_files_are_fingerprinted_and_precompressed(test_client: TestClient):
+    index = test_client.get("/")
+    match = re.search(r'href="(/static/styles\.[0-9a-f]{8}\.css)"', index.text)
+    assert match, "index.html should link the fingerprinted stylesheet"
+
+    response = test_client.get(match.group(1), headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == test_client.get("/static/styles.css").text
+
+    # Brotli is preferred when the browser accepts it
+    response = test_client.get(match.group(1), headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+
+
+def test_dev_mode_reloads_changed_files(tmp_path):
+    static_dir = tmp_path / "static"
+    static_dir.mkdir()
+    (static_dir / "app.css").write_text("body { color: red; }")
+    template = tmp_path / "page.html"
+    template.write_text('<link href="/static/app.css"><!-- split -->end')
+
+    assets = AssetStore(static_dir, dev_mode=True)
+    assets.add_template("page.html", template, split_on="<!-- split -->")
+    old_url = assets.url_for("app.css")
+    assert assets.split("page.html") == (f'<link href="{old_url}">', "end")
+    assert not assets.reload_if_changed()
+
+    (static_dir / "app.css").write_text("body { color: blue; }")
+    template.write_text('<link href="/static/app.css"><!-- split -->the end')
+    os.utime(template, (0, 0))
+    assert assets.reload_if_changed()
+
+    new_url = assets.url_for("app.css")
+    assert new_url != old_url
+    assert assets.split("page.html") == (f'<link href="{new_url}">', "the end")
@@ -1,2 +1,2 @@
 #!/bin/bash
-/app/.venv/bin/python -m uvicorn src.main:app --host 0.0.0.0 --port ${PORT}
\ No newline at end of file
+/app/.venv/bin/python -m uvicorn src.main:app --host 0.0.0.0 --port ${PORT} --timeout-graceful-shutdown ${DRAIN_TIMEOUT_SECONDS:-8}
\ No newline at end of file
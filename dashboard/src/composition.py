@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import re
+from typing import AsyncGenerator, Optional, Tuple
+
+import httpx
+
+from src.routers.proxy_router import keep_warm, rewrite_urls
+
+logger = logging.getLogger(__name__)
+
+# The element in the chat fragment that loads the tools fragment through HTMX
+TOOLS_LIST_TAG = re.compile(r'<div id="tools-list"[^>]*>')
+# Its attributes that make HTMX load the fragment once the page is there
+HTMX_LOAD_ATTRIBUTES = re.compile(r"""\s+hx-(?:get|trigger)=(?:"[^"]*"|'[^']*')""")
+
+# Loads the chat app the regular way when it could not be included on the server
+CHAT_FALLBACK = '<div hx-get="/chat" hx-trigger="load"></div>'
+TOOLS_FALLBACK = '<div hx-get="/chat-proxy/ui/tools" hx-trigger="load"></div>'
+
+# Moves a late fragment into place; it runs before htmx initializes at the end of the page
+LATE_FRAGMENT = """<template id="ssi-{target}">{content}</template>
+<script>(function () {{
+    var template = document.getElementById('ssi-{target}');
+    document.getElementById('{target}').replaceChildren(template.content.cloneNode(true));
+    template.remove();
+}})();</script>
+"""
+
+
+async def fetch_fragment(client: httpx.AsyncClient, url: str, service: str) -> Optional[str]:
+    """Fetches an HTML fragment and rewrites its URLs to the proxy, or returns None on failure."""
+    try:
+        response = await client.get(url)
+        response.raise_for_status()
+        return rewrite_urls(response.text, service)
+    except httpx.HTTPError as e:
+        logger.warning("Could not include fragment %s: %s", url, e)
+        return None
+
+
+def inline_tools(chat_html: str, tools_html: str) -> str:
+    """Puts the tools fragment inside the tools list and removes its HTMX load trigger."""
+    return TOOLS_LIST_TAG.sub(lambda m: HTMX_LOAD_ATTRIBUTES.sub("", m.group(0)) + tools_html, chat_html, count=1)
+
+
+async def compose_chat_page(
+    shell: Tuple[str, str, str],
+    chat_api_url: str,
+    timeout: float = 30.0,
+) -> AsyncGenerator[str, None]:
+    """
+    Streams the dashboard page with the chat app included on the server.
+
+    The page shell is flushed before anything is fetched. The chat and tools
+    fragments are fetched concurrently; the chat fragment is sent as soon as it
+    arrives, with the tools inlined if they are already there or moved into
+    place by a small script once they arrive.
+    """
+    head, _, tail = shell
+    async with httpx.AsyncClient(timeout=timeout, transport=keep_warm.transport("chat")) as client:
+        chat_task = asyncio.create_task(fetch_fragment(client, f"{chat_api_url}/ui/chat", "chat"))
+        tools_task = asyncio.create_task(fetch_fragment(client, f"{chat_api_url}/ui/tools", "chat"))
+        try:
+            yield head
+
+            chat_html = await chat_task
+            if chat_html is None:
+                tools_task.cancel()
+                yield CHAT_FALLBACK
+            elif tools_task.done():
+                yield inline_tools(chat_html, tools_task.result() or TOOLS_FALLBACK)
+            else:
+                yield inline_tools(chat_html, "")
+                tools_html = await tools_task
+                yield LATE_FRAGMENT.format(target="tools-list", content=tools_html or TOOLS_FALLBACK)
+
+            yield tail
+        finally:
+            for task in (chat_task, tools_task):
+                task.cancel()
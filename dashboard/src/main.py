@@ -1,29 +1,80 @@
 import os
 import uvicorn
 import httpx
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, APIRouter, Response
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from pathlib import Path
-from src.routers.proxy_router import router as proxy_router_instance, rewrite_urls
+from typing import Optional
+from shared.assets import AssetStore
+from shared.compression import StreamingCompressionMiddleware
+from shared.inflight import DEFAULT_EXEMPT_PATHS, DRAIN_TIMEOUT_SECONDS, InflightMiddleware, InflightRegistry
+from shared.profiling import Profiler
+from shared.structured_logging import setup_logging
+from src.composition import compose_chat_page
+from src.performance import PerformanceMonitor, chat_section, mcp_section, proxy_section, render_cards, render_panel
+from src.routers.proxy_router import router as proxy_router_instance, rewrite_urls, keep_warm, stream_limiter
 import logging
 
-# Set up basic logging
-logging.basicConfig(level=logging.INFO)
+# JSON lines written to stdout from a background thread
+setup_logging("dashboard")
 logger = logging.getLogger(__name__)
 
 # Define the base directory for the application
 BASE_DIR = Path(__file__).parent.parent
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Only does something in dev mode, where it watches the assets for changes
+    await assets.start()
+    # Opens pooled connections to the chat service now and keeps them warm
+    keep_warm.start()
+    # On SIGTERM, stop admitting requests before uvicorn begins its shutdown
+    inflight.install_signal_handler()
+    # Watches for event loop stalls, if profiling is enabled
+    profiler.start()
+    yield
+    # Let proxied streams finish before their pooled connections are closed
+    await inflight.drain(DRAIN_TIMEOUT_SECONDS)
+    await performance.stop()
+    await profiler.stop()
+    await keep_warm.stop()
+    await assets.stop()
+
 # Initialize the FastAPI app
 app = FastAPI(
     title="Sbotify Dashboard",
     description="A microservice-based dashboard for Sbotify.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+# Every request, stream and WebSocket in flight, for /load and the graceful drain on SIGTERM
+inflight = InflightRegistry()
+# The performance panel's own polls would otherwise show up in the request rate it draws
+app.add_middleware(InflightMiddleware, registry=inflight, exempt_paths=(*DEFAULT_EXEMPT_PATHS, "/metrics", "/performance/cards"))
+
+# Optionally compress the dashboard's own (streamed) responses
+if os.environ.get("DASHBOARD_COMPRESSION") == "1":
+    app.add_middleware(StreamingCompressionMiddleware)
+
+# CPU profiles, allocation snapshots, per-route stats and loop stalls; only with PROFILING_TOKEN set
+profiler = Profiler()
+profiler.install(app)
+
 # --- Configuration from Environment Variables ---
 CHAT_API_URL = os.environ.get("CHAT_API_URL", "http://127.0.0.1:8080")
+# Include the chat app in the dashboard page on the server instead of loading it through HTMX
+SERVER_SIDE_INCLUDE = os.environ.get("DASHBOARD_SERVER_SIDE_INCLUDE") == "1"
+# The MCP server's Prometheus endpoint, for the performance panel (optional)
+MCP_METRICS_URL = os.environ.get("MCP_METRICS_URL")
+
+# Samples the proxy, the chat service and the MCP server while the performance panel is shown
+performance = PerformanceMonitor([
+    proxy_section(inflight, stream_limiter, keep_warm),
+    chat_section(f"{CHAT_API_URL}/api/metrics", keep_warm.transport("chat")),
+    *([mcp_section(MCP_METRICS_URL, keep_warm.transport("mcp"))] if MCP_METRICS_URL else []),
+])
 
 # --- HTML Fragments for each "app" ---
 # Note: This is now just a placeholder for the dummy project
@@ -36,40 +87,37 @@ dummy_project_fragment = """
 </div>
 """
 
-# Create the static directory if it doesn't exist
-static_dir = BASE_DIR / "static"
 # --- Dynamic Path Resolution for Static Files ---
 # We try the production path first, as that is the intended final environment.
-# The local development path becomes the fallback.
-try:
-    # This path is correct for the Docker container.
-    print("Mounting static files from 'static' directory.")
-    app.mount("/static", StaticFiles(directory="static"), name="static")
-except RuntimeError:
-    # If the above path fails, we assume we are in local development
-    # where the static directory is one level up.
-    print("Falling back to ../static for static files.")
-    app.mount("/static", StaticFiles(directory="../static"), name="static")
+# The local development path becomes the fallback, where the static directory is one level up.
+static_dir = Path("static") if Path("static").is_dir() else Path("../static")
+logger.info(f"Serving static files from '{static_dir}'.")
+
+# index.html and the static files are loaded into memory once; ASSETS_DEV_MODE=1 reloads them on change
+assets = AssetStore(static_dir, dev_mode=os.environ.get("ASSETS_DEV_MODE") == "1")
+assets.add_template("index.html", BASE_DIR / "src" / "index.html", split_on="<!-- content-panel -->")
+app.mount("/static", assets, name="static")
 
 
 # Include the proxy router
 app.include_router(proxy_router_instance, tags=["Proxy"])
 
 @app.get("/", response_class=HTMLResponse, name="main_dashboard")
-async def main_dashboard(request: Request):
+async def main_dashboard(request: Request, include: Optional[str] = None):
     """
-    Serves the main dashboard HTML page.
+    Serves the main dashboard HTML page from memory.
+
+    With `?include=chat` (or DASHBOARD_SERVER_SIDE_INCLUDE=1) the chat app is
+    included on the server: the page shell is streamed first and the chat and
+    tools fragments follow as they arrive, saving the browser two round trips.
+    `?include=none` turns this off for a single request.
     """
-    html_file_path = BASE_DIR / "src" / "index.html"
-    logger.info(f"Looking for index.html at: {html_file_path.absolute()}")
-    if not html_file_path.is_file():
-        logger.error(f"File not found: {html_file_path}")
-        raise HTTPException(status_code=500, detail="Internal server error: index.html not found.")
-    
-    with open(html_file_path, "r", encoding="utf-8") as f:
-        html_content = f.read()
-    
-    return HTMLResponse(content=html_content)
+    if include == "chat" or (SERVER_SIDE_INCLUDE and include != "none"):
+        return StreamingResponse(
+            compose_chat_page(assets.split("index.html"), CHAT_API_URL),
+            media_type="text/html"
+        )
+    return assets.response("index.html", request)
 
 @app.get("/chat", response_class=HTMLResponse)
 async def get_chat_app():
@@ -80,7 +128,7 @@ async def get_chat_app():
     chat_api_url = f"{CHAT_API_URL}/ui/chat"
 
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(transport=keep_warm.transport("chat")) as client:
             response = await client.get(chat_api_url)
             response.raise_for_status()
             
@@ -90,24 +138,60 @@ async def get_chat_app():
             return HTMLResponse(content=rewritten_content, status_code=response.status_code)
             
     except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP Status Error: {e.response.status_code} - {e.response.text}")
+        logger.error("HTTP Status Error: %s - %s", e.response.status_code, e.response.text)
         return HTMLResponse(
             f"Error from chat server: {e.response.status_code}",
             status_code=e.response.status_code
         )
     except httpx.ConnectError as e:
-        logger.error(f"Connection Error: {e}")
+        logger.error("Connection Error: %s", e)
         return HTMLResponse(
             f"Connection failed: Could not connect to chat server.",
             status_code=500
         )
     except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        logger.error("An unexpected error occurred: %s", e, exc_info=True)
         return HTMLResponse(
             "An unexpected error occurred while fetching the chat app.",
             status_code=500
         )
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Returns runtime metrics of the dashboard: warm versus cold requests to each
+    upstream service and the open long-lived proxy connections.
+    """
+    return {
+        "warmup": keep_warm.stats(),
+        "streams": stream_limiter.stats(),
+    }
+
+@app.get("/load")
+async def get_load():
+    """
+    Live concurrency and stream ages for autoscaling and load balancing;
+    answers 503 once the dashboard is draining for shutdown.
+    """
+    load = inflight.load()
+    return JSONResponse(load, status_code=200 if load["accepting"] else 503)
+
+@app.get("/performance", response_class=HTMLResponse)
+async def get_performance_panel():
+    """
+    Returns the HTML fragment of the performance panel: request rates, latency
+    and TTFT percentiles, cache hit ratios, pool utilization and queue depths
+    of the proxy, the chat service and the MCP server, as sparklines.
+    """
+    await performance.view()
+    return HTMLResponse(content=render_panel(performance))
+
+@app.get("/performance/cards", response_class=HTMLResponse)
+async def get_performance_cards():
+    """The refreshed part of the performance panel, polled while it is shown."""
+    performance.touch()
+    return HTMLResponse(content=render_cards(performance))
+
 @app.get("/dummy-project", response_class=HTMLResponse)
 async def get_dummy_project_app():
     """Returns the HTML fragment for the dummy project."""
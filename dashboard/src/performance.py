@@ -0,0 +1,482 @@
+"""
+The live performance panel: request rates, latency and TTFT percentiles,
+cache hit ratios, pool utilization and queue depths of the dashboard proxy,
+the chat service and the MCP server, drawn as sparklines.
+
+One PerformanceMonitor samples every source each PERF_INTERVAL_SECONDS
+(default 5), and only while the panel is being viewed: the panel's polls call
+`touch()`, and the sampler stops PERF_IDLE_SECONDS (default three intervals)
+after the last one. However many panels are open, the backends see one small
+request per interval. The services only keep cumulative counters and
+histograms (see shared.histogram); rates, ratios and percentiles are computed
+here from the difference between two samples and appended to fixed-size ring
+buffers of PERF_HISTORY (default 120) points, so nothing grows over time.
+
+The MCP server is sampled from its Prometheus endpoint when MCP_METRICS_URL
+is set (e.g. http://mcp-server:8080/metrics). Each scrape reaches one of its
+worker processes, so its samples are diffed per worker (see WorkerSamples).
+"""
+
+import asyncio
+import html
+import logging
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from shared.histogram import BUCKETS, delta, quantile
+from shared.inflight import InflightRegistry
+from shared.warmup import KeepWarm
+from src.stream_proxy import ConnectionLimiter
+
+logger = logging.getLogger(__name__)
+
+PERF_INTERVAL_SECONDS = float(os.environ.get("PERF_INTERVAL_SECONDS", "5"))
+PERF_HISTORY = int(os.environ.get("PERF_HISTORY", "120"))
+PERF_IDLE_SECONDS = float(os.environ.get("PERF_IDLE_SECONDS", str(3 * PERF_INTERVAL_SECONDS)))
+
+# Derives the values of one interval from the current and the previous sample
+# (None on the first one) and the seconds in between
+Derive = Callable[[Dict[str, Any], Optional[Dict[str, Any]], float], Dict[str, Optional[float]]]
+
+
+@dataclass
+class Metric:
+    key: str
+    label: str
+    # "/s", "ms", "%" (values are ratios) or "" (counts)
+    unit: str = ""
+
+
+@dataclass
+class Section:
+    name: str
+    title: str
+    fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    derive: Derive
+    metrics: List[Metric]
+    series: Dict[str, Deque[Optional[float]]] = field(default_factory=dict)
+    previous: Optional[Dict[str, Any]] = None
+    sampled_at: float = 0.0
+    error: Optional[str] = None
+
+
+def rate(current: float, previous: Optional[float], elapsed: float) -> Optional[float]:
+    """Per-second increase of a counter; None without a previous sample or after a restart."""
+    if previous is None or current < previous or elapsed <= 0:
+        return None
+    return (current - previous) / elapsed
+
+
+def ratio(part: float, whole: float, part_before: Optional[float], whole_before: Optional[float]) -> Optional[float]:
+    """The share of `whole`'s increase that `part` accounts for, e.g. cache hits per read."""
+    if part_before is None or whole_before is None or whole <= whole_before:
+        return None
+    return (part - part_before) / (whole - whole_before)
+
+
+def quantile_ms(current: Dict[str, Any], previous: Optional[Dict[str, Any]], q: float) -> Optional[float]:
+    """The q-th quantile in milliseconds of the observations between two histogram snapshots."""
+    if previous is None:
+        return None
+    value = quantile(delta(current, previous), q)
+    return value * 1000 if value is not None else None
+
+
+def _warm_counts(warmup: Dict[str, Any]) -> Tuple[int, int]:
+    upstreams = warmup["upstreams"].values()
+    return sum(upstream["warm"] for upstream in upstreams), sum(upstream["requests"] for upstream in upstreams)
+
+
+def _get(previous: Optional[Dict[str, Any]], *keys: str) -> Any:
+    for key in keys:
+        if previous is None:
+            return None
+        previous = previous[key]
+    return previous
+
+
+# --- Dashboard proxy ---
+
+PROXY_METRICS = [
+    Metric("rps", "Requests", "/s"),
+    Metric("latency_p50", "Latency p50", "ms"),
+    Metric("latency_p95", "Latency p95", "ms"),
+    Metric("in_flight", "In flight"),
+    Metric("stream_slots", "Stream slots used", "%"),
+    Metric("warm", "Warm upstream connections", "%"),
+]
+
+
+def derive_proxy(current: Dict[str, Any], previous: Optional[Dict[str, Any]], elapsed: float) -> Dict[str, Optional[float]]:
+    streams = current["streams"].values()
+    limit = sum(stream["limit"] for stream in streams)
+    warm, requests = _warm_counts(current["warmup"])
+    warm_before, requests_before = _warm_counts(previous["warmup"]) if previous else (None, None)
+    return {
+        "rps": rate(current["load"]["completed"], _get(previous, "load", "completed"), elapsed),
+        "latency_p50": quantile_ms(current["latency"]["latency_seconds"], _get(previous, "latency", "latency_seconds"), 0.5),
+        "latency_p95": quantile_ms(current["latency"]["latency_seconds"], _get(previous, "latency", "latency_seconds"), 0.95),
+        "in_flight": current["load"]["in_flight"],
+        "stream_slots": sum(stream["open"] for stream in streams) / limit if limit else None,
+        "warm": ratio(warm, requests, warm_before, requests_before),
+    }
+
+
+def proxy_section(inflight: InflightRegistry, limiter: ConnectionLimiter, keep_warm: KeepWarm) -> Section:
+    async def fetch() -> Dict[str, Any]:
+        return {
+            "load": inflight.load(),
+            "latency": inflight.histograms(),
+            "streams": limiter.stats(),
+            "warmup": keep_warm.stats(),
+        }
+
+    return Section("proxy", "Dashboard proxy", fetch, derive_proxy, PROXY_METRICS)
+
+
+# --- Chat service ---
+
+CHAT_METRICS = [
+    Metric("rps", "Requests", "/s"),
+    Metric("ttft_p50", "Time to first token p50", "ms"),
+    Metric("ttft_p95", "Time to first token p95", "ms"),
+    Metric("latency_p95", "Latency p95", "ms"),
+    Metric("streams", "Open streams"),
+    Metric("context_cache", "Context cache hits", "%"),
+    Metric("warm", "Warm upstream connections", "%"),
+]
+
+
+def derive_chat(current: Dict[str, Any], previous: Optional[Dict[str, Any]], elapsed: float) -> Dict[str, Optional[float]]:
+    warm, requests = _warm_counts(current["warmup"])
+    warm_before, requests_before = _warm_counts(previous["warmup"]) if previous else (None, None)
+    cache = current["context_cache"]
+    return {
+        "rps": rate(current["load"]["completed"], _get(previous, "load", "completed"), elapsed),
+        "ttft_p50": quantile_ms(current["ttft_seconds"], _get(previous, "ttft_seconds"), 0.5),
+        "ttft_p95": quantile_ms(current["ttft_seconds"], _get(previous, "ttft_seconds"), 0.95),
+        "latency_p95": quantile_ms(current["latency"]["latency_seconds"], _get(previous, "latency", "latency_seconds"), 0.95),
+        "streams": current["load"]["streams"],
+        "context_cache": ratio(
+            cache["cached_requests"], cache["requests"],
+            _get(previous, "context_cache", "cached_requests"), _get(previous, "context_cache", "requests"),
+        ),
+        "warm": ratio(warm, requests, warm_before, requests_before),
+    }
+
+
+def chat_section(url: str, transport: httpx.AsyncBaseTransport, timeout: float = 2.0) -> Section:
+    async def fetch() -> Dict[str, Any]:
+        async with httpx.AsyncClient(transport=transport, timeout=timeout) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            return response.json()
+
+    return Section("chat", "Chat service", fetch, derive_chat, CHAT_METRICS)
+
+
+# --- MCP server ---
+
+MCP_METRICS = [
+    Metric("calls", "Calls", "/s"),
+    Metric("latency_p50", "Latency p50", "ms"),
+    Metric("latency_p95", "Latency p95", "ms"),
+    Metric("errors", "Errors", "%"),
+    Metric("pool", "CPU pool utilization", "%"),
+    Metric("queue_depth", "CPU pool queue"),
+    Metric("resource_cache", "Resource cache hits", "%"),
+]
+
+_SAMPLE = re.compile(r"^([a-zA-Z_:][\w:]*)(?:\{(.*)\})?\s+(\S+)$")
+_LE = re.compile(r'le="([^"]*)"')
+_PID = re.compile(r'pid="([^"]*)"')
+
+
+def parse_prometheus(text: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Sums the MCP server's Prometheus samples over all handlers, per worker
+    process (the pid label): call and error counts, the latency histogram (as
+    a shared.histogram snapshot) and the CPU pool and resource cache samples.
+    """
+    totals: Dict[str, Dict[str, float]] = {}
+    cumulative: Dict[str, Dict[str, float]] = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        pid = _PID.search(labels or "")
+        pid = pid.group(1) if pid else ""
+        if name == "mcp_handler_duration_seconds_bucket":
+            le = _LE.search(labels or "")
+            if le:
+                worker = cumulative.setdefault(pid, {})
+                worker[le.group(1)] = worker.get(le.group(1), 0) + float(value)
+        else:
+            worker = totals.setdefault(pid, {})
+            worker[name] = worker.get(name, 0) + float(value)
+
+    workers = {}
+    for pid in totals.keys() | cumulative.keys():
+        worker_totals = totals.get(pid, {})
+        worker_cumulative = cumulative.get(pid, {})
+        buckets = []
+        below = 0.0
+        for bound in (*(str(bound) for bound in BUCKETS), "+Inf"):
+            buckets.append(int(worker_cumulative.get(bound, below) - below))
+            below = worker_cumulative.get(bound, below)
+        workers[pid] = {
+            "calls": worker_totals.get("mcp_handler_calls_total", 0),
+            "errors": worker_totals.get("mcp_handler_errors_total", 0),
+            "latency_seconds": {
+                "buckets": buckets,
+                "count": int(worker_totals.get("mcp_handler_duration_seconds_count", 0)),
+                "sum": worker_totals.get("mcp_handler_duration_seconds_sum", 0.0),
+            },
+            "pool_size": worker_totals.get("mcp_cpu_pool_size", 0),
+            "pool_busy": worker_totals.get("mcp_cpu_pool_busy", 0),
+            "queue_depth": worker_totals.get("mcp_cpu_pool_queue_depth", 0),
+            "cache_hits": worker_totals.get("mcp_resource_cache_hits_total", 0),
+            "cache_reads": worker_totals.get("mcp_resource_cache_hits_total", 0) + worker_totals.get("mcp_resource_cache_misses_total", 0),
+        }
+    return workers
+
+
+def worker_interval(current: Dict[str, Any], previous: Dict[str, Any], elapsed: float) -> Optional[Dict[str, Any]]:
+    """What one worker did between two of its samples; None if it restarted in between."""
+    if current["calls"] < previous["calls"] or elapsed <= 0:
+        return None
+    return {
+        "elapsed": elapsed,
+        "calls": current["calls"] - previous["calls"],
+        "errors": current["errors"] - previous["errors"],
+        "latency_seconds": delta(current["latency_seconds"], previous["latency_seconds"]),
+        "cache_hits": current["cache_hits"] - previous["cache_hits"],
+        "cache_reads": current["cache_reads"] - previous["cache_reads"],
+    }
+
+
+class WorkerSamples:
+    """
+    The MCP server runs several worker processes, each with its own counters,
+    and each scrape reaches one of them. So a sample is only ever diffed
+    against the previous sample of the same worker (pid), and every worker's
+    latest sample and interval are kept, until it hasn't been seen for
+    `stale_after` seconds (it exited, or the panel was closed for a while).
+    """
+
+    def __init__(self, stale_after: float):
+        self.stale_after = stale_after
+        self.workers: Dict[str, Dict[str, Any]] = {}
+
+    def update(self, samples: Dict[str, Dict[str, Any]], now: float) -> Dict[str, Any]:
+        self.workers = {pid: worker for pid, worker in self.workers.items() if now - worker["at"] <= self.stale_after}
+        for pid, sample in samples.items():
+            worker = self.workers.get(pid)
+            interval = worker_interval(sample, worker["sample"], now - worker["at"]) if worker else None
+            self.workers[pid] = {"sample": sample, "at": now, "interval": interval}
+        return {"workers": dict(self.workers)}
+
+
+def derive_mcp(current: Dict[str, Any], previous: Optional[Dict[str, Any]], elapsed: float) -> Dict[str, Optional[float]]:
+    """
+    Adds up the workers: their latest intervals for the rates, ratios and
+    percentiles (each diffed within one worker), their latest samples for the
+    gauges. `previous` is not needed, WorkerSamples keeps that per worker.
+    """
+    workers = current["workers"].values()
+    intervals = [worker["interval"] for worker in workers if worker["interval"] is not None]
+    samples = [worker["sample"] for worker in workers]
+    calls = sum(interval["calls"] for interval in intervals)
+    cache_reads = sum(interval["cache_reads"] for interval in intervals)
+    latency = {
+        "buckets": [sum(counts) for counts in zip(*(interval["latency_seconds"]["buckets"] for interval in intervals))],
+        "count": sum(interval["latency_seconds"]["count"] for interval in intervals),
+    }
+    p50, p95 = quantile(latency, 0.5), quantile(latency, 0.95)
+    pool_size = sum(sample["pool_size"] for sample in samples)
+    return {
+        "calls": sum(interval["calls"] / interval["elapsed"] for interval in intervals) if intervals else None,
+        "latency_p50": p50 * 1000 if p50 is not None else None,
+        "latency_p95": p95 * 1000 if p95 is not None else None,
+        "errors": sum(interval["errors"] for interval in intervals) / calls if calls else None,
+        "pool": sum(sample["pool_busy"] for sample in samples) / pool_size if pool_size else None,
+        "queue_depth": sum(sample["queue_depth"] for sample in samples) if samples else None,
+        "resource_cache": sum(interval["cache_hits"] for interval in intervals) / cache_reads if cache_reads else None,
+    }
+
+
+def mcp_section(
+    url: str,
+    transport: httpx.AsyncBaseTransport,
+    timeout: float = 2.0,
+    stale_after: float = 12 * PERF_INTERVAL_SECONDS,
+) -> Section:
+    workers = WorkerSamples(stale_after)
+
+    async def fetch() -> Dict[str, Any]:
+        async with httpx.AsyncClient(transport=transport, timeout=timeout) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            return workers.update(parse_prometheus(response.text), time.monotonic())
+
+    return Section("mcp", "MCP server", fetch, derive_mcp, MCP_METRICS)
+
+
+class PerformanceMonitor:
+    def __init__(
+        self,
+        sections: Sequence[Section],
+        interval: float = PERF_INTERVAL_SECONDS,
+        history: int = PERF_HISTORY,
+        idle_timeout: float = PERF_IDLE_SECONDS,
+    ):
+        self.sections = list(sections)
+        self.interval = interval
+        self.history = history
+        self.idle_timeout = idle_timeout
+        self.samples = 0
+        self.viewed_at = 0.0
+        self._sampled = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        for section in self.sections:
+            section.series = {metric.key: deque(maxlen=history) for metric in section.metrics}
+
+    async def _sample_section(self, section: Section, now: float) -> None:
+        try:
+            current = await section.fetch()
+            section.error = None
+        except Exception as e:
+            logger.info("Sampling %s failed: %s", section.name, e)
+            current = None
+            section.error = str(e) or type(e).__name__
+
+        previous = section.previous
+        elapsed = now - section.sampled_at
+        # After an idle period the previous sample is too old to make a meaningful interval
+        if previous is not None and elapsed > 2 * self.interval:
+            previous = None
+        values = section.derive(current, previous, elapsed) if current is not None else {}
+        for key, series in section.series.items():
+            series.append(values.get(key))
+        section.previous = current
+        section.sampled_at = now
+
+    async def sample(self) -> None:
+        """Samples every section once, concurrently."""
+        now = time.monotonic()
+        await asyncio.gather(*(self._sample_section(section, now) for section in self.sections))
+        self.samples += 1
+        self._sampled.set()
+
+    async def _run(self) -> None:
+        while time.monotonic() - self.viewed_at < self.idle_timeout:
+            await self.sample()
+            await asyncio.sleep(self.interval)
+        self._task = None
+
+    def touch(self) -> None:
+        """Records that the panel is being viewed and starts sampling if it was idle."""
+        self.viewed_at = time.monotonic()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def view(self, timeout: float = 3.0) -> None:
+        """Like touch(), and on the very first view waits (briefly) for the first sample."""
+        self.touch()
+        if not self.samples:
+            try:
+                await asyncio.wait_for(self._sampled.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# --- Rendering ---
+
+def format_value(value: Optional[float], unit: str) -> str:
+    if value is None:
+        return "–"
+    if unit == "%":
+        return f"{value * 100:.0f}%"
+    if unit == "ms":
+        return f"{value:.0f} ms" if value >= 10 else f"{value:.1f} ms"
+    if unit == "/s":
+        return f"{value:.1f}/s"
+    return f"{value:.0f}"
+
+
+def sparkline(values: Sequence[Optional[float]], capacity: int, ceiling: Optional[float] = None, width: int = 160, height: int = 32) -> str:
+    """
+    An inline SVG line of the values, the newest at the right edge. Missing
+    values (None) leave gaps; the scale runs from 0 to `ceiling` or the maximum.
+    """
+    present = [value for value in values if value is not None]
+    top = ceiling or max(present, default=0) or 1.0
+    step = width / max(capacity - 1, 1)
+    offset = width - (len(values) - 1) * step
+    segments: List[List[Tuple[float, float]]] = [[]]
+    for index, value in enumerate(values):
+        if value is None:
+            if segments[-1]:
+                segments.append([])
+            continue
+        segments[-1].append((offset + index * step, height - 1 - (height - 2) * min(value / top, 1.0)))
+    lines = "".join(
+        '<polyline points="{}" fill="none" stroke="currentColor" stroke-width="1.5"/>'.format(" ".join(f"{x:.1f},{y:.1f}" for x, y in points))
+        for points in segments if len(points) > 1
+    )
+    # A value between two gaps has no line to be part of
+    dots = "".join(
+        f'<circle cx="{points[0][0]:.1f}" cy="{points[0][1]:.1f}" r="1.5" fill="currentColor"/>'
+        for points in segments if len(points) == 1
+    )
+    return f'<svg viewBox="0 0 {width} {height}" width="{width}" height="{height}" class="text-indigo-500">{lines}{dots}</svg>'
+
+
+def render_cards(monitor: PerformanceMonitor) -> str:
+    """The sections and their metric cards; the part of the panel that is refreshed."""
+    parts = []
+    for section in monitor.sections:
+        status = f'<span class="text-sm text-red-600">{html.escape(section.error)}</span>' if section.error else ""
+        parts.append(f'<h3 class="text-lg font-semibold text-gray-700 mt-4 mb-2">{html.escape(section.title)} {status}</h3>')
+        parts.append('<div class="grid grid-cols-2 lg:grid-cols-4 gap-4">')
+        for metric in section.metrics:
+            values = section.series[metric.key]
+            latest = values[-1] if values else None
+            parts.append(
+                '<div class="bg-white p-3 rounded-lg shadow-md">'
+                f'<div class="text-xs text-gray-500">{html.escape(metric.label)}</div>'
+                f'<div class="text-xl font-semibold text-gray-800">{format_value(latest, metric.unit)}</div>'
+                f'{sparkline(list(values), monitor.history, 1.0 if metric.unit == "%" else None)}'
+                "</div>"
+            )
+        parts.append("</div>")
+    return "".join(parts)
+
+
+def render_panel(monitor: PerformanceMonitor) -> str:
+    """The panel fragment; its cards poll /performance/cards while the panel is shown."""
+    minutes = monitor.interval * monitor.history / 60
+    return (
+        '<div class="p-6">'
+        '<h2 class="text-2xl font-semibold text-gray-800 mb-1">Performance</h2>'
+        f'<p class="text-sm text-gray-500">Sampled every {monitor.interval:g} s, the last {minutes:g} minutes.</p>'
+        f'<div hx-get="/performance/cards" hx-trigger="every {monitor.interval:g}s" hx-swap="innerHTML">'
+        f"{render_cards(monitor)}"
+        "</div></div>"
+    )
@@ -1,12 +1,12 @@
 import httpx
-from fastapi import APIRouter, Request, HTTPException, Response
+from fastapi import APIRouter, Request, HTTPException, Response, WebSocket, status
 from fastapi.responses import HTMLResponse
 import logging
 import os
 import re
+from shared.warmup import KeepWarm
+from ..stream_proxy import ConnectionLimiter, bridge_websocket, limits_from_env, proxy_event_stream, websocket_url
 
-# Set up basic logging for this module
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # This is an example of an internal service, not exposed to the public internet.
@@ -17,6 +17,17 @@ SERVICE_URLS = {
     "chat": CHAT_INTERNAL_URL,
 }
 
+# Pooled connections to each service, opened at startup and kept warm (started in main.py)
+keep_warm = KeepWarm()
+for _service, _url in SERVICE_URLS.items():
+    keep_warm.add_http(_service, _url)
+
+# Concurrent event streams and WebSockets per service (PROXY_MAX_STREAMS_<SERVICE>)
+stream_limiter = ConnectionLimiter(limits_from_env(SERVICE_URLS))
+
+# httpx already decoded the body, so these no longer describe what is sent back
+DECODED_BODY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
 router = APIRouter()
 
 def rewrite_urls(html_content: str, service: str) -> str:
@@ -47,10 +58,24 @@ async def generic_proxy(service: str, path: str, request: Request):
     base_url = SERVICE_URLS[service]
     target_url = f"{base_url}/{path}"
 
-    headers = {key: value for key, value in request.headers.items() if key.lower() not in ["host", "authorization"]}
-    
+    # accept-encoding is left to httpx, so the backend only uses encodings it can decode
+    headers = {key: value for key, value in request.headers.items() if key.lower() not in ["host", "authorization", "accept-encoding"]}
+
+    # Event streams are relayed as they arrive instead of being buffered
+    if "text/event-stream" in request.headers.get("accept", ""):
+        client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None), transport=keep_warm.transport(service))
+        backend_request = client.build_request(request.method, target_url, headers=headers, params=request.query_params, content=await request.body())
+        try:
+            return await proxy_event_stream(client, backend_request, service, stream_limiter, rewrite=lambda event: rewrite_urls(event, service))
+        except httpx.HTTPStatusError as e:
+            logger.error("Backend service returned an error: %s", e.response.status_code)
+            raise HTTPException(status_code=e.response.status_code, detail="Backend service returned an error")
+        except httpx.RequestError as e:
+            logger.error("Could not connect to backend service: %s", e)
+            raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
+
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with httpx.AsyncClient(timeout=30.0, transport=keep_warm.transport(service)) as client:
             proxy_response = await client.request(
                 method=request.method,
                 url=target_url,
@@ -68,11 +93,25 @@ async def generic_proxy(service: str, path: str, request: Request):
                 return HTMLResponse(content=rewritten_content, status_code=proxy_response.status_code)
             
             # For non-HTML content, return the response directly
-            return Response(content=proxy_response.content, status_code=proxy_response.status_code, headers=proxy_response.headers)
+            response_headers = {key: value for key, value in proxy_response.headers.items() if key.lower() not in DECODED_BODY_HEADERS}
+            return Response(content=proxy_response.content, status_code=proxy_response.status_code, headers=response_headers)
 
     except httpx.HTTPStatusError as e:
-        logger.error(f"Backend service returned an error: {e.response.status_code} - {e.response.text}")
+        logger.error("Backend service returned an error: %s - %s", e.response.status_code, e.response.text)
         raise HTTPException(status_code=e.response.status_code, detail=f"Backend service returned an error: {e.response.text}")
     except httpx.RequestError as e:
-        logger.error(f"Could not connect to backend service: {e}")
+        logger.error("Could not connect to backend service: %s", e)
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
+
+@router.websocket("/{service}-proxy/{path:path}")
+async def websocket_proxy(websocket: WebSocket, service: str, path: str):
+    """
+    Bridges a WebSocket to the same path on the backend service, forwarding
+    messages in both directions until either side closes.
+    """
+    if service not in SERVICE_URLS:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Service not found")
+        return
+
+    url = websocket_url(SERVICE_URLS[service], path, websocket.url.query)
+    await bridge_websocket(websocket, url, service, stream_limiter)
@@ -0,0 +1,254 @@
+"""
+Long-lived connections through the dashboard proxy: event streams and WebSockets.
+
+- Event streams (requests with `Accept: text/event-stream`) are relayed one
+  event at a time, each event written as soon as its terminating blank line
+  arrives. While the backend is quiet, a `: keep-alive` comment is sent every
+  PROXY_SSE_KEEPALIVE_SECONDS (default 15) so that idle connections are not
+  dropped by intermediaries.
+- WebSocket upgrades are bridged to the backend's WebSocket endpoint, with
+  messages forwarded in both directions as they arrive.
+
+Both count against a per-service limit on concurrent long-lived connections
+(PROXY_MAX_STREAMS_<SERVICE>, default 100). Streams over the limit are refused
+with 503 (event streams) or close code 1013 "try again later" (WebSockets).
+When either side disconnects, the other side is closed and the slot is freed.
+"""
+
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+import httpx
+from fastapi import HTTPException, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
+from starlette.websockets import WebSocketDisconnect
+from websockets.asyncio.client import connect as websocket_connect
+from websockets.exceptions import ConnectionClosed
+
+logger = logging.getLogger(__name__)
+
+SSE_KEEPALIVE_SECONDS = float(os.environ.get("PROXY_SSE_KEEPALIVE_SECONDS", "15"))
+DEFAULT_MAX_STREAMS = 100
+
+# uvicorn's default WebSocket message size limit
+WEBSOCKET_MAX_SIZE = 16 * 1024 * 1024
+
+# Request headers that belong to the client's own connection or WebSocket handshake
+HANDSHAKE_HEADERS = {
+    "host", "authorization", "accept-encoding", "connection", "upgrade", "content-length",
+    "sec-websocket-key", "sec-websocket-version", "sec-websocket-extensions", "sec-websocket-protocol",
+}
+
+# Close codes that are reported locally but may not be sent in a close frame
+RESERVED_CLOSE_CODES = {1005, 1006, 1015}
+
+
+class ConnectionLimiter:
+    """Counts the open long-lived connections of each service against its limit."""
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = limits
+        self.open: Dict[str, int] = {service: 0 for service in limits}
+        self.rejected: Dict[str, int] = {service: 0 for service in limits}
+
+    def try_acquire(self, service: str) -> bool:
+        if self.open.get(service, 0) >= self.limits.get(service, DEFAULT_MAX_STREAMS):
+            self.rejected[service] = self.rejected.get(service, 0) + 1
+            return False
+        self.open[service] = self.open.get(service, 0) + 1
+        return True
+
+    def release(self, service: str) -> None:
+        self.open[service] -= 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            service: {"open": self.open.get(service, 0), "limit": limit, "rejected": self.rejected.get(service, 0)}
+            for service, limit in self.limits.items()
+        }
+
+
+def limits_from_env(services: Iterable[str]) -> Dict[str, int]:
+    return {
+        service: int(os.environ.get(f"PROXY_MAX_STREAMS_{service.upper()}", DEFAULT_MAX_STREAMS))
+        for service in services
+    }
+
+
+async def _read_events(response: httpx.Response, events: asyncio.Queue) -> None:
+    """Puts each complete event of the backend stream on the queue, then None (or the error)."""
+    try:
+        lines = []
+        async for line in response.aiter_lines():
+            if line:
+                lines.append(line)
+            elif lines:
+                events.put_nowait("\n".join(lines) + "\n\n")
+                lines = []
+        if lines:
+            events.put_nowait("\n".join(lines) + "\n\n")
+        events.put_nowait(None)
+    except Exception as e:
+        events.put_nowait(e)
+
+
+async def relay_events(
+    response: httpx.Response,
+    keepalive: float = SSE_KEEPALIVE_SECONDS,
+    rewrite=None,
+) -> AsyncIterator[str]:
+    """Yields the backend's events one by one, and keep-alive comments while it is idle."""
+    events: asyncio.Queue = asyncio.Queue()
+    reader = asyncio.create_task(_read_events(response, events))
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                return
+            if isinstance(event, Exception):
+                logger.warning("Event stream from %s ended with an error: %s", response.url, event)
+                return
+            yield rewrite(event) if rewrite else event
+    finally:
+        reader.cancel()
+
+
+async def proxy_event_stream(
+    client: httpx.AsyncClient,
+    request: httpx.Request,
+    service: str,
+    limiter: ConnectionLimiter,
+    rewrite=None,
+) -> Response:
+    """
+    Sends the request to the backend and relays its event stream. The client,
+    the backend response and the limiter slot are released when the stream
+    ends or the browser goes away.
+    """
+    if not limiter.try_acquire(service):
+        await client.aclose()
+        raise HTTPException(status_code=503, detail="Too many open streams", headers={"Retry-After": "5"})
+
+    response: Optional[httpx.Response] = None
+    try:
+        response = await client.send(request, stream=True)
+        response.raise_for_status()
+    except BaseException:
+        if response is not None:
+            await response.aclose()
+        await client.aclose()
+        limiter.release(service)
+        raise
+
+    if "text/event-stream" not in response.headers.get("content-type", ""):
+        # Not a stream after all; pass the body through as a whole
+        try:
+            content = await response.aread()
+            headers = {key: value for key, value in response.headers.items() if key.lower() not in {"content-encoding", "content-length", "transfer-encoding"}}
+            return Response(content=content, status_code=response.status_code, headers=headers)
+        finally:
+            await response.aclose()
+            await client.aclose()
+            limiter.release(service)
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            async for event in relay_events(response, rewrite=rewrite):
+                yield event
+        finally:
+            await response.aclose()
+            await client.aclose()
+            limiter.release(service)
+            logger.info("Event stream to %s closed", service)
+
+    return StreamingResponse(
+        stream(),
+        status_code=response.status_code,
+        media_type="text/event-stream",
+        # No caching, and no buffering by nginx-style proxies in front of the dashboard
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def websocket_url(base_url: str, path: str, query: str) -> str:
+    url = f"{base_url}/{path}"
+    url = "wss://" + url[len("https://"):] if url.startswith("https://") else url
+    url = "ws://" + url[len("http://"):] if url.startswith("http://") else url
+    return f"{url}?{query}" if query else url
+
+
+def _close_code(code: Optional[int]) -> int:
+    if code is None or code in RESERVED_CLOSE_CODES:
+        return status.WS_1000_NORMAL_CLOSURE
+    return code
+
+
+async def bridge_websocket(websocket: WebSocket, url: str, service: str, limiter: ConnectionLimiter) -> None:
+    """Connects to the backend WebSocket and forwards messages both ways until either side closes."""
+    if not limiter.try_acquire(service):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many open streams")
+        return
+
+    try:
+        headers = {key: value for key, value in websocket.headers.items() if key.lower() not in HANDSHAKE_HEADERS}
+        try:
+            backend = await websocket_connect(
+                url,
+                additional_headers=headers,
+                subprotocols=websocket.scope.get("subprotocols") or None,
+                max_size=WEBSOCKET_MAX_SIZE,
+            )
+        except Exception as e:
+            logger.error("Could not open a WebSocket to %s: %s", url, e)
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="Backend unavailable")
+            return
+
+        # Accepted only now, so the client gets the subprotocol the backend chose
+        await websocket.accept(subprotocol=backend.subprotocol)
+
+        async def client_to_backend() -> Optional[int]:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return message.get("code")
+                if message.get("text") is not None:
+                    await backend.send(message["text"])
+                elif message.get("bytes") is not None:
+                    await backend.send(message["bytes"])
+
+        async def backend_to_client() -> None:
+            async for message in backend:
+                if isinstance(message, str):
+                    await websocket.send_text(message)
+                else:
+                    await websocket.send_bytes(message)
+
+        upstream = asyncio.create_task(client_to_backend())
+        downstream = asyncio.create_task(backend_to_client())
+        try:
+            await asyncio.wait({upstream, downstream}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (upstream, downstream):
+                task.cancel()
+            await asyncio.gather(upstream, downstream, return_exceptions=True)
+
+        if upstream.done() and not upstream.cancelled() and upstream.exception() is None:
+            # The browser left; tell the backend
+            await backend.close(_close_code(upstream.result()))
+        else:
+            # The backend closed (or failed); pass its close code on to the browser
+            await backend.close()
+            code = backend.close_code if backend.close_code is not None else status.WS_1011_INTERNAL_ERROR
+            try:
+                await websocket.close(code=_close_code(code), reason=backend.close_reason or "")
+            except (RuntimeError, WebSocketDisconnect, ConnectionClosed):
+                pass
+    finally:
+        limiter.release(service)
+        logger.info("WebSocket to %s closed", service)
@@ -0,0 +1,164 @@
+import asyncio
+import time
+import pytest
+import httpx
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from src.routers.proxy_router import router, stream_limiter
+from src.stream_proxy import relay_events
+
+# Create a test app
+app = FastAPI()
+app.include_router(router)
+
+client = TestClient(app)
+
+RealAsyncClient = httpx.AsyncClient
+
+
+def backend_client(handler):
+    """Patches the proxy's httpx client to answer from `handler` instead of the network."""
+    return patch(
+        "src.routers.proxy_router.httpx.AsyncClient",
+        lambda **kwargs: RealAsyncClient(**{**kwargs, "transport": httpx.MockTransport(handler)}),
+    )
+
+
+def wait_for(condition, timeout=2.0):
+    """The test client cancels the app when the session ends; lets it handle the close first."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class FakeBackend:
+    """Stands in for the backend WebSocket: echoes what it is sent, or plays a script."""
+
+    subprotocol = None
+
+    def __init__(self, script=None, close_code=None):
+        self.sent = []
+        self.incoming = asyncio.Queue()
+        for message in script or []:
+            self.incoming.put_nowait(message)
+        self.close_code = None
+        self.close_reason = ""
+        self._script_close_code = close_code
+
+    async def send(self, message):
+        self.sent.append(message)
+        await self.incoming.put(f"echo: {message}")
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.incoming.get()
+        if message is None:
+            self.close_code = self.close_code or self._script_close_code
+            raise StopAsyncIteration
+        return message
+
+    async def close(self, code=1000, reason=""):
+        if self.close_code is None:
+            self.close_code = code
+        self.incoming.put_nowait(None)
+
+
+class TestEventStreams:
+    """Event streams are relayed one event at a time"""
+
+    def test_events_are_relayed_and_rewritten(self):
+        async def events():
+            yield b'data: <div hx-get="/ui/x">one</div>\n'
+            yield b"\n"
+            yield b"event: done\r\ndata: two\r\n\r\n"
+
+        def handler(request):
+            assert request.headers["accept"] == "text/event-stream"
+            return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=events())
+
+        with backend_client(handler):
+            with client.stream("GET", "/chat-proxy/events", headers={"Accept": "text/event-stream"}) as response:
+                assert response.headers["content-type"].startswith("text/event-stream")
+                body = "".join(response.iter_text())
+
+        assert body == 'data: <div hx-get="/chat-proxy/ui/x">one</div>\n\nevent: done\ndata: two\n\n'
+        assert stream_limiter.open["chat"] == 0
+
+    def test_streams_over_the_limit_are_refused(self):
+        def handler(request):
+            raise AssertionError("The backend should not be called")
+
+        with backend_client(handler), patch.dict(stream_limiter.limits, {"chat": 0}):
+            response = client.get("/chat-proxy/events", headers={"Accept": "text/event-stream"})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5"
+        assert stream_limiter.open["chat"] == 0
+
+    def test_idle_stream_gets_keepalive_comments(self):
+        async def run_test():
+            async def slow_events():
+                await asyncio.sleep(0.25)
+                yield b"data: late\n\n"
+
+            response = httpx.Response(200, content=slow_events(), request=httpx.Request("GET", "http://chat/events"))
+            return [event async for event in relay_events(response, keepalive=0.1)]
+
+        events = asyncio.run(run_test())
+
+        assert events[-1] == "data: late\n\n"
+        assert events[:-1] and set(events[:-1]) == {": keep-alive\n\n"}
+
+
+class TestWebSockets:
+    """WebSockets are bridged to the backend in both directions"""
+
+    def test_messages_flow_both_ways_and_client_close_reaches_backend(self):
+        backends = []
+
+        async def connect(url, **kwargs):
+            assert url == "ws://chat:8080/ws/chat?room=1"
+            backends.append(FakeBackend())
+            return backends[0]
+
+        with patch("src.stream_proxy.websocket_connect", connect), patch.dict("src.routers.proxy_router.SERVICE_URLS", {"chat": "http://chat:8080"}):
+            with client.websocket_connect("/chat-proxy/ws/chat?room=1") as websocket:
+                websocket.send_text("hello")
+                assert websocket.receive_text() == "echo: hello"
+                websocket.send_bytes(b"\x00\x01")
+                assert websocket.receive_text() == "echo: b'\\x00\\x01'"
+                websocket.close(1000)
+                wait_for(lambda: stream_limiter.open["chat"] == 0)
+
+        assert backends[0].sent == ["hello", b"\x00\x01"]
+        assert backends[0].close_code == 1000
+        assert stream_limiter.open["chat"] == 0
+
+    def test_backend_close_code_reaches_client(self):
+        async def connect(url, **kwargs):
+            return FakeBackend(script=["bye", None], close_code=4000)
+
+        with patch("src.stream_proxy.websocket_connect", connect):
+            with client.websocket_connect("/chat-proxy/ws") as websocket:
+                assert websocket.receive_text() == "bye"
+                with pytest.raises(WebSocketDisconnect) as exc_info:
+                    websocket.receive_text()
+
+        assert exc_info.value.code == 4000
+        assert stream_limiter.open["chat"] == 0
+
+    def test_websockets_over_the_limit_are_refused(self):
+        with patch.dict(stream_limiter.limits, {"chat": 0}):
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                with client.websocket_connect("/chat-proxy/ws"):
+                    pass
+
+        assert exc_info.value.code == 1013
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,84 @@
+import asyncio
+import httpx
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from src.composition import compose_chat_page, inline_tools
+from src.main import app
+
+SHELL = ("<html><main>", "<p>Welcome</p>", "</main></html>")
+
+CHAT_FRAGMENT = '<div id="tools-list" hx-get="/ui/tools" hx-trigger="load"></div><form hx-post="/ui/chat"></form>'
+TOOLS_FRAGMENT = '<span class="tool-badge">add</span>'
+
+RealAsyncClient = httpx.AsyncClient
+
+
+def mock_chat_service(chat_delay=0.0, tools_delay=0.0, chat_status=200):
+    """Patches httpx.AsyncClient to answer like the chat service."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/ui/chat":
+            await asyncio.sleep(chat_delay)
+            return httpx.Response(chat_status, text=CHAT_FRAGMENT)
+        await asyncio.sleep(tools_delay)
+        return httpx.Response(200, text=TOOLS_FRAGMENT)
+
+    return patch(
+        "src.composition.httpx.AsyncClient",
+        side_effect=lambda **kwargs: RealAsyncClient(**{**kwargs, "transport": httpx.MockTransport(handler)}),
+    )
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_inline_tools_replaces_htmx_trigger():
+    html = inline_tools('<div id="tools-list" hx-get="/chat-proxy/ui/tools" hx-trigger="load"></div>', "TOOLS")
+    assert html == '<div id="tools-list">TOOLS</div>'
+
+    # Only the HTMX load trigger goes; the other attributes stay
+    html = inline_tools('<div id="tools-list" class="tools" hx-get="/chat-proxy/ui/tools" hx-trigger="load" aria-live="polite"></div>', "TOOLS")
+    assert html == '<div id="tools-list" class="tools" aria-live="polite">TOOLS</div>'
+
+
+def test_shell_is_flushed_first_and_fragments_inlined():
+    with mock_chat_service(chat_delay=0.05):
+        chunks = asyncio.run(collect(compose_chat_page(SHELL, "http://chat")))
+
+    assert chunks[0] == SHELL[0]
+    assert chunks[-1] == SHELL[2]
+    page = "".join(chunks)
+    assert "Welcome" not in page
+    assert 'hx-post="/chat-proxy/ui/chat"' in page
+    assert f'<div id="tools-list">{TOOLS_FRAGMENT}</div>' in page
+
+
+def test_late_tools_fragment_is_moved_into_place():
+    with mock_chat_service(tools_delay=0.05):
+        chunks = asyncio.run(collect(compose_chat_page(SHELL, "http://chat")))
+
+    # The chat fragment is sent without waiting for the tools
+    assert '<div id="tools-list"></div>' in chunks[1]
+    assert '<template id="ssi-tools-list">' + TOOLS_FRAGMENT in chunks[2]
+
+
+def test_chat_failure_falls_back_to_htmx():
+    with mock_chat_service(chat_status=500):
+        page = "".join(asyncio.run(collect(compose_chat_page(SHELL, "http://chat"))))
+
+    assert 'hx-get="/chat" hx-trigger="load"' in page
+
+
+def test_main_dashboard_include_mode():
+    client = TestClient(app)
+    with mock_chat_service(chat_delay=0.05):
+        response = client.get("/?include=chat")
+
+    assert response.status_code == 200
+    assert "Welcome to the Sbotify Dashboard" not in response.text
+    assert TOOLS_FRAGMENT in response.text
+    assert "</html>" in response.text
+
+    # Without the include mode the static page is served
+    assert "Welcome to the Sbotify Dashboard" in client.get("/").text
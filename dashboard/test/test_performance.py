@@ -0,0 +1,134 @@
+import asyncio
+from fastapi.testclient import TestClient
+
+from shared.histogram import Histogram
+from src.main import app
+from src.performance import Metric, PerformanceMonitor, Section, WorkerSamples, derive_mcp, parse_prometheus, rate, sparkline
+
+PROMETHEUS_TEXT = """\
+# TYPE mcp_handler_calls_total counter
+mcp_handler_calls_total{kind="tool",name="add",pid="1"} 8
+mcp_handler_errors_total{kind="tool",name="add",pid="1"} 1
+mcp_handler_duration_seconds_bucket{kind="tool",name="add",pid="1",le="0.001"} 6
+mcp_handler_duration_seconds_bucket{kind="tool",name="add",pid="1",le="0.005"} 8
+mcp_handler_duration_seconds_bucket{kind="tool",name="add",pid="1",le="+Inf"} 8
+mcp_handler_duration_seconds_count{kind="tool",name="add",pid="1"} 8
+mcp_handler_calls_total{kind="resource",name="greetings://{name}",pid="1"} 2
+mcp_handler_duration_seconds_bucket{kind="resource",name="greetings://{name}",pid="1",le="0.001"} 2
+mcp_handler_duration_seconds_bucket{kind="resource",name="greetings://{name}",pid="1",le="0.005"} 2
+mcp_handler_duration_seconds_bucket{kind="resource",name="greetings://{name}",pid="1",le="+Inf"} 2
+mcp_handler_duration_seconds_count{kind="resource",name="greetings://{name}",pid="1"} 2
+mcp_cpu_pool_size{pid="1"} 4
+mcp_cpu_pool_busy{pid="1"} 3
+mcp_cpu_pool_queue_depth{pid="1"} 5
+mcp_resource_cache_hits_total{pid="1"} 9
+mcp_resource_cache_misses_total{pid="1"} 1
+"""
+
+
+def test_prometheus_samples_are_summed_over_handlers():
+    parsed = parse_prometheus(PROMETHEUS_TEXT)["1"]
+
+    assert (parsed["calls"], parsed["errors"], parsed["latency_seconds"]["count"]) == (10, 1, 10)
+    assert parsed["latency_seconds"]["buckets"][:3] == [8, 2, 0]
+    assert sum(parsed["latency_seconds"]["buckets"]) == 10
+    assert (parsed["pool_busy"], parsed["queue_depth"], parsed["cache_hits"], parsed["cache_reads"]) == (3, 5, 9, 10)
+
+
+def test_interval_values_come_from_the_difference_between_samples():
+    workers = WorkerSamples(stale_after=60)
+    before = parse_prometheus(PROMETHEUS_TEXT)
+    after = {"1": {**before["1"], "calls": 20, "errors": 2, "cache_hits": 19, "cache_reads": 30}}
+
+    # Rates need two samples
+    assert derive_mcp(workers.update(before, now=0.0), None, 5.0)["calls"] is None
+    values = derive_mcp(workers.update(after, now=5.0), None, 5.0)
+
+    assert values["calls"] == 2.0
+    assert values["errors"] == 0.1
+    assert values["resource_cache"] == 0.5
+    assert values["pool"] == 0.75
+    assert rate(3, 10, 5.0) is None
+
+
+def worker_text(pid: str, calls: int, fast: int, busy: int) -> str:
+    """The Prometheus text of one MCP worker whose `calls` calls took <= 1 ms (`fast` of them) or <= 5 ms."""
+    return f"""\
+mcp_handler_calls_total{{kind="tool",name="add",pid="{pid}"}} {calls}
+mcp_handler_duration_seconds_bucket{{kind="tool",name="add",pid="{pid}",le="0.001"}} {fast}
+mcp_handler_duration_seconds_bucket{{kind="tool",name="add",pid="{pid}",le="0.005"}} {calls}
+mcp_handler_duration_seconds_bucket{{kind="tool",name="add",pid="{pid}",le="+Inf"}} {calls}
+mcp_handler_duration_seconds_count{{kind="tool",name="add",pid="{pid}"}} {calls}
+mcp_cpu_pool_size{{pid="{pid}"}} 2
+mcp_cpu_pool_busy{{pid="{pid}"}} {busy}
+"""
+
+
+def test_workers_are_only_diffed_against_themselves():
+    workers = WorkerSamples(stale_after=60)
+    # Scrapes alternate between a busy worker and an idle one
+    scrapes = [
+        (0.0, worker_text("1", calls=1000, fast=0, busy=2)),
+        (5.0, worker_text("2", calls=10, fast=10, busy=0)),
+        (10.0, worker_text("1", calls=1100, fast=0, busy=1)),
+        (15.0, worker_text("2", calls=20, fast=20, busy=0)),
+    ]
+    values = [derive_mcp(workers.update(parse_prometheus(text), now), None, 5.0) for now, text in scrapes]
+
+    assert [value["calls"] for value in values] == [None, None, 10.0, 11.0]
+    # Diffing worker 2 against worker 1 would have made the buckets negative
+    assert all(min(worker["interval"]["latency_seconds"]["buckets"]) >= 0 for worker in workers.workers.values())
+    assert 1.0 < values[-1]["latency_p95"] <= 5.0
+    assert values[-1]["pool"] == 0.25
+    # A worker that is no longer seen drops out
+    workers.update(parse_prometheus(worker_text("2", calls=30, fast=30, busy=0)), now=100.0)
+    assert list(workers.workers) == ["2"]
+
+
+def test_series_are_fixed_size_ring_buffers():
+    counter = Histogram()
+
+    async def fetch():
+        counter.observe(0.01)
+        return {"count": counter.count}
+
+    section = Section("test", "Test", fetch, lambda current, previous, elapsed: {"count": current["count"]}, [Metric("count", "Count")])
+    monitor = PerformanceMonitor([section], interval=1.0, history=3)
+
+    async def sample_five_times():
+        for _ in range(5):
+            await monitor.sample()
+
+    asyncio.run(sample_five_times())
+    assert list(section.series["count"]) == [3, 4, 5]
+
+
+def test_failing_sources_leave_gaps():
+    async def fetch():
+        raise ConnectionError("unreachable")
+
+    section = Section("down", "Down", fetch, lambda *args: {"x": 1.0}, [Metric("x", "X")])
+    monitor = PerformanceMonitor([section], history=3)
+    asyncio.run(monitor.sample())
+
+    assert list(section.series["x"]) == [None]
+    assert section.error == "unreachable"
+
+
+def test_sparkline_breaks_at_gaps():
+    svg = sparkline([1.0, 2.0, None, 3.0, 4.0, None, 5.0], capacity=10)
+
+    assert svg.count("<polyline") == 2
+    assert svg.count("<circle") == 1
+
+
+def test_performance_panel_renders_and_polls():
+    with TestClient(app) as client:
+        response = client.get("/performance")
+        cards = client.get("/performance/cards")
+
+    assert response.status_code == 200
+    assert 'hx-get="/performance/cards"' in response.text
+    assert "Dashboard proxy" in response.text and "Chat service" in response.text
+    assert cards.status_code == 200
+    assert "<svg" in cards.text
@@ -1,28 +1,296 @@
+"""
+MCP client and load generator for the Sbotify MCP server.
+
+    uv run mcp-client/client.py                       # connect and list the tools
+    uv run mcp-client/client.py bench [options]       # replay a mix of operations
+    uv run mcp-client/client.py compare old.json new.json
+
+The target is MCP_SERVER_URL (or --target): an http(s) URL, or the path of
+server.py, which is started over stdio for every session or, with
+--transport memory, imported and served in-process.
+
+`bench` opens --sessions concurrent sessions and replays a weighted mix of
+tool calls, resource reads and prompt fetches (DEFAULT_SCENARIO, or --scenario
+with a JSON list in the same format). With --rate it runs open-loop at that
+many operations per second in total, measuring latency from each operation's
+scheduled start. Without it, it runs closed-loop at maximum throughput. It
+reports p50/p95/p99 latency, throughput and error rate per operation, and
+--output writes the results as JSON for `compare`.
+"""
+
+import argparse
 import asyncio
+import importlib
+import itertools
+import json
+import math
 import os
+import random
 import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
 from fastmcp import Client
+from fastmcp.client.transports import PythonStdioTransport
 
 MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://localhost:8080/mcp")
-print(MCP_SERVER_URL)
-client = Client(MCP_SERVER_URL)
-print("Client initialized.")
-async def main():
-    async with client:
+
+# Each operation: a unique name, its kind (tool, resource or prompt), the target
+# (tool name, resource URI or prompt name), arguments and a relative weight
+DEFAULT_SCENARIO: List[Dict[str, Any]] = [
+    {"name": "add", "kind": "tool", "target": "add", "arguments": {"a": 2, "b": 3}, "weight": 5},
+    {"name": "describe-1k", "kind": "tool", "target": "describe", "arguments": {"data": list(range(1000))}, "weight": 2},
+    {"name": "config", "kind": "resource", "target": "resource://config", "weight": 1},
+    {"name": "greeting", "kind": "resource", "target": "greetings://Ada", "weight": 1},
+    {"name": "analyze-data", "kind": "prompt", "target": "analyze_data", "arguments": {"data_points": [1.0, 2.5, 4.0, 3.5]}, "weight": 1},
+]
+
+
+def make_client(target: str, transport: str) -> Client:
+    """Creates a client for an http URL, a server script over stdio, or a server script in-process."""
+    if transport == "memory":
+        # Imported under its own name next to its modules (analytics, encoding, ...),
+        # so that CPU pool workers can import it too, with the repo root for `shared`
+        path = Path(target).resolve()
+        for folder in (path.parent.parent, path.parent):
+            if str(folder) not in sys.path:
+                sys.path.insert(0, str(folder))
+        return Client(importlib.import_module(path.stem).mcp)
+    if target.endswith(".py"):
+        # Every session starts its own server process
+        return Client(PythonStdioTransport(target, env=dict(os.environ, MCP_TRANSPORT="stdio")))
+    return Client(target)
+
+
+async def run_operation(client: Client, operation: Dict[str, Any]) -> None:
+    """Runs one operation and raises if it failed."""
+    kind, target, arguments = operation["kind"], operation["target"], operation.get("arguments") or {}
+    if kind == "tool":
+        result = await client.call_tool_mcp(target, arguments)
+        if result.isError:
+            raise RuntimeError(" ".join(getattr(block, "text", "") for block in result.content))
+    elif kind == "resource":
+        await client.read_resource(target)
+    elif kind == "prompt":
+        await client.get_prompt(target, arguments)
+    else:
+        raise ValueError(f"Unknown operation kind {kind!r}")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "throughput": count / duration if duration else 0.0,
+        "mean_ms": sum(ordered) / count * 1000 if count else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000 if count else 0.0,
+    }
+
+
+class LoadGenerator:
+    def __init__(self, clients: List[Client], scenario: List[Dict[str, Any]], seed: int = 0):
+        self.clients = clients
+        self.scenario = scenario
+        self.weights = [operation.get("weight", 1) for operation in scenario]
+        self.random = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = {operation["name"]: [] for operation in scenario}
+        self.errors: Dict[str, int] = {operation["name"]: 0 for operation in scenario}
+        self.error_samples: Dict[str, str] = {}
+        self.recording = False
+
+    def reset(self) -> None:
+        """Forgets everything recorded so far, e.g. during the warmup."""
+        for name in self.latencies:
+            self.latencies[name] = []
+            self.errors[name] = 0
+        self.error_samples = {}
+
+    def pick(self) -> Dict[str, Any]:
+        return self.random.choices(self.scenario, self.weights)[0]
+
+    async def measure(self, client: Client, operation: Dict[str, Any], scheduled: float) -> None:
+        # Latency counts from the scheduled start, so a backed-up server is not hidden (open loop)
+        error = None
+        try:
+            await run_operation(client, operation)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if self.recording:
+            self.latencies[operation["name"]].append(time.perf_counter() - scheduled)
+            if error is not None:
+                self.errors[operation["name"]] += 1
+                self.error_samples.setdefault(operation["name"], error)
+
+    async def closed_loop(self, deadline: float) -> None:
+        async def session(client: Client) -> None:
+            while time.perf_counter() < deadline:
+                await self.measure(client, self.pick(), time.perf_counter())
+
+        await asyncio.gather(*(session(client) for client in self.clients))
+
+    async def open_loop(self, rate: float, deadline: float) -> None:
+        # Poisson arrivals at the target rate, spread round-robin over the sessions
+        in_flight = set()
+        clients = itertools.cycle(self.clients)
+        scheduled = time.perf_counter()
+        while True:
+            scheduled += self.random.expovariate(rate)
+            if scheduled >= deadline:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            task = asyncio.create_task(self.measure(next(clients), self.pick(), scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        await asyncio.gather(*in_flight)
+
+    async def run(self, duration: float, warmup: float, rate: Optional[float]) -> float:
+        """Runs the warmup (not recorded) and the measured phase; returns the measured duration."""
+        elapsed = 0.0
+        for recording, seconds in ((False, warmup), (True, duration)):
+            if seconds <= 0:
+                continue
+            self.recording = recording
+            if recording:
+                self.reset()
+            start = time.perf_counter()
+            if rate:
+                await self.open_loop(rate, start + seconds)
+            else:
+                await self.closed_loop(start + seconds)
+            elapsed = time.perf_counter() - start
+        return elapsed
+
+    def results(self, duration: float) -> Dict[str, Any]:
+        operations = {
+            name: summarize(self.latencies[name], self.errors[name], duration)
+            for name in self.latencies
+        }
+        all_latencies = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            "operations": operations,
+            "total": summarize(all_latencies, sum(self.errors.values()), duration),
+            "error_samples": self.error_samples,
+        }
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    print(f"{'operation':<16}{'count':>8}{'ops/s':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(results["operations"].items()) + [("TOTAL", results["total"])]
+    for name, stats in rows:
+        print(
+            f"{name:<16}{stats['count']:>8}{stats['throughput']:>10.1f}{stats['error_rate']:>8.1%}"
+            f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        )
+    for name, sample in results["error_samples"].items():
+        print(f"  {name} error: {sample}")
+
+
+async def bench(args: argparse.Namespace) -> Dict[str, Any]:
+    scenario = json.loads(Path(args.scenario).read_text()) if args.scenario else DEFAULT_SCENARIO
+    clients = [make_client(args.target, args.transport) for _ in range(args.sessions)]
+    # Sessions are connected before the clock starts
+    for client in clients:
+        await client.__aenter__()
+    try:
+        generator = LoadGenerator(clients, scenario, seed=args.seed)
+        duration = await generator.run(args.duration, args.warmup, args.rate)
+    finally:
+        for client in clients:
+            await client.__aexit__(None, None, None)
+
+    results = {
+        "config": {
+            "target": args.target,
+            "transport": args.transport,
+            "sessions": args.sessions,
+            "mode": "open-loop" if args.rate else "closed-loop",
+            "rate": args.rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "scenario": [operation["name"] for operation in scenario],
+        },
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        **generator.results(duration),
+    }
+    print_table(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+    return results
+
+
+def compare(args: argparse.Namespace) -> None:
+    """Prints throughput and latency changes of every operation between two result files."""
+    old, new = (json.loads(Path(path).read_text()) for path in (args.baseline, args.candidate))
+    print(f"{'operation':<16}{'ops/s':>18}{'p50 ms':>18}{'p99 ms':>18}{'errors':>14}")
+    names = list(old["operations"]) + [name for name in new["operations"] if name not in old["operations"]]
+    for name in names + ["TOTAL"]:
+        before = old["total"] if name == "TOTAL" else old["operations"].get(name)
+        after = new["total"] if name == "TOTAL" else new["operations"].get(name)
+        if not before or not after:
+            print(f"{name:<16}  only in {'candidate' if after else 'baseline'}")
+            continue
+        cells = []
+        for key in ("throughput", "p50_ms", "p99_ms"):
+            change = (after[key] / before[key] - 1) if before[key] else 0.0
+            cells.append(f"{after[key]:>9.1f} ({change:+.0%})")
+        print(f"{name:<16}{cells[0]:>18}{cells[1]:>18}{cells[2]:>18}{after['error_rate']:>13.1%}")
+
+
+async def list_tools(args: argparse.Namespace) -> None:
+    print(args.target)
+    async with make_client(args.target, args.transport) as client:
         print("Client connected.")
         tools = await client.list_tools()
-        print("Available tools:", tools)    
-        # Ping the server to confirm connection
-        # response = await client.ping()
-        # print(f"Ping successful. Server says: {response}")
+        print("Available tools:", tools)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default=MCP_SERVER_URL, help="http URL or path of server.py (default: MCP_SERVER_URL)")
+    parser.add_argument("--transport", choices=["auto", "memory"], default="auto",
+                        help="auto: http for URLs and stdio for scripts; memory: import the server script in-process")
+    commands = parser.add_subparsers(dest="command")
+
+    bench_parser = commands.add_parser("bench", help="run a load test")
+    bench_parser.add_argument("--sessions", type=int, default=10, help="concurrent MCP sessions")
+    bench_parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    bench_parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before the measurement")
+    bench_parser.add_argument("--rate", type=float, help="open-loop target in operations per second (default: closed-loop)")
+    bench_parser.add_argument("--scenario", help="JSON file with the operation mix (default: built-in mix)")
+    bench_parser.add_argument("--seed", type=int, default=0)
+    bench_parser.add_argument("--output", help="write the results to this JSON file")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args)
+    elif args.command == "bench":
+        asyncio.run(bench(args))
+    else:
+        asyncio.run(list_tools(args))
 
-        # # Example: Call a tool from the server
-        # status = await client.get_server_status()
-        # print(f"Server Status: {status}")
 
 if __name__ == "__main__":
     if sys.platform.startswith('win'):
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    
-    # Run the main async function
-    asyncio.run(main())
+
+    main()
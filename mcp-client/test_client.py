@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import json
+
+import pytest
+
+from client import LoadGenerator, compare, percentile
+
+
+def test_percentile_is_the_nearest_rank():
+    values = [float(value) for value in range(1, 11)]
+
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 95) == 10.0
+    assert percentile(values, 90) == 9.0
+    assert percentile(values, 0) == 1.0
+    assert percentile(values, 100) == 10.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 25) == 1.0
+    assert percentile([], 99) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_warmup_errors_are_not_counted(monkeypatch):
+    generator = LoadGenerator([None], [{"name": "add", "kind": "tool", "target": "add"}])
+
+    async def fail_during_warmup(client, operation):
+        await asyncio.sleep(0.001)
+        if not generator.recording:
+            raise ConnectionError("cold")
+
+    monkeypatch.setattr("client.run_operation", fail_during_warmup)
+    duration = await generator.run(duration=0.05, warmup=0.05, rate=None)
+
+    results = generator.results(duration)
+    assert results["operations"]["add"]["count"] > 0
+    assert results["operations"]["add"]["errors"] == 0
+    assert results["error_samples"] == {}
+
+
+def result_file(path, throughput, p50_ms, p99_ms, operations=("add",)):
+    stats = {"throughput": throughput, "p50_ms": p50_ms, "p99_ms": p99_ms, "error_rate": 0.0}
+    path.write_text(json.dumps({"operations": {name: stats for name in operations}, "total": stats}))
+    return str(path)
+
+
+def test_compare_prints_the_change_per_operation(tmp_path, capsys):
+    baseline = result_file(tmp_path / "old.json", 100.0, 2.0, 10.0)
+    candidate = result_file(tmp_path / "new.json", 150.0, 1.0, 0.0, operations=("add", "describe"))
+    compare(argparse.Namespace(baseline=baseline, candidate=candidate))
+
+    lines = capsys.readouterr().out.splitlines()
+    add = next(line for line in lines if line.startswith("add"))
+    assert "150.0 (+50%)" in add and "1.0 (-50%)" in add and "0.0 (-100%)" in add
+    assert any(line.startswith("describe") and "only in candidate" in line for line in lines)
+    assert lines[-1].startswith("TOTAL")
@@ -0,0 +1,160 @@
+"""
+Vectorized numeric analytics used by the MCP tools in server.py.
+
+Every function works on whole NumPy arrays, so there are no Python-level loops
+over the data points and series with millions of points stay cheap.
+"""
+
+import math
+from typing import Iterator, Literal
+
+import numpy as np
+import numpy.typing as npt
+
+from encoding import decode_array
+
+Operation = Literal["add", "subtract", "multiply", "divide", "power", "minimum", "maximum"]
+
+OPERATIONS = {
+    "add": np.add,
+    "subtract": np.subtract,
+    "multiply": np.multiply,
+    "divide": np.divide,
+    "power": np.power,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+}
+
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+
+def as_array(values) -> npt.NDArray[np.float64]:
+    """Converts a list, array or EncodedArray of numbers into a 1-D float64 array."""
+    return np.asarray(decode_array(values), dtype=np.float64).ravel()
+
+
+def _require_data(array: np.ndarray) -> None:
+    if array.size == 0:
+        raise ValueError("At least one data point is required.")
+
+
+def describe(values) -> dict:
+    """Summary statistics of a series."""
+    array = as_array(values)
+    _require_data(array)
+    q1, median, q3 = np.percentile(array, [25.0, 50.0, 75.0])
+    return {
+        "count": int(array.size),
+        "sum": float(array.sum()),
+        "mean": float(array.mean()),
+        "std": float(array.std(ddof=1)) if array.size > 1 else 0.0,
+        "min": float(array.min()),
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        "max": float(array.max()),
+    }
+
+
+def running_describe(values, chunk_size: int = 100_000) -> Iterator[tuple[int, int, dict]]:
+    """
+    Works through a series chunk by chunk and yields (chunks done, total chunks,
+    statistics so far) after each one. Chunk means and variances are merged
+    pairwise, which stays accurate for long series.
+    """
+    array = as_array(values)
+    _require_data(array)
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+    total = -(-array.size // chunk_size)
+    count, mean, m2 = 0, 0.0, 0.0
+    minimum, maximum = math.inf, -math.inf
+    for done, start in enumerate(range(0, array.size, chunk_size), 1):
+        chunk = array[start:start + chunk_size]
+        chunk_mean = float(chunk.mean())
+        delta = chunk_mean - mean
+        merged = count + chunk.size
+        m2 += float(((chunk - chunk_mean) ** 2).sum()) + delta * delta * count * chunk.size / merged
+        mean += delta * chunk.size / merged
+        count = merged
+        minimum = min(minimum, float(chunk.min()))
+        maximum = max(maximum, float(chunk.max()))
+        yield done, total, {
+            "count": count,
+            "sum": mean * count,
+            "mean": mean,
+            "std": math.sqrt(m2 / (count - 1)) if count > 1 else 0.0,
+            "min": minimum,
+            "max": maximum,
+        }
+
+
+def percentiles(values, q=DEFAULT_PERCENTILES) -> dict[str, float]:
+    """Percentiles of a series, keyed by percentile (e.g. "p95")."""
+    array = as_array(values)
+    _require_data(array)
+    q = np.asarray(q, dtype=np.float64)
+    if np.any((q < 0) | (q > 100)):
+        raise ValueError("Percentiles must be between 0 and 100.")
+    return {f"p{p:g}": float(v) for p, v in zip(q.tolist(), np.percentile(array, q).tolist())}
+
+
+def histogram(values, bins: int = 10) -> dict[str, list]:
+    """Counts per equal-width bin; `edges` has one more entry than `counts`."""
+    array = as_array(values)
+    _require_data(array)
+    if bins < 1:
+        raise ValueError("bins must be at least 1.")
+    counts, edges = np.histogram(array, bins=bins)
+    return {"counts": counts.tolist(), "edges": edges.tolist()}
+
+
+def moving_average(values, window: int) -> npt.NDArray[np.float64]:
+    """Simple moving average over `window` points, computed with a cumulative sum."""
+    array = as_array(values)
+    if window < 1 or window > array.size:
+        raise ValueError("window must be between 1 and the number of data points.")
+    cumsum = np.cumsum(np.concatenate(([0.0], array)))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def elementwise(operation: Operation, a, b) -> npt.NDArray[np.float64]:
+    """
+    Applies an arithmetic operation elementwise; `b` may be a scalar or an array
+    of the same length. Results that are not finite numbers (a division by zero,
+    an overflowing power) raise a ValueError, as JSON has no inf or nan.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation {operation!r}, expected one of {sorted(OPERATIONS)}.")
+    left = as_array(a)
+    right = np.float64(b) if isinstance(b, (int, float)) else as_array(b)
+    if right.ndim and right.shape != left.shape:
+        raise ValueError("a and b must have the same length.")
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        result = OPERATIONS[operation](left, right)
+    not_finite = np.flatnonzero(~np.isfinite(result))
+    if not_finite.size:
+        index = int(not_finite[0])
+        raise ValueError(
+            f"{operation} gives {result[index]} at index {index} "
+            f"({not_finite.size} non-finite result(s) in total); only finite numbers can be returned."
+        )
+    return result
+
+
+def summary_text(values, bins: int = 10) -> str:
+    """A compact, human-readable summary of a series to embed in prompts; an empty series says so."""
+    array = as_array(values)
+    if array.size == 0:
+        return "count=0 (no data points)"
+    stats = describe(array)
+    pct = percentiles(array)
+    hist = histogram(array, bins=bins)
+    lines = [
+        f"count={stats['count']}, mean={stats['mean']:.6g}, std={stats['std']:.6g}, sum={stats['sum']:.6g}",
+        f"min={stats['min']:.6g}, q1={stats['q1']:.6g}, median={stats['median']:.6g}, q3={stats['q3']:.6g}, max={stats['max']:.6g}",
+        "percentiles: " + ", ".join(f"{key}={value:.6g}" for key, value in pct.items()),
+        f"histogram ({bins} bins from {hist['edges'][0]:.6g} to {hist['edges'][-1]:.6g}): "
+        + " ".join(str(count) for count in hist["counts"]),
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,73 @@
+"""
+Production entry point for the MCP server.
+
+Serves the FastMCP app over streamable HTTP. By default that is one process
+with stateful sessions, which everything in the server relies on: resource
+subscriptions (resource_cache.py), cancelling a running call
+(notifications/cancelled) and the tools/list_changed notifications that make
+the chat service rebuild its context cache.
+
+MCP_STATELESS=1 switches to stateless HTTP with several uvicorn worker
+processes. No session state is kept in a worker, so any worker (or any Cloud
+Run instance) can handle any request and no sticky sessions are needed, which
+scales tool calls across cores. The price is those session features:
+subscriptions are refused (clients compare the versions in resource://cache
+instead), cancellations reach a new session that does not know the call, and
+no list_changed notifications are delivered (the chat service still re-reads
+the catalog every minute).
+
+Usage (from the mcp-server folder):
+
+    python asgi.py
+    MCP_STATELESS=1 MCP_WORKERS=4 python asgi.py
+
+Configuration:
+    PORT                    port to listen on (default 8080)
+    MCP_STATELESS           1 for stateless HTTP with several workers (default 0)
+    MCP_WORKERS             number of worker processes with MCP_STATELESS=1 (default: number of CPUs);
+                            stateful sessions live in one process, so it is 1 otherwise
+    MCP_GRACEFUL_SHUTDOWN   seconds to let in-flight requests finish on SIGTERM (default 10)
+    MCP_CPU_WORKERS         CPU pool size per worker (default: CPUs divided by the workers)
+"""
+
+import logging
+import os
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+
+def stateless() -> bool:
+    return os.environ.get("MCP_STATELESS", "0").lower() in ("1", "true", "yes")
+
+
+def create_app():
+    """Builds the ASGI app; called once in every worker process."""
+    # Imported here, so the supervising process stays light and starts quickly
+    from server import mcp
+    return mcp.http_app(stateless_http=stateless())
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    if stateless():
+        workers = int(os.environ.get("MCP_WORKERS", cpus))
+    else:
+        if int(os.environ.get("MCP_WORKERS", "1")) != 1:
+            logger.warning("MCP_WORKERS is ignored without MCP_STATELESS=1: sessions live in one process")
+        workers = 1
+    # Every worker has its own CPU-bound tool pool; share the cores between them
+    os.environ.setdefault("MCP_CPU_WORKERS", str(max(1, cpus // workers)))
+    uvicorn.run(
+        "asgi:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", "8080")),
+        workers=workers,
+        timeout_graceful_shutdown=int(os.environ.get("MCP_GRACEFUL_SHUTDOWN", "10")),
+    )
+
+
+if __name__ == "__main__":
+    main()
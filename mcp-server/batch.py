@@ -0,0 +1,94 @@
+"""
+Batch execution of tool calls and resource reads in a single MCP request.
+
+Each item is either a tool call or a resource read:
+
+    {"tool": "add", "arguments": {"a": 1, "b": 2}}
+    {"resource": "greetings://Ada"}
+
+The items run concurrently, at most `max_concurrency` at a time, as requests
+of an in-memory client of the server. So each item goes through the normal
+middleware (metrics see every item) and has its own request context, without
+a progress token: only the batch reports progress, as items complete. Results
+come back in the order of the items, each with either a "result" or an "error".
+"""
+
+import asyncio
+from typing import Any, Optional, TypedDict
+
+from fastmcp import Client, Context, FastMCP
+from mcp.types import TextResourceContents
+
+from progress import report_progress
+
+BATCH_TOOL = "batch"
+MAX_BATCH_ITEMS = 100
+MAX_BATCH_CONCURRENCY = 16
+
+
+class BatchItem(TypedDict, total=False):
+    tool: str
+    arguments: dict[str, Any]
+    resource: str
+
+
+class BatchResult(TypedDict, total=False):
+    index: int
+    tool: str
+    resource: str
+    result: Any
+    error: str
+
+
+def _tool_output(result: Any) -> Any:
+    if result.structured_content is not None:
+        return result.structured_content
+    return "\n".join(block.text for block in result.content if getattr(block, "text", None) is not None)
+
+
+def _resource_output(contents: list) -> Any:
+    # Blobs are already base64 on the wire
+    outputs = [content.text if isinstance(content, TextResourceContents) else content.blob for content in contents]
+    return outputs[0] if len(outputs) == 1 else outputs
+
+
+async def _run_item(client: Client, index: int, item: BatchItem, semaphore: asyncio.Semaphore) -> BatchResult:
+    tool: Optional[str] = item.get("tool")
+    resource: Optional[str] = item.get("resource")
+    result: BatchResult = {"index": index}
+    if tool:
+        result["tool"] = tool
+    if resource:
+        result["resource"] = resource
+
+    async with semaphore:
+        try:
+            if bool(tool) == bool(resource):
+                raise ValueError("Each item needs exactly one of 'tool' or 'resource'.")
+            if tool == BATCH_TOOL:
+                raise ValueError("Batches cannot be nested.")
+            if tool:
+                result["result"] = _tool_output(await client.call_tool(tool, item.get("arguments") or {}))
+            else:
+                result["result"] = _resource_output(await client.read_resource(resource))
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+    return result
+
+
+async def run_batch(server: FastMCP, items: list[BatchItem], max_concurrency: int = 8, ctx: Optional[Context] = None) -> list[BatchResult]:
+    """Runs the items concurrently with bounded fan-out and returns their results in order."""
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"A batch can hold at most {MAX_BATCH_ITEMS} items.")
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency, MAX_BATCH_CONCURRENCY)))
+    done = 0
+
+    async def run_and_report(client: Client, index: int, item: BatchItem) -> BatchResult:
+        nonlocal done
+        result = await _run_item(client, index, item, semaphore)
+        done += 1
+        await report_progress(ctx, done, len(items), f"{done}/{len(items)} items done")
+        return result
+
+    async with Client(server) as client:
+        return list(await asyncio.gather(*(run_and_report(client, index, item) for index, item in enumerate(items))))
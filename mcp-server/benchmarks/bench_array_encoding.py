@@ -0,0 +1,64 @@
+"""
+Payload size and parse time of numeric tool arguments: JSON lists versus the
+compact base64 encoding from encoding.py (plain and zlib-compressed).
+
+Parse time is the time to get from the JSON request text to a float64 NumPy
+array on the server, which is what the analytics tools work on.
+
+Usage (from the mcp-server folder):
+
+    PYTHONPATH=. python benchmarks/bench_array_encoding.py --max-exponent 7
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from encoding import decode_array, encode_array
+
+
+def timed(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(n: int, repeat: int) -> list[tuple[str, int, float]]:
+    # Random values are the worst case for compression and for JSON's decimal text
+    values = np.random.default_rng(n).normal(size=n)
+    payloads = {
+        "json list": json.dumps({"data": values.tolist()}),
+        "base64": json.dumps({"data": encode_array(values)}),
+        "base64+zlib": json.dumps({"data": encode_array(values, compress=True)}),
+    }
+    results = []
+    for name, payload in payloads.items():
+        parse = lambda: decode_array(json.loads(payload)["data"])  # noqa: E731
+        results.append((name, len(payload), timed(parse, repeat)))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-exponent", type=int, default=7, help="benchmark 10^3 .. 10^N elements")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'elements':>10}  {'encoding':<12}{'payload bytes':>15}{'parse ms':>11}{'size vs json':>14}{'speedup':>9}")
+    for exponent in range(3, args.max_exponent + 1):
+        results = bench(10 ** exponent, args.repeat)
+        json_size, json_time = results[0][1], results[0][2]
+        for name, size, seconds in results:
+            print(
+                f"{10 ** exponent:>10}  {name:<12}{size:>15}{seconds * 1000:>11.2f}"
+                f"{size / json_size:>14.2f}{json_time / seconds:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Tool-call throughput of the stateless HTTP entry point (asgi.py) against the
+number of worker processes.
+
+For every worker count, the server is started on a free port and load is
+generated by several client processes, each running concurrent MCP sessions
+that call one tool in a closed loop for a fixed duration.
+
+Usage (from the mcp-server folder):
+
+    PYTHONPATH=. python benchmarks/bench_workers.py --workers 1 2 4 --sessions 32 --duration 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from fastmcp import Client
+
+TOOL_ARGUMENTS = {
+    "add": {"a": 1, "b": 2},
+    "describe": {"data": list(range(10_000))},
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+async def session(url: str, tool: str, deadline: float) -> int:
+    calls = 0
+    async with Client(url) as client:
+        while time.monotonic() < deadline:
+            await client.call_tool(tool, TOOL_ARGUMENTS[tool])
+            calls += 1
+    return calls
+
+
+async def load(url: str, tool: str, sessions: int, duration: float) -> int:
+    deadline = time.monotonic() + duration
+    return sum(await asyncio.gather(*(session(url, tool, deadline) for _ in range(sessions))))
+
+
+def load_process(args: tuple) -> int:
+    return asyncio.run(load(*args))
+
+
+def bench(workers: int, tool: str, sessions: int, client_processes: int, duration: float) -> float:
+    port = free_port()
+    env = dict(os.environ, MCP_STATELESS="1", MCP_WORKERS=str(workers), PORT=str(port))
+    server = subprocess.Popen([sys.executable, "asgi.py"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}/mcp"
+        wait_until_ready(url)
+        per_process = max(1, sessions // client_processes)
+        with multiprocessing.get_context("spawn").Pool(client_processes) as pool:
+            calls = sum(pool.map(load_process, [(url, tool, per_process, duration)] * client_processes))
+        return calls / duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--tool", choices=sorted(TOOL_ARGUMENTS), default="add")
+    parser.add_argument("--sessions", type=int, default=32, help="concurrent MCP sessions in total")
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}{'calls/s':>12}{'speedup':>9}")
+    baseline = None
+    for workers in args.workers:
+        throughput = bench(workers, args.tool, args.sessions, args.client_processes, args.duration)
+        baseline = baseline or throughput
+        print(f"{workers:>8}{throughput:>12.1f}{throughput / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
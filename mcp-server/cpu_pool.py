@@ -0,0 +1,299 @@
+"""
+Process-pool execution for CPU-bound MCP tools.
+
+Tools run on the event loop by default, so one heavy call stalls every other
+session on the instance. Tools marked with `@cpu_bound` (placed under
+`@mcp.tool`) run in a pool of worker processes instead:
+
+    @mcp.tool
+    @cpu_bound(timeout=30)
+    def describe(data: NumberArray) -> dict:
+        ...
+
+Module-level functions can also be sent to the pool directly with
+`await run_cpu_bound(func, *args)`.
+
+Each worker is a separate process, so a call that times out or is cancelled
+is stopped by terminating its worker, and a fresh worker takes its place.
+NumPy results above SHARED_MEMORY_THRESHOLD bytes are returned through shared
+memory, so the array data is not pickled and piped back. The parent names each
+call's segment and unlinks it when the result never arrives (a timeout, a
+cancellation or a dead worker).
+
+Configuration: MCP_CPU_WORKERS (pool size, default the number of CPUs, 0 runs
+the tools inline on the event loop) and MCP_CPU_TIMEOUT (seconds, default 60).
+"""
+
+import asyncio
+import atexit
+import functools
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Optional, Set, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARED_MEMORY_THRESHOLD = 1 << 20
+
+# Functions decorated with @cpu_bound, by "module:qualified name". Workers import
+# the modules that define them, so the decorator has registered them there as well.
+_REGISTRY: Dict[str, Callable[..., Any]] = {}
+_MODULES: Set[str] = set()
+
+# Numbers the shared-memory segments of this process's calls
+_SEGMENTS = itertools.count()
+
+
+class CpuTimeoutError(TimeoutError):
+    """Raised when a CPU-bound call does not finish within its timeout."""
+
+
+class CpuWorkerError(RuntimeError):
+    """Raised when a CPU-bound call fails inside the worker process."""
+
+
+def _export(result: Any, segment: str) -> Any:
+    """Moves large arrays into the shared-memory segment named by the parent; runs in the worker."""
+    if isinstance(result, np.ndarray) and result.nbytes >= SHARED_MEMORY_THRESHOLD:
+        shm = SharedMemory(name=segment, create=True, size=result.nbytes, track=False)
+        np.ndarray(result.shape, dtype=result.dtype, buffer=shm.buf)[...] = result
+        shm.close()
+        return ("shm", shm.name, result.dtype.str, result.shape)
+    return ("value", result)
+
+
+def _release(shm: SharedMemory) -> None:
+    shm.close()
+    shm.unlink()
+
+
+def _discard(segment: str) -> None:
+    """Unlinks a call's segment if its worker created one that never reached us."""
+    try:
+        _release(SharedMemory(name=segment, track=False))
+    except FileNotFoundError:
+        pass
+
+
+def _import(payload: Any) -> Any:
+    """Maps a shared-memory result onto an array without copying; runs in the parent."""
+    if payload[0] == "value":
+        return payload[1]
+    _, name, dtype, shape = payload
+    shm = SharedMemory(name=name, track=False)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    # The segment is released once the array is garbage collected
+    weakref.finalize(array, _release, shm)
+    return array
+
+
+def _worker_main(conn: Connection, modules: Set[str]) -> None:
+    # Shutdown is driven by the parent, not by Ctrl+C reaching the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for module in modules:
+        importlib.import_module(module)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        target, args, kwargs, segment = message
+        try:
+            func = _REGISTRY[target] if isinstance(target, str) else target
+            conn.send(("ok", _export(func(*args, **kwargs), segment)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, context, modules: Set[str]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, modules), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def call(self, message: Any) -> Any:
+        """Sends a call and waits for its result; runs on an I/O thread."""
+        self.conn.send(message)
+        return self.conn.recv()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class CpuPool:
+    """A fixed-size pool of worker processes with per-call timeouts and cancellation."""
+
+    def __init__(self, size: int, default_timeout: float = 60.0, start_method: str = "spawn"):
+        self.size = size
+        self.default_timeout = default_timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._idle: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: Set[_Worker] = set()
+        # Blocking pipe I/O happens on these threads, one per busy worker
+        self._io = ThreadPoolExecutor(max_workers=max(size, 1), thread_name_prefix="cpu-pool-io")
+
+        # Metrics
+        self.queued = 0
+        self.busy = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.restarts = 0
+
+    def _start(self) -> None:
+        # Workers are started on first use, so importing the server stays fast.
+        # The idle queue belongs to one event loop; a new loop gets a new queue.
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+        for worker in self._workers:
+            self._idle.put_nowait(worker)
+        for _ in range(self.size - len(self._workers)):
+            self._add_worker()
+
+    def _add_worker(self) -> None:
+        worker = _Worker(self._context, set(_MODULES))
+        self._workers.add(worker)
+        self._idle.put_nowait(worker)
+
+    def _replace(self, worker: _Worker) -> None:
+        self._workers.discard(worker)
+        worker.kill()
+        self.restarts += 1
+        self._add_worker()
+
+    async def run(self, target: Union[str, Callable[..., Any]], args: tuple = (), kwargs: Optional[dict] = None, timeout: Optional[float] = None) -> Any:
+        """Runs a registered name or a picklable module-level function in a worker."""
+        if self.size <= 0:
+            func = _REGISTRY[target] if isinstance(target, str) else target
+            return func(*args, **(kwargs or {}))
+        if self._loop is not asyncio.get_running_loop():
+            self._start()
+
+        self.queued += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self.queued -= 1
+
+        self.busy += 1
+        loop = asyncio.get_running_loop()
+        # The parent names the segment, so it can unlink it when the result never arrives
+        segment = f"mcp-cpu-{os.getpid()}-{next(_SEGMENTS)}"
+        try:
+            status, payload = await asyncio.wait_for(
+                loop.run_in_executor(self._io, worker.call, (target, args, kwargs or {}, segment)),
+                timeout or self.default_timeout,
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._replace(worker)
+            _discard(segment)
+            raise CpuTimeoutError(f"CPU-bound call timed out after {timeout or self.default_timeout}s")
+        except asyncio.CancelledError:
+            # Stop the work itself, not just our wait for it
+            self.cancelled += 1
+            self._replace(worker)
+            _discard(segment)
+            raise
+        except (EOFError, OSError) as e:
+            self.failed += 1
+            self._replace(worker)
+            _discard(segment)
+            raise CpuWorkerError(f"CPU worker died: {e}")
+        else:
+            self._idle.put_nowait(worker)
+        finally:
+            self.busy -= 1
+
+        if status == "error":
+            self.failed += 1
+            raise CpuWorkerError(payload)
+        self.completed += 1
+        return _import(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "busy": self.busy,
+            "queue_depth": self.queued,
+            "utilization": self.busy / self.size if self.size else 0.0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self) -> None:
+        for worker in list(self._workers):
+            worker.stop()
+        self._workers.clear()
+        self._idle = None
+        self._loop = None
+        self._io.shutdown(wait=False)
+
+
+_pool: Optional[CpuPool] = None
+
+
+def get_pool() -> CpuPool:
+    """Returns the process-wide pool, configured from the environment."""
+    global _pool
+    if _pool is None:
+        _pool = CpuPool(
+            size=int(os.environ.get("MCP_CPU_WORKERS", os.cpu_count() or 1)),
+            default_timeout=float(os.environ.get("MCP_CPU_TIMEOUT", "60")),
+        )
+        atexit.register(_pool.shutdown)
+    return _pool
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+    """Runs a picklable module-level function in the CPU pool."""
+    return await get_pool().run(func, args, kwargs, timeout)
+
+
+def cpu_bound(func: Optional[Callable[..., Any]] = None, *, timeout: Optional[float] = None):
+    """Marks a tool function as CPU-bound, so it runs in the process pool instead of on the event loop."""
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        # A script is __main__ in the parent and __mp_main__ in spawned workers
+        module = "__main__" if func.__module__ == "__mp_main__" else func.__module__
+        key = f"{module}:{func.__qualname__}"
+        _REGISTRY[key] = func
+        if module != "__main__":
+            _MODULES.add(module)
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return await get_pool().run(key, args, kwargs, timeout)
+
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
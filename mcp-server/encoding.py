@@ -0,0 +1,98 @@
+"""
+Compact binary encoding for large numeric tool arguments and results.
+
+Instead of a JSON array, a client can send a dict with the raw little-endian
+buffer in base64, which is decoded straight into a NumPy array without creating
+a Python object per element:
+
+    {"encoding": "base64", "dtype": "float64", "shape": [3], "compression": null, "data": "AAAAAAAA8D8..."}
+
+`compression` may be "zlib" to shrink the buffer further. Decompressed buffers
+are capped at MCP_MAX_ARRAY_BYTES (default 64 MiB), so a small compressed
+payload cannot expand into an arbitrarily large one. Plain JSON lists are
+still accepted everywhere an encoded array is.
+"""
+
+import base64
+import os
+import zlib
+from typing import Literal, Optional, TypedDict, Union
+
+import numpy as np
+
+DTYPES = {"float64": np.dtype("<f8"), "int64": np.dtype("<i8")}
+
+MAX_ARRAY_BYTES = int(os.environ.get("MCP_MAX_ARRAY_BYTES", 64 << 20))
+
+
+class PayloadTooLargeError(ValueError):
+    """Raised when an encoded array decompresses to more than MAX_ARRAY_BYTES."""
+
+
+class EncodedArray(TypedDict):
+    encoding: Literal["base64"]
+    dtype: Literal["float64", "int64"]
+    shape: list[int]
+    compression: Optional[Literal["zlib"]]
+    data: str
+
+
+# Accepted wherever a tool takes a series of numbers
+NumberArray = Union[list[float], EncodedArray]
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, dict) and value.get("encoding") == "base64"
+
+
+def decode_array(value) -> np.ndarray:
+    """Decodes an EncodedArray, or converts a plain list, into a NumPy array."""
+    if not is_encoded(value):
+        return np.asarray(value, dtype=np.float64)
+    if value["dtype"] not in DTYPES:
+        raise ValueError(f"Unsupported dtype {value['dtype']!r}, expected one of {sorted(DTYPES)}.")
+    buffer = base64.b64decode(value["data"], validate=True)
+    if value.get("compression") == "zlib":
+        buffer = _inflate(buffer, MAX_ARRAY_BYTES)
+    elif value.get("compression") is not None:
+        raise ValueError(f"Unsupported compression {value['compression']!r}.")
+    array = np.frombuffer(buffer, dtype=DTYPES[value["dtype"]])
+    shape = tuple(value.get("shape") or (array.size,))
+    if int(np.prod(shape)) != array.size:
+        raise ValueError(f"Shape {list(shape)} does not match {array.size} elements.")
+    return array.reshape(shape)
+
+
+def _inflate(buffer: bytes, limit: int) -> bytes:
+    """Decompresses zlib data, stopping as soon as the output would exceed `limit` bytes."""
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(buffer, limit + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid zlib data: {e}")
+    if len(data) > limit:
+        raise PayloadTooLargeError(f"The array decompresses to more than {limit} bytes.")
+    if not decompressor.eof:
+        raise ValueError("Invalid zlib data: the stream is truncated.")
+    return data
+
+
+def encode_array(array, compress: bool = False) -> EncodedArray:
+    """Encodes a NumPy array (or list) as a little-endian base64 buffer."""
+    array = np.asarray(array)
+    dtype = "int64" if np.issubdtype(array.dtype, np.integer) else "float64"
+    buffer = np.ascontiguousarray(array, dtype=DTYPES[dtype]).tobytes()
+    if compress:
+        buffer = zlib.compress(buffer, 1)
+    return {
+        "encoding": "base64",
+        "dtype": dtype,
+        "shape": list(array.shape),
+        "compression": "zlib" if compress else None,
+        "data": base64.b64encode(buffer).decode("ascii"),
+    }
+
+
+def array_result(array: np.ndarray, encode: bool) -> Union[list[float], EncodedArray]:
+    """Returns a tool result as an encoded buffer when asked, and as a JSON list otherwise."""
+    return encode_array(array) if encode else array.tolist()
@@ -0,0 +1,238 @@
+"""
+Per-handler telemetry for the MCP server.
+
+MetricsMiddleware wraps every tool call, resource read and prompt request and
+records, per handler: call and error counts, a latency histogram and the
+request and response payload sizes. Resource reads count towards their
+template, so greetings://Ada and greetings://Bob are both greetings://{name}.
+Calls slower than MCP_SLOW_CALL_SECONDS (default 1.0) are logged with the
+shape of their arguments, never the values.
+
+The data is served as the `resource://metrics` resource (`snapshot()`) and in
+the Prometheus text format on GET /metrics (`prometheus_text()`, followed by
+the gauges and counters of other components through `prometheus_samples()`).
+Each worker process keeps its own metrics and labels them with its pid.
+"""
+
+import bisect
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import pydantic_core
+from fastmcp import FastMCP
+from fastmcp.resources import ResourceTemplate
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+SLOW_CALL_SECONDS = float(os.environ.get("MCP_SLOW_CALL_SECONDS", "1.0"))
+
+# The Prometheus metric families of the handlers: name, type and help
+PROMETHEUS_FAMILIES = (
+    ("mcp_handler_calls_total", "counter", "Handler calls."),
+    ("mcp_handler_errors_total", "counter", "Handler calls that raised an error."),
+    ("mcp_handler_duration_seconds", "histogram", "Handler latency."),
+    ("mcp_handler_request_bytes_total", "counter", "Request payload bytes."),
+    ("mcp_handler_response_bytes_total", "counter", "Response payload bytes."),
+)
+
+
+def payload_size(value: Any) -> int:
+    """Size in bytes of a request or response as JSON."""
+    if value is None:
+        return 0
+    if hasattr(value, "to_mcp_result"):
+        value = value.to_mcp_result()
+    return len(pydantic_core.to_json(value, fallback=str))
+
+
+def argument_shape(value: Any) -> Any:
+    """Describes an argument by type and size, e.g. "list[10000]", without its values."""
+    if isinstance(value, dict):
+        if value.get("encoding") == "base64":
+            return f"{value.get('dtype')}{value.get('shape')} {value.get('encoding')}"
+        return {key: argument_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return f"list[{len(value)}]"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+@dataclass
+class ResourceCatalog:
+    """The server's static resource URIs and resource templates, to name reads by."""
+    uris: Set[str]
+    templates: List[ResourceTemplate]
+
+    @classmethod
+    async def load(cls, server: FastMCP) -> "ResourceCatalog":
+        return cls(set(await server.get_resources()), list((await server.get_resource_templates()).values()))
+
+    def resource_name(self, uri: str) -> str:
+        """
+        The resource or resource template a read is for, e.g. "greetings://{name}"
+        for greetings://Ada, so that there is one metric per handler however many
+        URIs are read. URIs that match nothing are counted together.
+        """
+        if uri in self.uris:
+            return uri
+        for template in self.templates:
+            if template.matches(uri):
+                return template.uri_template
+        return "(unknown)"
+
+
+@dataclass
+class HandlerMetrics:
+    calls: int = 0
+    errors: int = 0
+    duration_sum: float = 0.0
+    duration_max: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+    request_bytes: int = 0
+    response_bytes: int = 0
+
+    def observe(self, duration: float, failed: bool, request_bytes: int, response_bytes: int) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.duration_sum += duration
+        self.duration_max = max(self.duration_max, duration)
+        self.buckets[bisect.bisect_left(BUCKETS, duration)] += 1
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.duration_max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": round(self.duration_sum / self.calls * 1000, 3) if self.calls else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "max_ms": round(self.duration_max * 1000, 3),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+        }
+
+
+class MetricsMiddleware(Middleware):
+    """Records latency, errors and payload sizes of every tool, resource and prompt handler."""
+
+    def __init__(self, slow_call_seconds: float = SLOW_CALL_SECONDS, slow_call_history: int = 100):
+        self.slow_call_seconds = slow_call_seconds
+        self.handlers: Dict[Tuple[str, str], HandlerMetrics] = {}
+        self.slow_calls: Deque[Dict[str, Any]] = deque(maxlen=slow_call_history)
+        self.started = time.time()
+        # Loaded on the first resource read, and again after the resource list changed
+        self._catalog: Optional[ResourceCatalog] = None
+
+    def resources_changed(self) -> None:
+        """Makes the next resource read load the resource list again."""
+        self._catalog = None
+
+    async def _resource_name(self, context: MiddlewareContext) -> str:
+        uri = str(context.message.uri)
+        if context.fastmcp_context is None:
+            return uri
+        if self._catalog is None:
+            self._catalog = await ResourceCatalog.load(context.fastmcp_context.fastmcp)
+        return self._catalog.resource_name(uri)
+
+    async def _measure(self, kind: str, name: str, arguments: Dict[str, Any], context: MiddlewareContext, call_next: CallNext) -> Any:
+        start = time.perf_counter()
+        result = None
+        failed = True
+        try:
+            result = await call_next(context)
+            failed = False
+            return result
+        finally:
+            duration = time.perf_counter() - start
+            metrics = self.handlers.setdefault((kind, name), HandlerMetrics())
+            metrics.observe(duration, failed, payload_size(arguments), payload_size(result))
+            if duration >= self.slow_call_seconds:
+                shape = {key: argument_shape(value) for key, value in arguments.items()}
+                self.slow_calls.append({"kind": kind, "name": name, "seconds": round(duration, 3), "failed": failed, "arguments": shape, "at": time.time()})
+                logger.warning("Slow %s %s: %.3fs, arguments %s", kind, name, duration, shape, extra={"slow_call": self.slow_calls[-1]})
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        return await self._measure("tool", context.message.name, context.message.arguments or {}, context, call_next)
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        return await self._measure("resource", await self._resource_name(context), {}, context, call_next)
+
+    async def on_list_resources(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        # Clients list the resources again when they are told the list changed
+        self.resources_changed()
+        return await call_next(context)
+
+    async def on_list_resource_templates(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        self.resources_changed()
+        return await call_next(context)
+
+    async def on_get_prompt(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        return await self._measure("prompt", context.message.name, context.message.arguments or {}, context, call_next)
+
+    def snapshot(self) -> Dict[str, Any]:
+        handlers: Dict[str, Dict[str, Any]] = {}
+        for (kind, name), metrics in sorted(self.handlers.items()):
+            handlers.setdefault(kind, {})[name] = metrics.summary()
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "handlers": handlers,
+            "slow_calls": list(self.slow_calls),
+        }
+
+    def prometheus_text(self) -> str:
+        pid = os.getpid()
+        samples: Dict[str, List[str]] = {name: [] for name, _, _ in PROMETHEUS_FAMILIES}
+        for (kind, name), metrics in sorted(self.handlers.items()):
+            escaped = name.replace("\\", "\\\\").replace('"', '\\"')
+            labels = f'kind="{kind}",name="{escaped}",pid="{pid}"'
+            samples["mcp_handler_calls_total"].append(f"mcp_handler_calls_total{{{labels}}} {metrics.calls}")
+            samples["mcp_handler_errors_total"].append(f"mcp_handler_errors_total{{{labels}}} {metrics.errors}")
+            histogram = samples["mcp_handler_duration_seconds"]
+            cumulative = 0
+            for bound, count in zip(BUCKETS, metrics.buckets):
+                cumulative += count
+                histogram.append(f'mcp_handler_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            histogram.append(f'mcp_handler_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics.calls}')
+            histogram.append(f"mcp_handler_duration_seconds_sum{{{labels}}} {metrics.duration_sum}")
+            histogram.append(f"mcp_handler_duration_seconds_count{{{labels}}} {metrics.calls}")
+            samples["mcp_handler_request_bytes_total"].append(f"mcp_handler_request_bytes_total{{{labels}}} {metrics.request_bytes}")
+            samples["mcp_handler_response_bytes_total"].append(f"mcp_handler_response_bytes_total{{{labels}}} {metrics.response_bytes}")
+        # Each family's HELP and TYPE, followed by all of its samples
+        lines = []
+        for name, kind, help_text in PROMETHEUS_FAMILIES:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", *samples[name]]
+        return "\n".join(lines) + "\n"
+
+
+def prometheus_samples(samples: Dict[str, Tuple[str, str, float]]) -> str:
+    """Formats {name: (type, help, value)} as unlabeled (but for the pid) Prometheus samples."""
+    pid = os.getpid()
+    lines = []
+    for name, (kind, help_text, value) in samples.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f'{name}{{pid="{pid}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,32 @@
+"""
+Progress notifications with partial results for long-running tools.
+
+The MCP progress notification carries a free-form message. Tools here send a
+JSON object as that message, with a human-readable "status", the JSON-RPC id
+of the request and, when there is one, the "partial" result computed so far:
+
+    {"status": "3/10 chunks", "request_id": 7, "partial": {"count": 300000, "mean": 0.01}}
+
+With the request id a client can cancel the call (notifications/cancelled)
+without digging it out of its MCP SDK. That only reaches the call over a
+stateful session (the default of asgi.py): with MCP_STATELESS=1 the
+notification arrives on a new session, possibly in another worker, that does
+not know the request.
+
+Clients that did not ask for progress (no progress token) get no notifications.
+"""
+
+import json
+from typing import Any, Optional
+
+from fastmcp import Context
+
+
+async def report_progress(ctx: Optional[Context], progress: float, total: Optional[float], status: str, partial: Any = None) -> None:
+    """Sends a progress notification with a status line and an optional partial result."""
+    if ctx is None:
+        return
+    message = {"status": status, "request_id": ctx.request_context.request_id}
+    if partial is not None:
+        message["partial"] = partial
+    await ctx.report_progress(progress, total, json.dumps(message))
@@ -0,0 +1,247 @@
+"""
+Caching and change notification for MCP resources.
+
+Resources registered through `ResourceCache.resource` are served from memory:
+
+    resources = ResourceCache(mcp)
+
+    @resources.resource("greetings://{name}", ttl=3600, max_entries=1024)
+    def personalized_greeting(name: str) -> str:
+        ...
+
+Every resource or template has its own TTL and an LRU of at most `max_entries`
+URIs. Concurrent misses for one URI share a single computation. Each cached
+value carries a version stamp (a hash of its content, like an ETag), which
+changes only when the content does.
+
+The versions are listed by `stats` (the resource://cache resource), so
+clients can tell whether what they have changed.
+
+Clients can subscribe to a URI (resources/subscribe). They are sent a
+notifications/resources/updated when `invalidate` is called for it, or when a
+refresh after expiry produces a different version. The cache is a FastMCP
+middleware: it sends the latter once the read that found the change is done.
+Subscriptions live in the client's session and go away with it, so they need
+a stateful transport (stdio, or HTTP without stateless mode). Sessions of
+stateless HTTP last one request: there resources/subscribe is refused, and
+clients compare versions instead. The MCP SDK (1.13) has no option to
+advertise subscriptions, so the resources capability says subscribe=false
+even though resources/subscribe works.
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Set
+
+import mcp.types
+import pydantic_core
+from fastmcp import FastMCP
+from fastmcp.server.dependencies import get_http_request
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+from mcp.server.session import ServerSession
+from mcp.shared.exceptions import McpError
+from pydantic import AnyUrl
+
+logger = logging.getLogger(__name__)
+
+# Result of a computation whose read was cancelled, for the reads that waited for it
+_ABANDONED = object()
+
+
+def version_stamp(value: Any) -> str:
+    """Returns a short hash of a resource value that changes whenever the content does."""
+    return hashlib.sha256(pydantic_core.to_json(value, fallback=str)).hexdigest()[:16]
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    version: str
+    expires_at: float
+
+
+@dataclass
+class TemplateCache:
+    """The cached URIs of one resource or resource template, in LRU order."""
+    template: str
+    ttl: float
+    max_entries: int
+    entries: "OrderedDict[str, CacheEntry]" = field(default_factory=OrderedDict)
+    hits: int = 0
+    misses: int = 0
+    # Misses that waited for the computation of a concurrent miss
+    coalesced: int = 0
+
+    def stats(self) -> Dict[str, Any]:
+        reads = self.hits + self.misses + self.coalesced
+        return {
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / reads if reads else 0.0,
+            "versions": {uri: entry.version for uri, entry in self.entries.items()},
+        }
+
+
+class ResourceCache(Middleware):
+    def __init__(self, server: FastMCP):
+        self.server = server
+        self.templates: Dict[str, TemplateCache] = {}
+        # Held weakly: a session that ended without unsubscribing drops out by itself
+        self.subscribers: Dict[str, "weakref.WeakSet[ServerSession]"] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # URIs whose refresh produced a new version, to announce once their read is done
+        self._changed: Set[str] = set()
+        self._register_subscriptions()
+        server.add_middleware(self)
+
+    def _register_subscriptions(self) -> None:
+        lowlevel = self.server._mcp_server
+
+        @lowlevel.subscribe_resource()
+        async def subscribe(uri: AnyUrl) -> None:
+            if is_stateless_request():
+                # The session ends with this request; nothing could ever be sent to it
+                raise McpError(mcp.types.ErrorData(
+                    code=mcp.types.INVALID_REQUEST,
+                    message="Resource subscriptions need a stateful session; compare the versions in resource://cache instead",
+                ))
+            self.subscribers.setdefault(str(uri), weakref.WeakSet()).add(lowlevel.request_context.session)
+
+        @lowlevel.unsubscribe_resource()
+        async def unsubscribe(uri: AnyUrl) -> None:
+            sessions = self.subscribers.get(str(uri))
+            if sessions is not None:
+                sessions.discard(lowlevel.request_context.session)
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        result = await call_next(context)
+        uri = str(context.message.uri)
+        if uri in self._changed:
+            self._changed.discard(uri)
+            await self.notify(uri)
+        return result
+
+    def resource(self, uri: str, ttl: float = 60.0, max_entries: int = 1, **resource_kwargs: Any) -> Callable:
+        """Registers a cached resource or resource template, like `mcp.resource`."""
+        cache = self.templates[uri] = TemplateCache(uri, ttl, max_entries)
+
+        def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(func)
+            async def wrapper(**kwargs: Any) -> Any:
+                return await self._read(cache, uri.format(**kwargs), func, kwargs)
+
+            return self.server.resource(uri, **resource_kwargs)(wrapper)
+
+        return decorate
+
+    async def _read(self, cache: TemplateCache, uri: str, func: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+        while True:
+            entry = cache.entries.get(uri)
+            if entry is not None and entry.expires_at > time.monotonic():
+                cache.hits += 1
+                cache.entries.move_to_end(uri)
+                return entry.value
+            if uri not in self._inflight:
+                break
+            # A computation for this URI is already running; share its result
+            value = await asyncio.shield(self._inflight[uri])
+            if value is not _ABANDONED:
+                cache.coalesced += 1
+                return value
+            # The read running it was cancelled: look again, and compute it here if nobody else does
+
+        cache.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[uri] = future
+        try:
+            value = func(**kwargs)
+            if inspect.isawaitable(value):
+                value = await value
+        except asyncio.CancelledError:
+            # Only this read was cancelled, not the ones waiting for it
+            future.set_result(_ABANDONED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here, so a failure nobody else waited for is not reported as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            del self._inflight[uri]
+
+        version = version_stamp(value)
+        cache.entries[uri] = CacheEntry(value, version, time.monotonic() + cache.ttl)
+        cache.entries.move_to_end(uri)
+        while len(cache.entries) > cache.max_entries:
+            cache.entries.popitem(last=False)
+        if entry is not None and entry.version != version:
+            self._changed.add(uri)
+        return value
+
+    def version(self, uri: str) -> Optional[str]:
+        """The version stamp of a cached URI, or None when it is not cached."""
+        for cache in self.templates.values():
+            if uri in cache.entries:
+                return cache.entries[uri].version
+        return None
+
+    async def invalidate(self, uri: Optional[str] = None, template: Optional[str] = None) -> None:
+        """
+        Drops one URI, every URI of a template, or (without arguments) everything,
+        and tells the subscribers of the dropped URIs that they changed.
+        """
+        dropped = []
+        for cache in self.templates.values():
+            if template is not None and cache.template != template:
+                continue
+            for cached_uri in list(cache.entries):
+                if uri is None or cached_uri == uri:
+                    del cache.entries[cached_uri]
+                    dropped.append(cached_uri)
+        # Subscribers of a URI that was not cached (yet) are told as well
+        if uri is not None and uri not in dropped:
+            dropped.append(uri)
+        for dropped_uri in dropped:
+            await self.notify(dropped_uri)
+
+    async def notify(self, uri: str) -> None:
+        """Sends notifications/resources/updated to the sessions subscribed to a URI."""
+        for session in list(self.subscribers.get(uri, ())):
+            try:
+                await session.send_resource_updated(AnyUrl(uri))
+            except Exception as e:
+                # The session is gone
+                logger.info(f"Dropping subscriber of {uri}: {e}")
+                self.subscribers[uri].discard(session)
+
+    def stats(self) -> Dict[str, Any]:
+        # Without the URIs whose sessions have all ended
+        for uri in [uri for uri, sessions in self.subscribers.items() if not sessions]:
+            del self.subscribers[uri]
+        return {
+            "templates": {template: cache.stats() for template, cache in self.templates.items()},
+            "subscriptions": {uri: len(sessions) for uri, sessions in self.subscribers.items()},
+        }
+
+
+def is_stateless_request() -> bool:
+    """Whether the request being handled came over stateless HTTP, i.e. without an MCP session id."""
+    try:
+        request = get_http_request()
+    except RuntimeError:
+        # stdio, or an in-memory client: the session lasts as long as the connection
+        return False
+    return "mcp-session-id" not in request.headers
@@ -1,19 +1,122 @@
-from fastmcp import FastMCP
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from fastmcp import Context, FastMCP
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+import analytics
+from batch import BATCH_TOOL, BatchItem, BatchResult, run_batch
+from cpu_pool import cpu_bound, get_pool, run_cpu_bound
+from encoding import NumberArray, EncodedArray, array_result
+from metrics import MetricsMiddleware, prometheus_samples
+from progress import report_progress
+from resource_cache import ResourceCache
+
+# Started as a script from a checkout (python server.py, or over stdio by a client),
+# only this folder is on sys.path; `shared` is in the repo root. In the image it sits next to this file.
+_repo_root = Path(__file__).resolve().parent.parent
+if (_repo_root / "shared").is_dir() and str(_repo_root) not in sys.path:
+    sys.path.append(str(_repo_root))
+
+from shared.structured_logging import setup_logging
+
+# JSON lines from a background thread, on stdout for http and stderr for stdio
+# (where stdout carries the protocol)
+setup_logging("mcp-server", stream=sys.stderr if os.environ.get("MCP_TRANSPORT") == "stdio" else None)
+logger = logging.getLogger(__name__)
 
 mcp = FastMCP("Sbotify MCP Server!")
-print("Sbotify MCP Server created.")
+metrics = MetricsMiddleware()
+mcp.add_middleware(metrics)
+resources = ResourceCache(mcp)
+logger.info("Sbotify MCP Server created.")
 
 @mcp.tool
 def add(a: int, b: int) -> int:
     """Adds two integer numbers together."""
     return a + b
 
-@mcp.resource("resource://config")
+@mcp.tool
+@cpu_bound
+def describe(data: NumberArray) -> dict:
+    """Returns summary statistics (count, sum, mean, std, min, quartiles, max) of a series of numbers."""
+    return analytics.describe(data)
+
+@mcp.tool
+async def running_statistics(data: NumberArray, ctx: Context, chunk_size: int = 100_000) -> dict:
+    """Returns count, sum, mean, std, min and max of a (long) series, reporting progress and the statistics so far after every chunk."""
+    for done, total, stats in analytics.running_describe(data, chunk_size):
+        await report_progress(ctx, done, total, f"{done}/{total} chunks", stats)
+        # Lets other sessions, and a cancellation of this call, in between chunks
+        await asyncio.sleep(0)
+    return stats
+
+@mcp.tool
+@cpu_bound
+def percentiles(data: NumberArray, q: list[float] | None = None) -> dict[str, float]:
+    """Returns the requested percentiles (0-100) of a series of numbers, by default p5, p25, p50, p75 and p95."""
+    return analytics.percentiles(data, q or analytics.DEFAULT_PERCENTILES)
+
+@mcp.tool
+@cpu_bound
+def histogram(data: NumberArray, bins: int = 10) -> dict[str, list]:
+    """Counts the numbers per equal-width bin. Returns the counts and the bin edges."""
+    return analytics.histogram(data, bins)
+
+@mcp.tool
+async def moving_average(data: NumberArray, window: int, encode_result: bool = False) -> list[float] | EncodedArray:
+    """Returns the simple moving average of a series over the given window size."""
+    # Large results come back from the worker through shared memory and are serialized here
+    return array_result(await run_cpu_bound(analytics.moving_average, data, window), encode_result)
+
+@mcp.tool
+async def elementwise(operation: analytics.Operation, a: NumberArray, b: NumberArray | float, encode_result: bool = False) -> list[float] | EncodedArray:
+    """Applies add, subtract, multiply, divide, power, minimum or maximum to each element of a with b (a number or a list of the same length). Fails if a result is not a finite number, e.g. on division by zero."""
+    return array_result(await run_cpu_bound(analytics.elementwise, operation, a, b), encode_result)
+
+@mcp.tool(name=BATCH_TOOL)
+async def batch(items: list[BatchItem], ctx: Context, max_concurrency: int = 8) -> list[BatchResult]:
+    """Runs several tool calls ({"tool": name, "arguments": {...}}) and resource reads ({"resource": uri}) in one request. Results are returned in order, each with a "result" or an "error"."""
+    return await run_batch(mcp, items, max_concurrency, ctx)
+
+@resources.resource("resource://config", ttl=300)
 def get_config() -> dict:
     """Provides the application's configuration."""
     return {"version": "1.0", "author": "MyTeam"}
 
-@mcp.resource("greetings://{name}")
+@mcp.resource("resource://cpu-pool")
+def get_cpu_pool_stats() -> dict:
+    """Provides the queue depth, utilization and counters of the CPU-bound tool pool."""
+    return get_pool().stats()
+
+@mcp.resource("resource://cache")
+def get_cache_stats() -> dict:
+    """Provides hit rates, entries and version stamps per cached resource template, and the active subscriptions."""
+    return resources.stats()
+
+@mcp.resource("resource://metrics")
+def get_metrics() -> dict:
+    """Provides call counts, errors, latencies, payload sizes and recent slow calls per tool, resource and prompt."""
+    return metrics.snapshot()
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Serves the handler metrics, the CPU pool's load and the resource cache's hits in the Prometheus text format."""
+    pool = get_pool().stats()
+    caches = resources.stats()["templates"].values()
+    text = metrics.prometheus_text() + prometheus_samples({
+        "mcp_cpu_pool_size": ("gauge", "Worker processes of the CPU pool.", pool["size"]),
+        "mcp_cpu_pool_busy": ("gauge", "Busy worker processes.", pool["busy"]),
+        "mcp_cpu_pool_queue_depth": ("gauge", "Calls waiting for a worker.", pool["queue_depth"]),
+        "mcp_resource_cache_hits_total": ("counter", "Resource reads served from the cache.", sum(cache["hits"] for cache in caches)),
+        "mcp_resource_cache_misses_total": ("counter", "Resource reads that ran their handler.", sum(cache["misses"] for cache in caches)),
+        "mcp_resource_cache_coalesced_total": ("counter", "Resource reads that waited for a concurrent miss.", sum(cache["coalesced"] for cache in caches)),
+    })
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@resources.resource("greetings://{name}", ttl=3600, max_entries=1024)
 def personalized_greeting(name: str) -> str:
     """Generates a personalized greeting for the given name."""
     return f"Hello, {name}! Welcome to the MCP server."
@@ -21,9 +124,13 @@ def personalized_greeting(name: str) -> str:
 @mcp.prompt
 def analyze_data(data_points: list[float]) -> str:
     """Creates a prompt asking for analysis of numerical data."""
-    formatted_data = ", ".join(str(point) for point in data_points)
-    return f"Please analyze these data points: {formatted_data}"
+    # The statistics are computed here, so the prompt stays small however many points there are
+    summary = analytics.summary_text(data_points)
+    return f"Please analyze a series of {len(data_points)} data points, summarized as:\n{summary}"
 
 if __name__ == "__main__":
-    mcp.run(transport="http", host="0.0.0.0", port=8080)
+    if os.environ.get("MCP_TRANSPORT") == "stdio":
+        mcp.run(transport="stdio")
+    else:
+        mcp.run(transport="http", host="0.0.0.0", port=8080)
 
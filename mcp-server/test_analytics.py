@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from fastmcp import Client
+
+import analytics
+from server import mcp
+
+
+def test_describe_matches_numpy():
+    data = np.random.default_rng(0).normal(10, 2, 100_000)
+    stats = analytics.describe(data)
+    assert stats["count"] == 100_000
+    assert stats["mean"] == pytest.approx(data.mean())
+    assert stats["std"] == pytest.approx(data.std(ddof=1))
+    assert stats["median"] == pytest.approx(np.median(data))
+
+
+def test_moving_average():
+    assert analytics.moving_average([1, 2, 3, 4, 5], 2).tolist() == [1.5, 2.5, 3.5, 4.5]
+    with pytest.raises(ValueError):
+        analytics.moving_average([1, 2], 3)
+
+
+def test_elementwise_with_scalar_and_array():
+    assert analytics.elementwise("multiply", [1, 2, 3], 2).tolist() == [2, 4, 6]
+    assert analytics.elementwise("subtract", [5, 5], [1, 2]).tolist() == [4, 3]
+    with pytest.raises(ValueError):
+        analytics.elementwise("add", [1, 2], [1, 2, 3])
+
+
+def test_histogram_counts_every_point():
+    result = analytics.histogram(np.arange(1_000_000), bins=4)
+    assert sum(result["counts"]) == 1_000_000
+    assert len(result["edges"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_tools_and_prompt_through_mcp():
+    async with Client(mcp) as client:
+        result = await client.call_tool("percentiles", {"data": [1, 2, 3, 4, 5], "q": [50]})
+        assert result.data == {"p50": 3.0}
+
+        prompt = await client.get_prompt("analyze_data", {"data_points": list(range(10_000))})
+        text = prompt.messages[0].content.text
+        # A compact summary instead of ten thousand raw numbers
+        assert "count=10000" in text
+        assert len(text) < 1000
+
+        empty = await client.get_prompt("analyze_data", {"data_points": []})
+        assert "series of 0 data points" in empty.messages[0].content.text
+        assert "count=0 (no data points)" in empty.messages[0].content.text
+
+
+def test_elementwise_rejects_non_finite_results():
+    with pytest.raises(ValueError, match="divide gives inf at index 1"):
+        analytics.elementwise("divide", [1, 2, 3], [1, 0, 0])
+    with pytest.raises(ValueError, match="nan at index 0"):
+        analytics.elementwise("divide", [0], 0)
+    with pytest.raises(ValueError, match="power gives inf"):
+        analytics.elementwise("power", [10.0], 400)
+
+
+@pytest.mark.asyncio
+async def test_division_by_zero_through_mcp_is_a_tool_error():
+    async with Client(mcp) as client:
+        result = await client.call_tool("elementwise", {"operation": "divide", "a": [1, 2], "b": 0}, raise_on_error=False)
+    assert result.is_error
+    assert "only finite numbers can be returned" in result.content[0].text
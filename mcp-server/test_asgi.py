@@ -0,0 +1,46 @@
+import json
+
+import httpx
+import pytest
+
+from asgi import create_app
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+
+def parse_sse(body: str) -> dict:
+    data = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+    return json.loads(data[-1])
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_stateful_by_default(monkeypatch):
+    monkeypatch.delenv("MCP_STATELESS", raising=False)
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp") as client:
+            response = await client.post("/mcp", headers=HEADERS, json={
+                "jsonrpc": "2.0", "id": 0, "method": "initialize",
+                "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "test", "version": "1"}},
+            })
+    assert response.status_code == 200
+    assert response.headers["mcp-session-id"]
+
+
+@pytest.mark.asyncio
+async def test_stateless_app_answers_requests_without_a_session(monkeypatch):
+    monkeypatch.setenv("MCP_STATELESS", "1")
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp") as client:
+            # No initialize and no Mcp-Session-Id: any worker can take any request
+            for i in range(2):
+                response = await client.post("/mcp", headers=HEADERS, json={
+                    "jsonrpc": "2.0", "id": i, "method": "tools/call",
+                    "params": {"name": "add", "arguments": {"a": i, "b": 2}},
+                })
+                assert response.status_code == 200
+                assert "mcp-session-id" not in response.headers
+                assert parse_sse(response.text)["result"]["structuredContent"] == {"result": i + 2}
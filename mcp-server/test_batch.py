@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from fastmcp import Client
+
+from server import mcp
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_results_in_order_with_per_item_errors():
+    items = [{"tool": "add", "arguments": {"a": i, "b": 1}} for i in range(20)]
+    items += [
+        {"resource": "greetings://Ada"},
+        {"tool": "unknown", "arguments": {}},
+        {"tool": "add", "arguments": {"a": "x"}},
+        {"tool": "batch", "arguments": {"items": []}},
+        {},
+    ]
+    async with Client(mcp) as client:
+        result = await client.call_tool("batch", {"items": items, "max_concurrency": 4})
+
+    results = result.structured_content["result"]
+    assert [item["index"] for item in results] == list(range(len(items)))
+    assert [item["result"] for item in results[:20]] == [{"result": i + 1} for i in range(20)]
+    assert results[20]["result"] == "Hello, Ada! Welcome to the MCP server."
+    assert all("error" in item for item in results[21:])
+    assert "nested" in results[23]["error"]
+
+
+@pytest.mark.asyncio
+async def test_batch_size_is_limited():
+    async with Client(mcp) as client:
+        result = await client.call_tool("batch", {"items": [{"resource": "resource://config"}] * 101}, raise_on_error=False)
+    assert result.is_error
+
+
+@pytest.mark.asyncio
+async def test_only_the_batch_reports_progress():
+    messages = []
+
+    async def on_progress(progress, total, message):
+        messages.append(json.loads(message)["status"])
+
+    items = [{"tool": "running_statistics", "arguments": {"data": [1.0, 2.0, 3.0], "chunk_size": 1}}, {"tool": "add", "arguments": {"a": 1, "b": 2}}]
+    async with Client(mcp) as client:
+        result = await client.call_tool("batch", {"items": items}, progress_handler=on_progress)
+
+    assert all("error" not in item for item in result.structured_content["result"])
+    assert sorted(messages) == ["1/2 items done", "2/2 items done"]
@@ -0,0 +1,126 @@
+import asyncio
+import itertools
+import os
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+from fastmcp import Client
+
+import cpu_pool
+from cpu_pool import CpuPool, CpuTimeoutError, CpuWorkerError, cpu_bound
+
+
+@cpu_bound
+def square(x: int) -> int:
+    return x * x
+
+
+@cpu_bound
+def fail() -> None:
+    raise ValueError("bad input")
+
+
+def big_array(n: int) -> np.ndarray:
+    return np.arange(n, dtype=np.float64)
+
+
+def sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def hold_segment(name: str, seconds: float) -> None:
+    """Creates a segment the way a result export does, then overruns the timeout."""
+    SharedMemory(name=name, create=True, size=1024, track=False).close()
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def pool():
+    pool = CpuPool(size=2, default_timeout=10)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_runs_registered_and_module_functions(pool):
+    assert await pool.run("test_cpu_pool:square", (7,)) == 49
+    assert await pool.run(sleep, (0,)) == 0
+    assert pool.stats()["completed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_large_arrays_come_back_through_shared_memory(pool):
+    n = cpu_pool.SHARED_MEMORY_THRESHOLD // 8 + 1
+    result = await pool.run(big_array, (n,))
+    assert isinstance(result, np.ndarray)
+    assert result.base is not None  # a view on the shared memory segment
+    assert result[-1] == n - 1
+
+
+@pytest.mark.asyncio
+async def test_worker_errors_are_raised(pool):
+    with pytest.raises(CpuWorkerError, match="bad input"):
+        await pool.run("test_cpu_pool:fail")
+    assert pool.stats()["failed"] == 1
+    assert await pool.run("test_cpu_pool:square", (3,)) == 9
+
+
+@pytest.mark.asyncio
+async def test_timeout_replaces_the_worker(pool):
+    with pytest.raises(CpuTimeoutError):
+        await pool.run(sleep, (30,), timeout=0.5)
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["restarts"] == 1
+    assert await pool.run("test_cpu_pool:square", (2,)) == 4
+
+
+@pytest.mark.asyncio
+async def test_timed_out_calls_leave_no_shared_memory_behind(pool, monkeypatch):
+    monkeypatch.setattr(cpu_pool, "_SEGMENTS", itertools.count(1000))
+    segment = f"mcp-cpu-{os.getpid()}-1000"
+    with pytest.raises(CpuTimeoutError):
+        await pool.run(hold_segment, (segment, 30), timeout=2)
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=segment, track=False)
+
+
+def test_same_names_in_different_modules_do_not_collide(monkeypatch):
+    monkeypatch.setattr(cpu_pool, "_REGISTRY", dict(cpu_pool._REGISTRY))
+    monkeypatch.setattr(cpu_pool, "_MODULES", set(cpu_pool._MODULES))
+
+    def square(x: int) -> int:
+        return -x
+
+    square.__module__, square.__qualname__ = "other_tools", "square"
+    cpu_bound(square)
+    assert cpu_pool._REGISTRY["test_cpu_pool:square"](3) == 9
+    assert cpu_pool._REGISTRY["other_tools:square"](3) == -3
+
+
+@pytest.mark.asyncio
+async def test_cancellation_stops_the_call_and_queue_depth_is_tracked(pool):
+    await pool.run("test_cpu_pool:square", (1,))  # start the workers
+    tasks = [asyncio.create_task(pool.run(sleep, (30,))) for _ in range(3)]
+    await asyncio.sleep(0.2)
+    stats = pool.stats()
+    assert stats["busy"] == 2 and stats["queue_depth"] == 1 and stats["utilization"] == 1.0
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert pool.stats()["cancelled"] == 2
+    assert pool.stats()["busy"] == 0
+
+
+@pytest.mark.asyncio
+async def test_decorated_tools_keep_their_schema_and_report_stats():
+    from server import mcp
+    async with Client(mcp) as client:
+        tools = {tool.name: tool for tool in await client.list_tools()}
+        assert "data" in tools["describe"].inputSchema["properties"]
+        result = await client.call_tool("describe", {"data": [1, 2, 3]})
+        assert result.data["mean"] == 2.0
+        stats = await client.read_resource("resource://cpu-pool")
+        assert '"completed"' in stats[0].text
@@ -0,0 +1,58 @@
+import base64
+import zlib
+
+import numpy as np
+import pytest
+from fastmcp import Client
+
+import encoding
+from encoding import PayloadTooLargeError, decode_array, encode_array
+from server import mcp
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(compress):
+    array = np.random.default_rng(0).normal(size=10_000)
+    decoded = decode_array(encode_array(array, compress=compress))
+    assert decoded.dtype == np.float64
+    np.testing.assert_array_equal(decoded, array)
+
+
+def test_decode_rejects_wrong_shape():
+    encoded = encode_array(np.arange(6))
+    encoded["shape"] = [4]
+    with pytest.raises(ValueError):
+        decode_array(encoded)
+
+
+def test_decompression_stops_at_the_size_limit(monkeypatch):
+    monkeypatch.setattr(encoding, "MAX_ARRAY_BYTES", 8 * 1000)
+    assert decode_array(encode_array(np.zeros(1000), compress=True)).size == 1000
+
+    # 80 MB of zeros compress to about 80 kB
+    bomb = {"encoding": "base64", "dtype": "float64", "shape": [10_000_000], "compression": "zlib",
+            "data": base64.b64encode(zlib.compress(bytes(80_000_000), 9)).decode("ascii")}
+    with pytest.raises(PayloadTooLargeError, match="more than 8000 bytes"):
+        decode_array(bomb)
+
+    truncated = encode_array(np.zeros(1000), compress=True)
+    truncated["data"] = base64.b64encode(base64.b64decode(truncated["data"])[:-8]).decode("ascii")
+    with pytest.raises(ValueError, match="truncated"):
+        decode_array(truncated)
+
+
+@pytest.mark.asyncio
+async def test_tools_accept_encoded_arguments_and_return_encoded_results():
+    data = np.arange(100_000, dtype=np.float64)
+    async with Client(mcp) as client:
+        result = await client.call_tool("describe", {"data": encode_array(data, compress=True)})
+        assert result.data["count"] == 100_000
+
+        result = await client.call_tool(
+            "elementwise", {"operation": "multiply", "a": encode_array(data), "b": 2, "encode_result": True}
+        )
+        np.testing.assert_array_equal(decode_array(result.structured_content["result"]), data * 2)
+
+        # Plain JSON lists are still accepted
+        result = await client.call_tool("elementwise", {"operation": "add", "a": [1, 2], "b": [3, 4]})
+        assert result.structured_content["result"] == [4, 6]
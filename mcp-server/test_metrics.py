@@ -0,0 +1,96 @@
+import json
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+
+from metrics import MetricsMiddleware, argument_shape
+from server import mcp, metrics
+
+
+def test_argument_shape_hides_values():
+    shape = {key: argument_shape(value) for key, value in {
+        "data": [1.5] * 1000,
+        "encoded": {"encoding": "base64", "dtype": "float64", "shape": [10], "data": "AAAA"},
+        "name": "secret",
+        "bins": 10,
+    }.items()}
+    assert shape == {"data": "list[1000]", "encoded": "float64[10] base64", "name": "str[6]", "bins": "int"}
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_are_measured_and_exposed(monkeypatch):
+    monkeypatch.setattr(metrics, "slow_call_seconds", 0.0)
+    monkeypatch.setattr(metrics, "handlers", {})
+    async with Client(mcp) as client:
+        await client.call_tool("add", {"a": 1, "b": 2})
+        with pytest.raises(Exception):
+            await client.call_tool("histogram", {"data": [], "bins": 3})
+        snapshot = json.loads((await client.read_resource("resource://metrics"))[0].text)
+
+    add = snapshot["handlers"]["tool"]["add"]
+    assert add["calls"] == 1 and add["errors"] == 0
+    assert add["request_bytes"] > 0 and add["response_bytes"] > 0
+    assert snapshot["handlers"]["tool"]["histogram"]["errors"] == 1
+    slow = [call for call in snapshot["slow_calls"] if call["name"] == "histogram"]
+    assert slow[-1]["arguments"] == {"data": "list[0]", "bins": "int"}
+
+
+@pytest.mark.asyncio
+async def test_resource_reads_are_measured_per_template(monkeypatch):
+    monkeypatch.setattr(metrics, "handlers", {})
+    async with Client(mcp) as client:
+        for name in ("Ada", "Bob", "Cy"):
+            await client.read_resource(f"greetings://{name}")
+        await client.read_resource("resource://config")
+        with pytest.raises(Exception):
+            await client.read_resource("nothing://here")
+
+    assert sorted(name for kind, name in metrics.handlers if kind == "resource") == ["(unknown)", "greetings://{name}", "resource://config"]
+    assert metrics.handlers[("resource", "greetings://{name}")].calls == 3
+
+
+@pytest.mark.asyncio
+async def test_prometheus_endpoint():
+    async with Client(mcp) as client:
+        await client.call_tool("add", {"a": 1, "b": 2})
+        await client.read_resource("greetings://Ada")
+    app = mcp.http_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mcp") as client:
+        response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE mcp_handler_duration_seconds histogram" in response.text
+    # Every family is announced once, and its samples follow before the next one starts
+    families = [line.split()[2] for line in response.text.splitlines() if line.startswith("# TYPE")]
+    assert len(families) == len(set(families))
+    family = None
+    for line in response.text.splitlines():
+        if line.startswith("# TYPE"):
+            family = line.split()[2]
+        elif not line.startswith("#"):
+            assert line.startswith(family)
+    assert "mcp_cpu_pool_queue_depth{" in response.text
+    assert "mcp_resource_cache_hits_total{" in response.text
+
+
+@pytest.mark.asyncio
+async def test_resource_names_are_looked_up_again_after_the_list_changed():
+    app = FastMCP("test")
+    middleware = MetricsMiddleware()
+    app.add_middleware(middleware)
+
+    @app.resource("greetings://{name}")
+    def greeting(name: str) -> str:
+        return f"Hello, {name}!"
+
+    async with Client(app) as client:
+        await client.read_resource("greetings://Ada")
+        app.resource("greetings://Ada")(lambda: "Hi Ada")
+        # The resource list is cached between reads
+        await client.read_resource("greetings://Ada")
+        await client.list_resources()
+        await client.read_resource("greetings://Ada")
+
+    assert middleware.handlers[("resource", "greetings://{name}")].calls == 2
+    assert middleware.handlers[("resource", "greetings://Ada")].calls == 1
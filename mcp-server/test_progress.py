@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from fastmcp import Client
+from mcp.shared.exceptions import McpError
+
+import analytics
+from server import mcp
+
+
+def test_running_describe_matches_describe():
+    data = np.random.default_rng(1).normal(5, 3, 10_001)
+    steps = list(analytics.running_describe(data, chunk_size=1000))
+    assert [(done, total) for done, total, _ in steps] == [(i, 11) for i in range(1, 12)]
+    final, expected = steps[-1][2], analytics.describe(data)
+    for key in ("count", "sum", "mean", "std", "min", "max"):
+        assert final[key] == pytest.approx(expected[key])
+
+
+@pytest.mark.asyncio
+async def test_progress_notifications_carry_status_and_partial_results():
+    messages = []
+
+    async def on_progress(progress, total, message):
+        messages.append((progress, total, json.loads(message)))
+
+    async with Client(mcp) as client:
+        result = await client.call_tool("running_statistics", {"data": list(range(10)), "chunk_size": 4}, progress_handler=on_progress)
+        await client.call_tool("batch", {"items": [{"tool": "add", "arguments": {"a": 1, "b": 1}}] * 3}, progress_handler=on_progress)
+
+    assert result.data["count"] == 10
+    assert [(p, t) for p, t, _ in messages[:3]] == [(1, 3), (2, 3), (3, 3)]
+    assert messages[0][2] == {"status": "1/3 chunks", "request_id": messages[0][2]["request_id"], "partial": {"count": 4, "sum": 6.0, "mean": 1.5, "std": pytest.approx(1.29, abs=0.01), "min": 0.0, "max": 3.0}}
+    assert [m["status"] for _, _, m in messages[3:]] == ["1/3 items done", "2/3 items done", "3/3 items done"]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_call_stops_the_server_side_work():
+    progress = []
+    started = asyncio.Event()
+
+    async def on_progress(done, total, message):
+        progress.append(json.loads(message)["request_id"])
+        started.set()
+
+    async with Client(mcp) as client:
+        call = asyncio.create_task(client.call_tool("running_statistics", {"data": list(range(20_000)), "chunk_size": 1}, progress_handler=on_progress))
+        await started.wait()
+        # The id from the progress message is the one the request was sent with
+        await client.cancel(progress[0], "test")
+        with pytest.raises(McpError):
+            await call
+    assert len(progress) < 20_000
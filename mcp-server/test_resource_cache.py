@@ -0,0 +1,169 @@
+import asyncio
+import gc
+import json
+
+import httpx
+import mcp.types
+import pytest
+from fastmcp import Client, FastMCP
+
+from resource_cache import ResourceCache, TemplateCache
+from server import mcp as server
+
+
+def make_server():
+    app = FastMCP("test")
+    cache = ResourceCache(app)
+    calls = []
+
+    @cache.resource("greetings://{name}", ttl=60, max_entries=2)
+    async def greeting(name: str) -> str:
+        calls.append(name)
+        await asyncio.sleep(0.01)
+        return f"Hello, {name}!"
+
+    return app, cache, calls
+
+
+@pytest.mark.asyncio
+async def test_templated_reads_are_cached_in_an_lru():
+    app, cache, calls = make_server()
+    async with Client(app) as client:
+        # Concurrent misses share one computation
+        await asyncio.gather(*(client.read_resource("greetings://Ada") for _ in range(3)))
+        await client.read_resource("greetings://Bob")
+        await client.read_resource("greetings://Cy")  # evicts Ada
+        result = await client.read_resource("greetings://Ada")
+
+    assert result[0].text == "Hello, Ada!"
+    assert calls == ["Ada", "Bob", "Cy", "Ada"]
+    stats = cache.stats()["templates"]["greetings://{name}"]
+    assert (stats["hits"], stats["misses"], stats["coalesced"], stats["entries"]) == (0, 4, 2, 2)
+    assert set(stats["versions"]) == {"greetings://Cy", "greetings://Ada"}
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_first_reader_does_not_cancel_the_others():
+    cache = ResourceCache(FastMCP("test"))
+    read = TemplateCache("slow://value", ttl=60, max_entries=1)
+    started = asyncio.Event()
+    calls = []
+
+    async def slow() -> str:
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(cache._read(read, "slow://value", slow, {}))
+    await started.wait()
+    second = asyncio.create_task(cache._read(read, "slow://value", slow, {}))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+    assert first.cancelled()
+    assert len(calls) == 2
+    assert (read.misses, read.coalesced) == (2, 0)
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_recomputed(monkeypatch):
+    app, cache, calls = make_server()
+    cache.templates["greetings://{name}"].ttl = 0
+    async with Client(app) as client:
+        await client.read_resource("greetings://Ada")
+        await client.read_resource("greetings://Ada")
+    assert calls == ["Ada", "Ada"]
+    assert cache.version("greetings://Ada") is not None
+
+
+@pytest.mark.asyncio
+async def test_subscribers_are_notified_on_invalidation():
+    app, cache, _ = make_server()
+    updates = []
+
+    async def message_handler(message):
+        if isinstance(message, mcp.types.ServerNotification) and isinstance(message.root, mcp.types.ResourceUpdatedNotification):
+            updates.append(str(message.root.params.uri))
+
+    async with Client(app, message_handler=message_handler) as client:
+        await client.read_resource("greetings://Ada")
+        await client.session.subscribe_resource("greetings://Ada")
+        await cache.invalidate(template="greetings://{name}")
+        await client.session.unsubscribe_resource("greetings://Ada")
+        await cache.invalidate("greetings://Ada")
+        await client.ping()
+
+    assert updates == ["greetings://Ada"]
+
+
+@pytest.mark.asyncio
+async def test_server_reports_hit_rates():
+    async with Client(server) as client:
+        for _ in range(3):
+            await client.read_resource("resource://config")
+        stats = json.loads((await client.read_resource("resource://cache"))[0].text)
+    config = stats["templates"]["resource://config"]
+    assert config["hits"] >= 2 and config["hit_rate"] > 0
+
+
+@pytest.mark.asyncio
+async def test_subscribers_are_notified_when_a_refresh_changes_the_version():
+    app = FastMCP("test")
+    cache = ResourceCache(app)
+    counter = iter(range(100))
+    updates = []
+
+    @cache.resource("counter://value", ttl=0)
+    def value() -> int:
+        return next(counter)
+
+    async def message_handler(message):
+        if isinstance(message, mcp.types.ServerNotification) and isinstance(message.root, mcp.types.ResourceUpdatedNotification):
+            updates.append(str(message.root.params.uri))
+
+    async with Client(app, message_handler=message_handler) as client:
+        await client.session.subscribe_resource("counter://value")
+        first = (await client.read_resource("counter://value"))[0].text
+        second = (await client.read_resource("counter://value"))[0].text
+        await client.ping()
+
+    assert (first, second) == ("0", "1")
+    assert updates == ["counter://value"]
+
+
+@pytest.mark.asyncio
+async def test_subscriptions_end_with_their_session():
+    app, cache, _ = make_server()
+    async with Client(app) as client:
+        await client.session.subscribe_resource("greetings://Ada")
+        assert cache.stats()["subscriptions"] == {"greetings://Ada": 1}
+
+    gc.collect()
+    assert cache.stats()["subscriptions"] == {}
+
+
+@pytest.mark.asyncio
+async def test_stateless_sessions_cannot_subscribe():
+    app, cache, _ = make_server()
+    http_app = app.http_app(stateless_http=True)
+    headers = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+    def result(response):
+        data = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+        return json.loads(data[-1])
+
+    async with http_app.router.lifespan_context(http_app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=http_app), base_url="http://mcp") as client:
+            initialize = await client.post("/mcp", headers=headers, json={
+                "jsonrpc": "2.0", "id": 0, "method": "initialize",
+                "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "test", "version": "1"}},
+            })
+            subscribe = await client.post("/mcp", headers=headers, json={
+                "jsonrpc": "2.0", "id": 1, "method": "resources/subscribe", "params": {"uri": "greetings://Ada"},
+            })
+
+    assert "result" in result(initialize)
+    assert "stateful session" in result(subscribe)["error"]["message"]
+    assert cache.subscribers == {}
@@ -0,0 +1,4 @@
+# shared/__init__.py
+
+# Code shared by the chat and dashboard services. The Dockerfiles copy this
+# package next to the service code, locally it is found through the repo root.
@@ -0,0 +1,234 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import brotli
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Fingerprinted URLs change whenever the content changes, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else is revalidated with its ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 256
+
+
+@dataclass
+class Asset:
+    """A file held in memory together with its precompressed variants."""
+    path: Path
+    media_type: str
+    body: bytes
+    etag: str
+    mtime: float
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path, body: Optional[bytes] = None) -> "Asset":
+        body = path.read_bytes() if body is None else body
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+            media_type += "; charset=utf-8"
+        asset = cls(
+            path=path,
+            media_type=media_type,
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:16]}"',
+            mtime=path.stat().st_mtime,
+        )
+        if len(body) >= MIN_COMPRESS_SIZE:
+            compressed = {
+                "br": brotli.compress(body, quality=11),
+                "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+            }
+            asset.encoded = {encoding: data for encoding, data in compressed.items() if len(data) < len(body)}
+        return asset
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8")
+
+    def response(self, request: Request, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response:
+        """Builds a response, answering conditional requests and picking a precompressed variant."""
+        headers = {"ETag": self.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if self.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        body = self.body
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), list(self.encoded))
+        if encoding:
+            body = self.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers, media_type=self.media_type)
+        return Response(content=body, headers=headers, media_type=self.media_type)
+
+
+def negotiate_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """Picks the best encoding from `available` that the client accepts, in order of preference."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def fingerprint_name(path: Path, etag: str) -> str:
+    """styles.css -> styles.<hash>.css"""
+    digest = etag.strip('"')[:8]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+def route_path(scope: Scope) -> str:
+    """Returns the request path relative to the mount point."""
+    path, root_path = scope["path"], scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    return path.lstrip("/")
+
+
+class AssetStore:
+    """
+    Loads templates and static files into memory once at startup.
+
+    Templates are looked up by name, static files are served under `static_prefix`
+    both by their plain name and by a content-fingerprinted name. References to
+    static files inside templates are rewritten to the fingerprinted URL so browsers
+    can cache them for a year. In dev mode the files are polled and reloaded when
+    they change on disk.
+    """
+
+    def __init__(self, static_dir: Optional[Path] = None, static_prefix: str = "/static", dev_mode: bool = False, poll_interval: float = 1.0):
+        self.static_dir = static_dir
+        self.static_prefix = static_prefix
+        self.dev_mode = dev_mode
+        self.poll_interval = poll_interval
+        self._template_paths: Dict[str, Path] = {}
+        self._split_markers: Dict[str, str] = {}
+        self.templates: Dict[str, Asset] = {}
+        self._splits: Dict[str, Tuple[str, ...]] = {}
+        self.static_files: Dict[str, Asset] = {}
+        self.fingerprinted: Dict[str, str] = {}
+        self._by_fingerprint: Dict[str, str] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        if static_dir is not None:
+            self._load_static()
+
+    def add_template(self, name: str, path: Path, split_on: Optional[str] = None) -> None:
+        """Registers a template; `split_on` pre-splits it for streaming responses."""
+        self._template_paths[name] = path
+        if split_on is not None:
+            self._split_markers[name] = split_on
+        self._load_template(name)
+
+    def text(self, name: str) -> str:
+        return self.templates[name].text
+
+    def split(self, name: str) -> Tuple[str, ...]:
+        """Returns the parts of a template registered with `split_on`."""
+        return self._splits[name]
+
+    def response(self, name: str, request: Request) -> Response:
+        return self.templates[name].response(request)
+
+    def url_for(self, filename: str) -> str:
+        """Returns the fingerprinted URL of a static file."""
+        return f"{self.static_prefix}/{self.fingerprinted.get(filename, filename)}"
+
+    def _load_static(self) -> None:
+        self.static_files = {}
+        self.fingerprinted = {}
+        self._by_fingerprint = {}
+        for path in sorted(self.static_dir.rglob("*")):
+            if not path.is_file():
+                continue
+            name = path.relative_to(self.static_dir).as_posix()
+            asset = Asset.load(path)
+            fingerprinted = (Path(name).parent / fingerprint_name(path, asset.etag)).as_posix()
+            self.static_files[name] = asset
+            self.fingerprinted[name] = fingerprinted
+            self._by_fingerprint[fingerprinted] = name
+
+    def _load_template(self, name: str) -> None:
+        path = self._template_paths[name]
+        text = path.read_text(encoding="utf-8")
+        for filename in self.fingerprinted:
+            text = text.replace(f"{self.static_prefix}/{filename}", self.url_for(filename))
+        self.templates[name] = Asset.load(path, text.encode("utf-8"))
+        if name in self._split_markers:
+            self._splits[name] = tuple(text.split(self._split_markers[name]))
+
+    def reload_if_changed(self) -> bool:
+        """Reloads everything when any watched file changed on disk."""
+        watched = list(self.templates.values()) + list(self.static_files.values())
+        changed = any(not asset.path.exists() or asset.path.stat().st_mtime != asset.mtime for asset in watched)
+        if self.static_dir is not None:
+            # Also pick up files that were added to the static directory
+            changed = changed or sum(1 for p in self.static_dir.rglob("*") if p.is_file()) != len(self.static_files)
+        if changed:
+            logger.info("Assets changed on disk, reloading")
+            if self.static_dir is not None:
+                self._load_static()
+            for name in self._template_paths:
+                self._load_template(name)
+        return changed
+
+    async def start(self) -> None:
+        """Starts the file watcher when dev mode is enabled."""
+        if self.dev_mode and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self.reload_if_changed()
+            except OSError as e:
+                logger.warning(f"Could not reload assets: {e}")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """ASGI app serving the static files, meant to be mounted at `static_prefix`."""
+        request = Request(scope, receive)
+        if request.method not in ("GET", "HEAD"):
+            response: Response = PlainTextResponse("Method Not Allowed", status_code=405)
+        else:
+            response = self._static_response(route_path(scope), request)
+        await response(scope, receive, send)
+
+    def _static_response(self, name: str, request: Request) -> Response:
+        if name in self.static_files:
+            return self.static_files[name].response(request)
+        if name in self._by_fingerprint:
+            return self.static_files[self._by_fingerprint[name]].response(request, IMMUTABLE_CACHE_CONTROL)
+        return PlainTextResponse("Not Found", status_code=404)
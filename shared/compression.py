@@ -0,0 +1,139 @@
+import zlib
+from typing import Callable, Dict, Optional
+
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from shared.assets import negotiate_encoding
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int = 6):
+        # wbits=31 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        # A sync flush ends the deflate block so the client can decode everything sent so far
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int = 5):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def available_encoders() -> Dict[str, Callable[[], object]]:
+    """Encoders in order of server preference."""
+    return {"br": BrotliEncoder, "zstd": ZstdEncoder, "gzip": GzipEncoder}
+
+
+class StreamingCompressionMiddleware:
+    """
+    Compresses responses without buffering them.
+
+    Unlike GZipMiddleware, every body chunk the app sends is compressed and
+    flushed straight away, so a streamed answer reaches the browser as it is
+    generated while the compressor still keeps its window across chunks.
+    Responses that are already encoded (such as precompressed assets), small
+    single-chunk responses and non-text content types are passed through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = available_encoders()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), list(self.encoders))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(send, self.encoders[encoding], encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, encoder_factory: Callable[[], object], encoding: str, minimum_size: int):
+        self._send = send
+        self._encoder_factory = encoder_factory
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._start: Optional[Message] = None
+        self._encoder = None
+        self._passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers back until the first body chunk shows whether to compress
+            self._start = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self._passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._start is not None:
+            start, self._start = self._start, None
+            if self._passthrough or (not more_body and len(body) < self._minimum_size):
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self._encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["content-length"]
+            self._encoder = self._encoder_factory()
+            await self._send(start)
+
+        if self._passthrough:
+            await self._send(message)
+            return
+
+        data = self._encoder.chunk(body) if more_body else self._encoder.finish(body)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
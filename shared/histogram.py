@@ -0,0 +1,70 @@
+"""
+Cumulative latency histograms with fixed buckets, cheap to record and to sample.
+
+A Histogram only ever counts up, so whoever samples it keeps the previous
+snapshot and gets the distribution of the interval in between from the
+difference, without the service keeping any per-request history:
+
+    previous = histogram.snapshot()
+    ...
+    recent = delta(histogram.snapshot(), previous)
+    quantile(recent, 0.95)
+
+The buckets are the MCP server's (metrics.BUCKETS), so its Prometheus
+histograms can be read the same way.
+"""
+
+import bisect
+from typing import Any, Dict, List, Optional, Sequence
+
+# Bucket upper bounds, in seconds; one more bucket counts everything above
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float] = BUCKETS):
+        self.bounds = tuple(bounds)
+        self.buckets: List[int] = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"buckets": list(self.buckets), "count": self.count, "sum": round(self.sum, 6)}
+
+
+def delta(current: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The observations between two snapshots. After a restart (the counts went
+    down) that is everything in the current one.
+    """
+    if previous is None or current["count"] < previous["count"]:
+        return current
+    return {
+        "buckets": [now - before for now, before in zip(current["buckets"], previous["buckets"])],
+        "count": current["count"] - previous["count"],
+        "sum": current["sum"] - previous["sum"],
+    }
+
+
+def quantile(snapshot: Dict[str, Any], q: float, bounds: Sequence[float] = BUCKETS) -> Optional[float]:
+    """
+    The q-th quantile, interpolated linearly within its bucket, or None
+    without observations. Above the last bound it is the last bound.
+    """
+    count = snapshot["count"]
+    if not count:
+        return None
+    rank = q * count
+    seen = 0
+    lower = 0.0
+    for bound, in_bucket in zip(bounds, snapshot["buckets"]):
+        if in_bucket and seen + in_bucket >= rank:
+            return lower + (bound - lower) * (rank - seen) / in_bucket
+        seen += in_bucket
+        lower = bound
+    return bounds[-1]
@@ -0,0 +1,210 @@
+"""
+A registry of in-flight requests and streams, load signals and graceful drain.
+
+`InflightMiddleware` registers every HTTP request from its arrival until the
+last byte of its response has been sent, and every WebSocket until it closes.
+WebSockets and responses without a Content-Length (a StreamingResponse, such
+as a Gemini answer) count as streams. `load()`
+summarizes the registry for autoscalers and load balancers: requests and
+streams in flight, their peak, and the age of the open streams.
+`histograms()` adds cumulative histograms of the request durations and the
+times to the first byte of the response, for dashboards to sample.
+
+On SIGTERM (Cloud Run scale-in or a redeploy) the registry starts draining:
+new requests are refused with 503 and `Connection: close` (WebSockets with
+close code 1013, "try again later"), while the requests
+already in flight carry on. The app's lifespan then waits for them with
+`await registry.drain(timeout)` before it closes the clients they use. The
+load endpoint answers 503 while draining, so load balancers stop sending work.
+
+    inflight = InflightRegistry()
+    app.add_middleware(InflightMiddleware, registry=inflight)
+
+    # in the lifespan
+    inflight.install_signal_handler()
+    yield
+    await inflight.drain(DRAIN_TIMEOUT_SECONDS)
+
+DRAIN_TIMEOUT_SECONDS (default 8) stays below Cloud Run's 10 seconds between
+SIGTERM and SIGKILL. uvicorn also waits for open connections before it runs
+the lifespan shutdown; start it with --timeout-graceful-shutdown set to the
+same deadline.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import signal
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from shared.histogram import Histogram
+
+logger = logging.getLogger(__name__)
+
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "8"))
+
+# Paths that are always answered, also while draining, and are not counted
+DEFAULT_EXEMPT_PATHS = ("/load",)
+
+
+@dataclass
+class InflightRequest:
+    method: str
+    path: str
+    started: float
+    stream: bool = False
+    first_byte: Optional[float] = None
+    bytes_sent: int = 0
+
+
+class InflightRegistry:
+    def __init__(self):
+        self.requests: Dict[int, InflightRequest] = {}
+        self.draining = False
+        self.drain_started: Optional[float] = None
+        self.peak = 0
+        self.completed = 0
+        self.streams_completed = 0
+        self.rejected = 0
+        self.latency = Histogram()
+        self.first_byte = Histogram()
+        self._ids = itertools.count()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def add(self, method: str, path: str, stream: bool = False) -> int:
+        request_id = next(self._ids)
+        self.requests[request_id] = InflightRequest(method, path, time.monotonic(), stream)
+        self.peak = max(self.peak, len(self.requests))
+        self._idle.clear()
+        return request_id
+
+    def remove(self, request_id: int) -> None:
+        request = self.requests.pop(request_id)
+        self.completed += 1
+        self.streams_completed += request.stream
+        self.latency.observe(time.monotonic() - request.started)
+        if request.first_byte is not None:
+            self.first_byte.observe(request.first_byte)
+        if not self.requests:
+            self._idle.set()
+
+    def begin_drain(self) -> None:
+        if not self.draining:
+            self.draining = True
+            self.drain_started = time.monotonic()
+            logger.info("Draining: refusing new requests, %d in flight", len(self.requests))
+
+    def install_signal_handler(self, signum: int = signal.SIGTERM) -> None:
+        """
+        Starts draining on the signal, then passes it on to the previous
+        handler (uvicorn's, which begins its shutdown). Signal handlers can
+        only be set from the main thread, so elsewhere (e.g. under a test
+        client) this does nothing.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signum)
+
+        def handler(sig, frame):
+            self.begin_drain()
+            if callable(previous):
+                previous(sig, frame)
+            else:
+                # Nobody to shut down gracefully; behave as if we weren't there
+                signal.signal(sig, previous or signal.SIG_DFL)
+                signal.raise_signal(sig)
+
+        signal.signal(signum, handler)
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT_SECONDS) -> int:
+        """
+        Stops admitting requests and waits up to `timeout` seconds for those in
+        flight. Returns how many were still unfinished.
+        """
+        self.begin_drain()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        if self.requests:
+            logger.warning("Drain deadline reached with %d requests in flight", len(self.requests))
+        return len(self.requests)
+
+    def load(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        stream_ages = sorted(now - request.started for request in self.requests.values() if request.stream)
+        return {
+            "accepting": not self.draining,
+            "draining_seconds": round(now - self.drain_started, 3) if self.drain_started is not None else None,
+            "in_flight": len(self.requests),
+            "streams": len(stream_ages),
+            "peak_in_flight": self.peak,
+            "completed": self.completed,
+            "streams_completed": self.streams_completed,
+            "rejected": self.rejected,
+            "stream_age_seconds": {
+                "p50": round(statistics.median(stream_ages), 3) if stream_ages else 0.0,
+                "max": round(stream_ages[-1], 3) if stream_ages else 0.0,
+            },
+        }
+
+    def histograms(self) -> Dict[str, Any]:
+        return {
+            "latency_seconds": self.latency.snapshot(),
+            "first_byte_seconds": self.first_byte.snapshot(),
+        }
+
+
+class InflightMiddleware:
+    """Registers every HTTP request in an InflightRegistry and refuses new ones while it drains."""
+
+    def __init__(self, app: ASGIApp, registry: InflightRegistry, exempt_paths: Collection[str] = DEFAULT_EXEMPT_PATHS):
+        self.app = app
+        self.registry = registry
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket") or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        websocket = scope["type"] == "websocket"
+        if self.registry.draining:
+            self.registry.rejected += 1
+            if websocket:
+                await receive()  # websocket.connect
+                await send({"type": "websocket.close", "code": 1013})
+                return
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"connection", b"close"), (b"retry-after", b"1"), (b"content-length", b"0")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        request_id = self.registry.add("WEBSOCKET" if websocket else scope["method"], scope["path"], stream=websocket)
+        request = self.registry.requests[request_id]
+
+        async def tracking_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                request.stream = "content-length" not in Headers(raw=message.get("headers", []))
+            elif message["type"] in ("http.response.body", "websocket.send"):
+                if request.first_byte is None:
+                    request.first_byte = time.monotonic() - request.started
+                request.bytes_sent += len(message.get("body") or message.get("bytes") or message.get("text") or b"")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, tracking_send)
+        finally:
+            self.registry.remove(request_id)
@@ -0,0 +1,487 @@
+"""
+On-demand profiling of a running service, for administrators.
+
+Setting PROFILING_TOKEN enables it. Without the token nothing is installed: no
+routes, no middleware, no watchdog, so a disabled profiler costs nothing.
+Requests to /admin/profiling/* must carry `Authorization: Bearer <token>`.
+
+    profiler = Profiler()
+    profiler.install(app)        # the routes and the per-route middleware, if enabled
+
+    # in the lifespan
+    profiler.start()             # the event loop stall watchdog
+    yield
+    await profiler.stop()
+
+The routes:
+
+    GET  /admin/profiling/cpu?seconds=10&interval_ms=5&format=svg
+         Samples the stack of every thread for a while and returns a flame
+         graph, or with format=folded the collapsed stacks (for flamegraph.pl
+         or speedscope).
+    POST /admin/profiling/memory/start?frames=1, .../memory/stop
+         Starts and stops tracemalloc, which slows allocations down while on.
+    POST /admin/profiling/memory/snapshot
+         Takes a snapshot (the last MAX_SNAPSHOTS are kept) and returns its
+         largest allocation sites.
+    GET  /admin/profiling/memory/diff?base=1&target=2
+         What grew between two snapshots (without target: until now).
+    GET  /admin/profiling/routes
+         Per route: calls, server errors, duration percentiles and, while
+         tracemalloc traces, the net bytes allocated while its requests ran
+         (concurrent requests' allocations included).
+    GET  /admin/profiling/stalls
+         Event loop stalls longer than PROFILING_STALL_MS (default 100), with
+         the stack the loop was blocked in.
+"""
+
+import asyncio
+import hmac
+import html
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+import zlib
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from shared.histogram import Histogram, quantile
+
+logger = logging.getLogger(__name__)
+
+STALL_MS = float(os.environ.get("PROFILING_STALL_MS", "100"))
+MAX_PROFILE_SECONDS = 60
+MAX_SNAPSHOTS = 5
+
+# Threads of the profiler itself, left out of CPU profiles
+THREAD_PREFIX = "profiling-"
+
+# Allocations by the import system and tracemalloc itself are not of interest
+MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+# --- CPU ---
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval: float) -> Counter:
+    """
+    Samples the stacks of all other threads every `interval` seconds and
+    counts them as collapsed stacks: "thread;outermost frame;...;innermost".
+    """
+    own = threading.get_ident()
+    names: Dict[int, str] = {}
+    counts: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident not in names:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = names.get(ident, str(ident))
+            if ident == own or name.startswith(THREAD_PREFIX):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            stack.append(name)
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def flame_graph(stacks: Dict[str, int], title: str = "CPU profile", width: int = 1200, row_height: int = 16) -> str:
+    """Draws collapsed stacks as a standalone SVG flame graph, the outermost frames at the bottom."""
+    root: Dict[str, Any] = {"value": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["value"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"value": 0, "children": {}})
+            node["value"] += count
+    total = root["value"] or 1
+    depth = max((stack.count(";") + 1 for stack in stacks), default=0)
+    height = (depth + 2) * row_height
+
+    boxes: List[str] = []
+
+    def place(children: Dict[str, Any], x: float, level: int) -> None:
+        for name, node in sorted(children.items()):
+            box_width = node["value"] / total * width
+            # Frames narrower than half a pixel are left out, with everything above them
+            if box_width >= 0.5:
+                y = height - (level + 1) * row_height
+                hue = zlib.crc32(name.encode()) % 50
+                label = name if len(name) * 7 <= box_width - 4 else name[: max(int((box_width - 4) / 7) - 2, 0)] + ".."
+                boxes.append(
+                    f'<g><title>{html.escape(name)} ({node["value"]} samples, {node["value"] / total:.1%})</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{box_width:.1f}" height="{row_height - 1}" fill="hsl({hue},85%,62%)"/>'
+                    + (f'<text x="{x + 2:.1f}" y="{y + row_height - 4}">{html.escape(label)}</text>' if len(label) > 2 else "")
+                    + "</g>"
+                )
+                place(node["children"], x, level + 1)
+            x += box_width
+
+    place(root["children"], 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" font-size="11">'
+        f'<text x="4" y="{row_height - 4}" font-size="13">{html.escape(title)}: {root["value"]} samples</text>'
+        f'{"".join(boxes)}</svg>'
+    )
+
+
+# --- Event loop stalls ---
+
+class LoopMonitor:
+    """
+    A heartbeat task on the event loop and a watchdog thread. When the
+    heartbeat is late by more than half the threshold the watchdog captures
+    the loop thread's stack, which is where the loop is blocked; when the
+    heartbeat finally runs and was late by at least the threshold, the stall
+    is recorded with that stack.
+    """
+
+    def __init__(self, threshold: float = STALL_MS / 1000, history: int = 50):
+        self.threshold = threshold
+        self.interval = threshold / 2
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.count = 0
+        self.max_seconds = 0.0
+        self._beat = 0.0
+        self._captured: Optional[Tuple[float, List[str]]] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            beat = time.monotonic()
+            self._beat = beat
+            await asyncio.sleep(self.interval)
+            late = time.monotonic() - beat - self.interval
+            if late >= self.threshold:
+                self._record(beat, late)
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(max(self.threshold / 4, 0.005)):
+            beat = self._beat
+            if time.monotonic() - beat - self.interval > self.threshold / 2:
+                if self._captured is None or self._captured[0] != beat:
+                    frame = sys._current_frames().get(self._loop_thread)
+                    if frame is not None:
+                        self._captured = (beat, traceback.format_list(traceback.extract_stack(frame)[-20:]))
+
+    def _record(self, beat: float, late: float) -> None:
+        stack = self._captured[1] if self._captured is not None and self._captured[0] == beat else []
+        stall = {
+            "at": round(time.time() - late, 3),
+            "blocked_ms": round(late * 1000, 1),
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.stalls.append(stall)
+        self.count += 1
+        self.max_seconds = max(self.max_seconds, late)
+        where = stack[-1].strip().splitlines()[0] if stack else "an unknown place"
+        logger.warning("Event loop blocked for %.0f ms in %s", late * 1000, where, extra={"loop_stall": stall})
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name=f"{THREAD_PREFIX}watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._thread.join(timeout=1.0)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "count": self.count,
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "recent": list(self.stalls),
+        }
+
+
+# --- Memory ---
+
+def _statistic(stat: Any, group_by: str) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    result = {"where": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        result.update(size_diff_bytes=stat.size_diff, count_diff=stat.count_diff)
+    if group_by == "traceback":
+        result["stack"] = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    return result
+
+
+class MemoryTracker:
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self.snapshots: Dict[int, tracemalloc.Snapshot] = {}
+        self._ids = itertools.count(1)
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        traced, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else None,
+            "traced_bytes": traced,
+            "peak_bytes": peak,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            "snapshots": list(self.snapshots),
+        }
+
+    def start(self, frames: int) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self.snapshots.clear()
+
+    async def snapshot(self) -> int:
+        # Filtering walks every trace; off the event loop
+        snapshot = await asyncio.to_thread(lambda: tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS))
+        snapshot_id = next(self._ids)
+        self.snapshots[snapshot_id] = snapshot
+        while len(self.snapshots) > self.max_snapshots:
+            del self.snapshots[next(iter(self.snapshots))]
+        return snapshot_id
+
+    async def top(self, snapshot_id: int, group_by: str, limit: int) -> List[Dict[str, Any]]:
+        statistics = await asyncio.to_thread(self.snapshots[snapshot_id].statistics, group_by)
+        return [_statistic(stat, group_by) for stat in statistics[:limit]]
+
+    async def diff(self, base: int, target: int, group_by: str, limit: int) -> List[Dict[str, Any]]:
+        statistics = await asyncio.to_thread(self.snapshots[target].compare_to, self.snapshots[base], group_by)
+        return [_statistic(stat, group_by) for stat in statistics[:limit]]
+
+
+# --- Routes ---
+
+@dataclass
+class RouteStats:
+    calls: int = 0
+    errors: int = 0
+    duration: Histogram = field(default_factory=Histogram)
+    duration_max: float = 0.0
+    traced_calls: int = 0
+    allocated_bytes: int = 0
+    allocated_max: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        snapshot = self.duration.snapshot()
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": round(snapshot["sum"] / self.calls * 1000, 3) if self.calls else 0.0,
+            # Interpolated within wide buckets, so never above the slowest request seen
+            "p50_ms": round(min(quantile(snapshot, 0.5) or 0.0, self.duration_max) * 1000, 3),
+            "p95_ms": round(min(quantile(snapshot, 0.95) or 0.0, self.duration_max) * 1000, 3),
+            "max_ms": round(self.duration_max * 1000, 3),
+            "traced_calls": self.traced_calls,
+            "allocated_bytes_mean": self.allocated_bytes // self.traced_calls if self.traced_calls else None,
+            "allocated_bytes_max": self.allocated_max if self.traced_calls else None,
+        }
+
+
+class ProfilingMiddleware:
+    """Records the duration and, while tracemalloc traces, the net allocations of every HTTP request per route."""
+
+    def __init__(self, app: ASGIApp, profiler: "Profiler"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def status_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        tracing = tracemalloc.is_tracing()
+        allocated = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, status_send)
+        finally:
+            duration = time.perf_counter() - start
+            stats = self.profiler.route_stats(scope)
+            stats.calls += 1
+            stats.errors += status >= 500
+            stats.duration.observe(duration)
+            stats.duration_max = max(stats.duration_max, duration)
+            if tracing and tracemalloc.is_tracing():
+                net = tracemalloc.get_traced_memory()[0] - allocated
+                stats.traced_calls += 1
+                stats.allocated_bytes += net
+                stats.allocated_max = max(stats.allocated_max, net)
+
+
+class Profiler:
+    def __init__(self, token: Optional[str] = None, stall_ms: float = STALL_MS):
+        self.token = token if token is not None else os.environ.get("PROFILING_TOKEN", "")
+        self.enabled = bool(self.token)
+        self.routes: Dict[str, RouteStats] = {}
+        self.loop_monitor = LoopMonitor(stall_ms / 1000)
+        self.memory = MemoryTracker()
+        self._templates: Dict[Any, str] = {}
+        self._cpu_busy = False
+
+    def install(self, app: FastAPI) -> None:
+        """Adds the routes and the per-route middleware, unless profiling is disabled."""
+        if not self.enabled:
+            return
+        app.add_middleware(ProfilingMiddleware, profiler=self)
+        app.include_router(self.router())
+        logger.info("Profiling enabled on /admin/profiling")
+
+    def start(self) -> None:
+        if self.enabled:
+            self.loop_monitor.start()
+
+    async def stop(self) -> None:
+        if self.enabled:
+            await self.loop_monitor.stop()
+
+    def route_stats(self, scope: Scope) -> RouteStats:
+        """The stats of the route that handled the request, by its path template (not the path, which has no bound)."""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            template = "(unmatched)"
+        elif endpoint in self._templates:
+            template = self._templates[endpoint]
+        else:
+            template = next(
+                (
+                    route.path
+                    for route in scope["app"].routes
+                    if getattr(route, "endpoint", None) is endpoint or getattr(route, "app", None) is endpoint
+                ),
+                getattr(endpoint, "__name__", type(endpoint).__name__),
+            )
+            self._templates[endpoint] = template
+        return self.routes.setdefault(f"{scope['method']} {template}", RouteStats())
+
+    def _check_token(self, authorization: Optional[str] = Header(None)) -> None:
+        if authorization is None or not hmac.compare_digest(authorization.encode(), f"Bearer {self.token}".encode()):
+            raise HTTPException(status_code=401, detail="Profiling requires the admin token", headers={"WWW-Authenticate": "Bearer"})
+
+    def router(self) -> APIRouter:
+        router = APIRouter(prefix="/admin/profiling", dependencies=[Depends(self._check_token)], include_in_schema=False)
+
+        @router.get("/cpu")
+        async def cpu_profile(
+            seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+            interval_ms: float = Query(5.0, ge=1, le=1000),
+            format: Literal["svg", "folded"] = "svg",
+        ) -> Response:
+            """Samples every thread's stack for `seconds` and returns a flame graph or the collapsed stacks."""
+            if self._cpu_busy:
+                raise HTTPException(status_code=409, detail="A CPU profile is already being taken")
+            self._cpu_busy = True
+            try:
+                stacks = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+            finally:
+                self._cpu_busy = False
+            if format == "folded":
+                return PlainTextResponse("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+            title = f"CPU profile, {seconds:g} s every {interval_ms:g} ms"
+            return Response(flame_graph(stacks, title), media_type="image/svg+xml")
+
+        @router.get("/memory")
+        async def memory_status() -> Dict[str, Any]:
+            return self.memory.status()
+
+        @router.post("/memory/start")
+        async def memory_start(frames: int = Query(1, ge=1, le=64)) -> Dict[str, Any]:
+            """Starts tracemalloc, recording `frames` frames per allocation."""
+            self.memory.start(frames)
+            return self.memory.status()
+
+        @router.post("/memory/stop")
+        async def memory_stop() -> Dict[str, Any]:
+            self.memory.stop()
+            return self.memory.status()
+
+        def require_tracing() -> None:
+            if not tracemalloc.is_tracing():
+                raise HTTPException(status_code=409, detail="tracemalloc is not tracing; POST /admin/profiling/memory/start first")
+
+        def require_snapshot(snapshot_id: int) -> None:
+            if snapshot_id not in self.memory.snapshots:
+                raise HTTPException(status_code=404, detail=f"No snapshot {snapshot_id}; kept are {list(self.memory.snapshots)}")
+
+        @router.post("/memory/snapshot")
+        async def memory_snapshot(
+            group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+            limit: int = Query(20, ge=1, le=500),
+        ) -> Dict[str, Any]:
+            require_tracing()
+            snapshot_id = await self.memory.snapshot()
+            return {"id": snapshot_id, **self.memory.status(), "top": await self.memory.top(snapshot_id, group_by, limit)}
+
+        @router.get("/memory/diff")
+        async def memory_diff(
+            base: int,
+            target: Optional[int] = None,
+            group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+            limit: int = Query(20, ge=1, le=500),
+        ) -> Dict[str, Any]:
+            """The allocation sites that grew most between two snapshots; without `target`, a new one is taken."""
+            require_snapshot(base)
+            if target is None:
+                require_tracing()
+                target = await self.memory.snapshot()
+                require_snapshot(base)
+            require_snapshot(target)
+            return {"base": base, "target": target, "top": await self.memory.diff(base, target, group_by, limit)}
+
+        @router.get("/routes")
+        async def route_profile() -> Dict[str, Any]:
+            return {route: stats.summary() for route, stats in sorted(self.routes.items())}
+
+        @router.get("/stalls")
+        async def stalls() -> Dict[str, Any]:
+            return self.loop_monitor.summary()
+
+        return router
@@ -0,0 +1,171 @@
+"""
+Non-blocking, structured logging shared by the chat, dashboard and MCP services.
+
+`setup_logging(service)` replaces `logging.basicConfig`:
+
+- Records are put on an in-memory queue by a QueueHandler and written to
+  stdout by a background thread (QueueListener), so a request never waits for
+  stdout.
+- The message is only formatted in that thread. Log with %-style arguments
+  (`logger.info("Read %s", uri)`, not f-strings), so that records below the
+  configured level cost a level check and nothing more. Arguments are
+  formatted a moment later, so don't pass objects that are about to change.
+- Output is one JSON object per line with the fields Cloud Logging understands
+  (severity, message, time) plus the logger, the service and any `extra`.
+- High-volume loggers can be sampled: LOG_SAMPLING="uvicorn.access=0.1"
+  keeps one in ten of their records below WARNING. Warnings and errors are
+  never sampled.
+
+Environment: LOG_LEVEL (default INFO), LOG_FORMAT ("json" or "text", default
+json), LOG_SAMPLING (comma-separated logger=rate pairs).
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+# Loggers that uvicorn configures with their own stdout handlers
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records below WARNING of selected loggers (and their children)."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first, so "a.b" wins over "a"
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def rate(self, name: str) -> float:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is when writing, which test runners and servers may swap."""
+
+    @property
+    def stream(self) -> TextIO:
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value: TextIO) -> None:
+        pass
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    A QueueHandler that leaves formatting to the listener thread. The standard
+    one formats the message in the logging thread, which is the event loop here.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """Parses "logger=rate,logger=rate" into a dict."""
+    rates = {}
+    for pair in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = pair.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(
+    service: str,
+    level: Optional[str] = None,
+    sampling: Optional[Dict[str, float]] = None,
+    json_format: Optional[bool] = None,
+    stream: Optional[TextIO] = None,
+) -> QueueListener:
+    """
+    Routes all logging through a queue to a background writer for `stream`
+    (default stdout). Safe to call more than once; later calls return the
+    running listener.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    if sampling is None:
+        sampling = parse_sampling(os.getenv("LOG_SAMPLING", ""))
+    if json_format is None:
+        json_format = os.getenv("LOG_FORMAT", "json") != "text"
+
+    writer = logging.StreamHandler(stream) if stream else StdoutHandler()
+    writer.setFormatter(JsonFormatter(service) if json_format else logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    # Sampled-out records are dropped before they are queued
+    handler.addFilter(SamplingFilter(sampling))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name in _UVICORN_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.handlers.clear()
+        logger.propagate = True
+
+    _listener = QueueListener(handler.queue, writer, respect_handler_level=True)
+    _listener.start()
+    # Flushes what is still queued when the process exits
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
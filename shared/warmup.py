@@ -0,0 +1,258 @@
+"""
+Pooled connections to upstream services, opened ahead of time and kept warm.
+
+After an idle period the first request to an upstream pays for a new TCP/TLS
+connection, and on Cloud Run possibly for a cold start of the service behind
+it. `KeepWarm` keeps one pooled httpx transport per upstream and, when started,
+pings every upstream right away and then every WARMUP_INTERVAL_SECONDS
+(default 60), skipping upstreams that served real requests in the meantime.
+
+    keep_warm = KeepWarm()
+    keep_warm.add_http("chat", CHAT_API_URL)                # HEAD pings
+    client = httpx.AsyncClient(transport=keep_warm.transport("chat"))
+    keep_warm.add_ping("mcp", mcp_client.ping)             # any coroutine
+    keep_warm.start()
+
+Each request through a transport is counted as warm when it reused a pooled
+connection and as cold when it had to open one; pings are counted apart.
+`stats()` reports the counts per upstream.
+
+Environment: WARMUP_ENABLED ("0" turns the pings off; the pooling and
+counting stay), WARMUP_INTERVAL_SECONDS, WARMUP_CONNECTIONS (connections
+opened per upstream at startup, default 2) and WARMUP_KEEPALIVE_SECONDS (how
+long idle pooled connections are kept, default twice the interval).
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Set while KeepWarm pings, so that transports don't count pings as requests
+_pinging: contextvars.ContextVar[bool] = contextvars.ContextVar("warmup_pinging", default=False)
+
+
+@dataclass
+class UpstreamStats:
+    warm: int = 0
+    cold: int = 0
+    pings: int = 0
+    ping_failures: int = 0
+    # Connections that a ping had to open, so that a request didn't have to
+    ping_cold: int = 0
+    last_ping_ms: Optional[float] = None
+    # time.monotonic() of the last request that was not a ping
+    last_used: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        requests = self.warm + self.cold
+        return {
+            "requests": requests,
+            "warm": self.warm,
+            "cold": self.cold,
+            "warm_ratio": self.warm / requests if requests else 0.0,
+            "pings": self.pings,
+            "ping_failures": self.ping_failures,
+            "ping_cold": self.ping_cold,
+            "last_ping_ms": self.last_ping_ms,
+        }
+
+
+class DrainingStream(httpx.AsyncByteStream):
+    """
+    A response body that, when closed before its end, first reads the rest for
+    up to `drain_timeout` seconds. An unfinished response can't be taken off its
+    connection, so without this the pool would have to drop the connection.
+    The MCP client does this with every streamed (SSE) response: it stops
+    reading once it has its result, just before the server ends the stream.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, drain_timeout: float):
+        self.stream = stream
+        self.drain_timeout = drain_timeout
+        self._iterator = None
+        self._finished = False
+
+    async def __aiter__(self):
+        self._iterator = self.stream.__aiter__()
+        async for chunk in self._iterator:
+            yield chunk
+        self._finished = True
+
+    async def _drain(self) -> None:
+        async for _ in self._iterator:
+            pass
+        self._finished = True
+
+    async def aclose(self) -> None:
+        if self._iterator is not None and not self._finished:
+            try:
+                await asyncio.wait_for(self._drain(), self.drain_timeout)
+            except Exception:
+                pass
+        await self.stream.aclose()
+
+
+class WarmTransport(httpx.AsyncBaseTransport):
+    """
+    A connection pool shared by any number of short-lived httpx clients.
+    Closing a client leaves the pool open; KeepWarm.stop() closes it.
+    """
+
+    def __init__(
+        self,
+        stats: UpstreamStats,
+        keepalive_expiry: float,
+        is_ping: Optional[Callable[[httpx.Request], bool]] = None,
+        drain_timeout: float = 0.0,
+    ):
+        self.stats = stats
+        self.is_ping = is_ping
+        self.drain_timeout = drain_timeout
+        self._pool = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=keepalive_expiry)
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        opened = False
+        inner_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            nonlocal opened
+            if event == "connection.connect_tcp.started":
+                opened = True
+            if inner_trace is not None:
+                await inner_trace(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        try:
+            response = await self._pool.handle_async_request(request)
+            if self.drain_timeout:
+                response.stream = DrainingStream(response.stream, self.drain_timeout)
+            return response
+        finally:
+            if _pinging.get() or (self.is_ping is not None and self.is_ping(request)):
+                self.stats.ping_cold += opened
+            else:
+                self.stats.cold += opened
+                self.stats.warm += not opened
+                self.stats.last_used = time.monotonic()
+
+    async def aclose(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        await self._pool.aclose()
+
+
+class KeepWarm:
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.interval = interval or float(os.getenv("WARMUP_INTERVAL_SECONDS", "60"))
+        self.connections = connections or int(os.getenv("WARMUP_CONNECTIONS", "2"))
+        # Pooled connections outlive the interval, so a ping finds the last one still open
+        self.keepalive_expiry = keepalive_expiry or float(os.getenv("WARMUP_KEEPALIVE_SECONDS", str(2 * self.interval)))
+        self.enabled = enabled if enabled is not None else os.getenv("WARMUP_ENABLED", "1") == "1"
+        self.upstreams: Dict[str, UpstreamStats] = {}
+        self.transports: Dict[str, WarmTransport] = {}
+        self.pings: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def transport(
+        self,
+        name: str,
+        is_ping: Optional[Callable[[httpx.Request], bool]] = None,
+        drain_timeout: float = 0.0,
+    ) -> WarmTransport:
+        """
+        The pooled transport for an upstream, created on first use. `is_ping`
+        recognizes pings sent from other tasks (whose requests don't see that
+        they are pings); `drain_timeout` enables DrainingStream.
+        """
+        if name not in self.transports:
+            stats = self.upstreams.setdefault(name, UpstreamStats())
+            self.transports[name] = WarmTransport(stats, self.keepalive_expiry, is_ping, drain_timeout)
+        return self.transports[name]
+
+    def add_ping(self, name: str, ping: Callable[[], Awaitable[Any]]) -> None:
+        """Registers the coroutine function that keeps an upstream warm."""
+        self.upstreams.setdefault(name, UpstreamStats())
+        self.pings[name] = ping
+
+    def add_http(self, name: str, base_url: str, path: str = "/") -> None:
+        """Keeps an HTTP upstream warm with HEAD requests through its pooled transport."""
+        transport = self.transport(name)
+
+        async def head() -> None:
+            async with httpx.AsyncClient(transport=transport, timeout=10.0) as client:
+                # Any answer will do, even 404 or 405: the connection and the instance are up
+                await client.head(f"{base_url.rstrip('/')}{path}")
+
+        self.add_ping(name, head)
+
+    async def _ping(self, name: str) -> None:
+        stats = self.upstreams[name]
+        token = _pinging.set(True)
+        start = time.perf_counter()
+        try:
+            await self.pings[name]()
+            stats.pings += 1
+            stats.last_ping_ms = round((time.perf_counter() - start) * 1000, 3)
+        except Exception as e:
+            stats.ping_failures += 1
+            logger.warning("Keep-warm ping to %s failed: %s", name, e)
+        finally:
+            _pinging.reset(token)
+
+    async def warm(self, connections: int = 1) -> None:
+        """
+        Pings the upstreams that have been idle for an interval, `connections`
+        times concurrently each, so that as many pooled connections are opened.
+        """
+        idle_since = time.monotonic() - self.interval
+        await asyncio.gather(*(
+            self._ping(name)
+            for name in self.pings
+            if self.upstreams[name].last_used <= idle_since
+            for _ in range(connections)
+        ))
+
+    async def _run(self) -> None:
+        await self.warm(self.connections)
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.warm()
+
+    def start(self) -> None:
+        """Starts warming in the background, without delaying startup."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for transport in self.transports.values():
+            await transport.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval if self.enabled else None,
+            "upstreams": {name: stats.summary() for name, stats in self.upstreams.items()},
+        }